@@ -0,0 +1,193 @@
+# benchmarks/bench_hotpaths.py
+
+"""
+Benchmarks for the evaluation and parsing hot paths.
+
+Times every metric and parser on synthetic data at several sizes, records
+peak memory (tracemalloc, in a separate pass so it does not distort the
+timings) and compares against a saved baseline:
+
+    python benchmarks/bench_hotpaths.py --save-baseline
+    python benchmarks/bench_hotpaths.py              # fails on regressions
+    python benchmarks/bench_hotpaths.py --sizes 1k,100k,10M
+
+Row-wise Python functions are skipped above --rowwise-limit rows (10M
+CoT replies alone would need several GB); vectorized ones run at every size.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src_combined"))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import calibration                                          # noqa: E402
+from answer_matching import exact_match, f1_token_level     # noqa: E402
+from evaluate import semantic_match, compute_ece as compute_ece_loop  # noqa: E402
+from parsing import parse_baseline_output, parse_cot_output  # noqa: E402
+from utils import parse_answer, parse_confidence            # noqa: E402
+
+from synthetic import make_answers, make_cot_responses     # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_hotpaths.json")
+DEFAULT_SIZES = "1k,100k,10M"
+DEFAULT_THRESHOLD = 0.25   # fail when >25% slower than the baseline
+ROWWISE_LIMIT = 1_000_000
+MIN_COMPARABLE_SECONDS = 1e-3  # faster runs are timer noise, never flagged
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    mult = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * mult)
+
+
+def label(n):
+    for div, suffix in ((1_000_000, "M"), (1_000, "k")):
+        if n >= div and n % div == 0:
+            return f"{n // div}{suffix}"
+    return str(n)
+
+
+# ------------------------------------------------
+# Benchmarks: name -> (kind, setup(data) -> callable)
+# ------------------------------------------------
+def rowwise(fn, *cols):
+    def setup(data):
+        args = [data[c] for c in cols]
+        return lambda: [fn(*a) for a in zip(*args)]
+    return setup
+
+
+def grouped(data):
+    df = pd.DataFrame({"run_id": data["sources"], "confidence": data["conf"],
+                       "correct": data["correct"]})
+    return lambda: calibration.grouped_metrics(df, ["run_id"])
+
+
+BENCHMARKS = {
+    "semantic_match": ("rowwise", rowwise(semantic_match, "preds", "golds")),
+    "exact_match": ("rowwise", rowwise(exact_match, "preds", "golds")),
+    "f1_token_level": ("rowwise", rowwise(f1_token_level, "preds", "golds")),
+    "parse_baseline_output": ("rowwise", rowwise(parse_baseline_output, "responses")),
+    "parse_cot_output": ("rowwise", rowwise(parse_cot_output, "responses")),
+    "parse_confidence": ("rowwise", rowwise(parse_confidence, "responses")),
+    "parse_answer": ("rowwise", rowwise(parse_answer, "responses")),
+    "compute_ece_loop": ("vectorized", lambda d: lambda: compute_ece_loop(d["conf"], d["correct"])),
+    "compute_ece": ("vectorized", lambda d: lambda: calibration.compute_ece(d["conf"], d["correct"])),
+    "brier_score": ("vectorized", lambda d: lambda: calibration.brier_score(d["correct"], d["conf"])),
+    "grouped_metrics": ("vectorized", grouped),
+}
+
+
+def make_data(n, need_rows):
+    preds, golds, conf, sources = make_answers(n)
+    data = {"conf": conf, "sources": sources,
+            "correct": (np.random.default_rng(1).random(n) < conf).astype(float)}
+    if need_rows:
+        data.update(preds=preds, golds=golds, responses=make_cot_responses(n))
+    return data
+
+
+def time_it(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, names, rowwise_limit, repeats):
+    results = {}
+    for n in sizes:
+        need_rows = n <= rowwise_limit and any(BENCHMARKS[b][0] == "rowwise" for b in names)
+        data = make_data(n, need_rows)
+
+        for name in names:
+            kind, setup = BENCHMARKS[name]
+            key = f"{name}@{label(n)}"
+            if kind == "rowwise" and n > rowwise_limit:
+                print(f"{key:32s} skipped (row-wise, above --rowwise-limit)")
+                continue
+
+            fn = setup(data)
+            seconds = time_it(fn, repeats if n <= 100_000 else 1)
+            peak = peak_memory(fn)
+            results[key] = {"rows": n, "seconds": seconds, "rows_per_s": n / seconds,
+                            "peak_mb": peak / 2**20}
+            print(f"{key:32s} {seconds * 1e3:10.2f} ms  {n / seconds:14,.0f} rows/s  "
+                  f"{peak / 2**20:9.1f} MB peak")
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, res in results.items():
+        if key not in baseline or baseline[key]["seconds"] < MIN_COMPARABLE_SECONDS:
+            continue
+        ratio = res["seconds"] / baseline[key]["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append((key, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--only", default="", help="comma-separated benchmark names")
+    parser.add_argument("--rowwise-limit", type=parse_size, default=ROWWISE_LIMIT)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = run(sizes, names, args.rowwise_limit, args.repeats)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline -> {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for key, ratio in regressions:
+        print(f"REGRESSION {key}: {ratio:.2f}x the baseline time")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
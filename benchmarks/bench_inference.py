@@ -0,0 +1,172 @@
+# benchmarks/bench_inference.py
+
+"""
+End-to-end inference throughput benchmark against the fake provider.
+
+Runs the real per-question code of the baseline, CoT and self-consistency
+scripts (answer_question) through the real Groq client, pointed at a local
+fake endpoint with configurable latency, token rate and 429 behaviour, at
+several concurrency levels:
+
+    python benchmarks/bench_inference.py --items 60 --concurrency 1,4,16,32 \\
+        --median-ms 300 --rpm 1200
+
+Reports items/s, p50/p95/p99 item latency, 429 retries, failures and cost,
+and writes a JSON file plus a saturation-curve plot.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src_combined"))
+
+from fake_provider import add_provider_args, config_from_args, start_server  # noqa: E402
+
+METHOD_MODULES = {
+    "baseline": "inference_groq_com",
+    "cot": "inference_groq_com_cot",
+    "self_consistency": "inference_groq_com_selfconsistency",
+}
+
+# USD per million tokens (input, output), Groq list prices
+PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+
+OUT_JSON = "outputs/bench/inference.json"
+OUT_PLOT = "outputs/bench/inference_saturation.png"
+
+
+def synthetic_items(n):
+    rng = np.random.default_rng(0)
+    sources = ["Astro-QA_Judgement", "GlobalMedQA_EN", "TORQUE", "HotpotQA"]
+    return [{"question": f"Synthetic statement number {i} about topic {rng.integers(1000)}.",
+             "answer": str(rng.choice(["yes", "no"])),
+             "source": sources[i % len(sources)], "type": "True or False"}
+            for i in range(n)]
+
+
+def post(url):
+    urllib.request.urlopen(urllib.request.Request(url, data=b"{}", method="POST")).read()
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as resp:
+        return json.loads(resp.read())
+
+
+def bench_one(module, items, concurrency, base_url):
+    from run_registry import UsageCounter
+
+    post(f"{base_url}/stats/reset")
+    usage = UsageCounter()
+    latencies, failures = [], []
+
+    def timed(row):
+        start = time.perf_counter()
+        try:
+            module.answer_question(row, usage)
+        except Exception as e:  # exhausted retries, timeouts, ...
+            failures.append(type(e).__name__)
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, items))
+    wall = time.perf_counter() - start
+
+    stats = get_json(f"{base_url}/stats")
+    price_in, price_out = PRICES.get(module.MODEL_NAME, (0.0, 0.0))
+    lat = np.array(latencies) if latencies else np.array([np.nan])
+
+    return {
+        "items": len(items),
+        "concurrency": concurrency,
+        "seconds": wall,
+        "items_per_s": len(latencies) / wall,
+        "p50_s": float(np.percentile(lat, 50)),
+        "p95_s": float(np.percentile(lat, 95)),
+        "p99_s": float(np.percentile(lat, 99)),
+        "calls": usage.calls,
+        "retries": stats["rate_limited"],
+        "failures": len(failures),
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cost_usd": (usage.prompt_tokens * price_in + usage.completion_tokens * price_out) / 1e6,
+    }
+
+
+def plot(results, out_path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(11, 4.5))
+    for method, rows in results.items():
+        conc = [r["concurrency"] for r in rows]
+        ax1.plot(conc, [r["items_per_s"] for r in rows], marker="o", label=method)
+        ax2.plot(conc, [r["p95_s"] for r in rows], marker="o", label=method)
+    for ax, ylabel in ((ax1, "items / s"), (ax2, "p95 item latency (s)")):
+        ax.set_xscale("log", base=2)
+        ax.set_xlabel("concurrency")
+        ax.set_ylabel(ylabel)
+        ax.legend()
+    fig.suptitle("Inference saturation (fake provider)")
+    fig.tight_layout()
+    fig.savefig(out_path, dpi=120)
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--methods", default=",".join(METHOD_MODULES))
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--items", type=int, default=40)
+    parser.add_argument("--max-retries", type=int, default=2)
+    parser.add_argument("--out", default=OUT_JSON)
+    add_provider_args(parser)
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(config_from_args(args))
+    os.environ["GROQ_BASE_URL"] = base_url
+    os.environ.setdefault("GROQ_API_KEY", "fake-key")
+    os.environ["GROQ_MAX_RETRIES"] = str(args.max_retries)
+
+    import importlib
+    items = synthetic_items(args.items)
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    results = {}
+    for method in args.methods.split(","):
+        module = importlib.import_module(METHOD_MODULES[method])
+        results[method] = []
+        for conc in levels:
+            res = bench_one(module, items, conc, base_url)
+            results[method].append(res)
+            print(f"{method:17s} c={conc:<3d} {res['items_per_s']:7.2f} items/s  "
+                  f"p50={res['p50_s']:.2f}s p95={res['p95_s']:.2f}s p99={res['p99_s']:.2f}s  "
+                  f"calls={res['calls']:<4d} retries={res['retries']:<4d} "
+                  f"failed={res['failures']:<3d} ${res['cost_usd']:.4f}")
+
+    server.shutdown()
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump({"provider": vars(config_from_args(args)), "results": results}, f, indent=2)
+    plot_path = os.path.join(os.path.dirname(args.out), os.path.basename(OUT_PLOT))
+    plot(results, plot_path)
+    print(f"Saved -> {args.out}, {plot_path}")
+
+
+if __name__ == "__main__":
+    main()
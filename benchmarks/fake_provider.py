@@ -0,0 +1,341 @@
+# benchmarks/fake_provider.py
+
+"""
+Local stand-in for the Groq (OpenAI-compatible) chat-completions endpoint.
+
+Latency, token throughput and rate limiting are configurable, so the
+inference path can be load-tested without spending quota:
+
+    python benchmarks/fake_provider.py --port 8765 --latency lognormal \\
+        --median-ms 300 --rpm 600 --burst-every 10 --burst-length 1
+
+then point the scripts at it with GROQ_BASE_URL=http://127.0.0.1:8765 and
+any GROQ_API_KEY. GET /stats returns request / 429 counters.
+
+The batch API (file upload, batch create / retrieve, file download) is
+served too, for LLM_BACKEND=batch: a batch completes --batch-seconds after
+it was created, with --batch-error-rate of its requests in the error file
+instead of the output file.
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from synthetic import make_cot_response
+
+CHAT_PATH = "/openai/v1/chat/completions"
+FILES_PATH = "/openai/v1/files"
+BATCHES_PATH = "/openai/v1/batches"
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+@dataclass
+class ProviderConfig:
+    latency: str = "lognormal"      # fixed | lognormal | exponential
+    median_ms: float = 250.0        # time to first token
+    sigma: float = 0.5              # lognormal shape
+    tokens_per_s: float = 500.0     # generation speed
+    rpm: float = 0.0                # requests per minute before 429, 0 = unlimited
+    burst_every: float = 0.0        # seconds between forced 429 bursts, 0 = none
+    burst_length: float = 0.0       # seconds each burst lasts
+    retry_after: float = 0.2        # Retry-After header sent with 429s
+    batch_seconds: float = 1.0      # time for a batch to complete
+    batch_error_rate: float = 0.0   # share of batch requests that fail
+    seed: int = 0
+
+
+@dataclass
+class ProviderStats:
+    requests: int = 0
+    ok: int = 0
+    rate_limited: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def snapshot(self):
+        with self.lock:
+            return {"requests": self.requests, "ok": self.ok,
+                    "rate_limited": self.rate_limited,
+                    "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens}
+
+    def reset(self):
+        with self.lock:
+            self.requests = self.ok = self.rate_limited = 0
+            self.prompt_tokens = self.completion_tokens = 0
+
+
+class FakeProvider:
+    def __init__(self, config):
+        self.config = config
+        self.stats = ProviderStats()
+        self.started = time.monotonic()
+        self.rng = np.random.default_rng(config.seed)
+        self.rng_lock = threading.Lock()
+        self.window = []          # request times within the last minute
+        self.window_lock = threading.Lock()
+        self.files = {}           # file id -> bytes
+        self.batches = {}         # batch id -> batch object
+        self.batch_lock = threading.Lock()
+
+    # --- rate limiting ---
+    def rate_limited(self):
+        cfg = self.config
+        now = time.monotonic()
+        if cfg.burst_every and (now - self.started) % cfg.burst_every < cfg.burst_length:
+            return True
+        if cfg.rpm:
+            with self.window_lock:
+                self.window = [t for t in self.window if now - t < 60.0]
+                if len(self.window) >= cfg.rpm:
+                    return True
+                self.window.append(now)
+        return False
+
+    # --- simulated generation ---
+    def sample_latency(self):
+        cfg = self.config
+        with self.rng_lock:
+            if cfg.latency == "fixed":
+                return cfg.median_ms / 1e3
+            if cfg.latency == "exponential":
+                return self.rng.exponential(cfg.median_ms / np.log(2)) / 1e3
+            return self.rng.lognormal(np.log(cfg.median_ms), cfg.sigma) / 1e3
+
+    def complete(self, body, sleep=True):
+        prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+        with self.rng_lock:
+            text = make_cot_response(self.rng)
+            if "step by step" not in prompt.lower():
+                text = "\n".join(text.strip().split("\n")[-2:])
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(text) // 4)
+        if sleep:
+            time.sleep(self.sample_latency() + completion_tokens / self.config.tokens_per_s)
+
+        with self.stats.lock:
+            self.stats.ok += 1
+            self.stats.prompt_tokens += prompt_tokens
+            self.stats.completion_tokens += completion_tokens
+
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens,
+                      "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    # --- batch API ---
+    def add_file(self, data, purpose="batch"):
+        file_id = f"file_{uuid.uuid4().hex[:24]}"
+        with self.batch_lock:
+            self.files[file_id] = data
+        return {"id": file_id, "object": "file", "bytes": len(data),
+                "created_at": int(time.time()), "filename": f"{file_id}.jsonl",
+                "purpose": purpose}
+
+    def create_batch(self, body):
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        batch = {"id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                 "input_file_id": body.get("input_file_id"),
+                 "completion_window": body.get("completion_window", "24h"),
+                 "status": "in_progress", "created_at": int(time.time()),
+                 "output_file_id": None, "error_file_id": None, "errors": None,
+                 "request_counts": {"total": 0, "completed": 0, "failed": 0}}
+        with self.batch_lock:
+            self.batches[batch_id] = batch
+            snapshot = dict(batch)
+        threading.Thread(target=self.run_batch, args=(batch_id,), daemon=True).start()
+        return snapshot
+
+    def run_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        started = time.monotonic()
+        lines = self.files.get(batch["input_file_id"], b"").decode().splitlines()
+        outputs, errors = [], []
+        for line in filter(str.strip, lines):
+            request = json.loads(line)
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:24]}",
+                      "custom_id": request.get("custom_id")}
+            with self.rng_lock:
+                failed = self.rng.random() < self.config.batch_error_rate
+            if request.get("url") != BATCH_ENDPOINT:
+                error = {"code": "invalid_request", "message": f"cannot serve {request.get('url')}"}
+            elif failed:
+                error = {"code": "server_error", "message": "simulated failure"}
+            else:
+                error = None
+            if error:
+                errors.append({**record, "response": None, "error": error})
+                continue
+            body = self.complete(request.get("body", {}), sleep=False)
+            outputs.append({**record, "error": None, "response": {
+                "status_code": 200, "request_id": body["id"], "body": body}})
+
+        time.sleep(max(0.0, self.config.batch_seconds - (time.monotonic() - started)))
+        output_file = self.add_file(to_jsonl(outputs), "batch_output") if outputs else None
+        error_file = self.add_file(to_jsonl(errors), "batch_output") if errors else None
+        with self.batch_lock:
+            batch["output_file_id"] = output_file and output_file["id"]
+            batch["error_file_id"] = error_file and error_file["id"]
+            batch["request_counts"] = {"total": len(outputs) + len(errors),
+                                       "completed": len(outputs), "failed": len(errors)}
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
+
+    def handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_bytes(self, data):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                batch = re.fullmatch(BATCHES_PATH + r"/([\w-]+)", self.path)
+                content = re.fullmatch(FILES_PATH + r"/([\w-]+)/content", self.path)
+                if self.path == "/stats":
+                    self.send_json(200, provider.stats.snapshot())
+                elif batch and batch.group(1) in provider.batches:
+                    with provider.batch_lock:
+                        self.send_json(200, dict(provider.batches[batch.group(1)]))
+                elif content and content.group(1) in provider.files:
+                    self.send_bytes(provider.files[content.group(1)])
+                else:
+                    self.send_json(404, {"error": {"message": "not found"}})
+
+            def read_upload(self, data):
+                """file and purpose fields of a multipart/form-data body."""
+                header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                message = BytesParser().parsebytes(header + data)
+                fields = {part.get_param("name", header="content-disposition"):
+                          part.get_payload(decode=True) for part in message.get_payload()}
+                return fields.get("file", b""), (fields.get("purpose") or b"batch").decode()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                data = self.rfile.read(length)
+                if self.path == FILES_PATH:
+                    self.send_json(200, provider.add_file(*self.read_upload(data)))
+                    return
+                body = json.loads(data or b"{}")
+                if self.path == BATCHES_PATH:
+                    self.send_json(200, provider.create_batch(body))
+                    return
+
+                if self.path == "/stats/reset":
+                    provider.stats.reset()
+                    with provider.window_lock:
+                        provider.window = []  # fresh rate-limit window too
+                    self.send_json(200, {})
+                    return
+                if self.path != CHAT_PATH:
+                    self.send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                with provider.stats.lock:
+                    provider.stats.requests += 1
+                if provider.rate_limited():
+                    with provider.stats.lock:
+                        provider.stats.rate_limited += 1
+                    self.send_json(429, {"error": {"message": "rate limit exceeded",
+                                                   "type": "rate_limit_exceeded"}},
+                                   {"retry-after": str(provider.config.retry_after)})
+                    return
+
+                self.send_json(200, provider.complete(body))
+
+        return Handler
+
+
+def to_jsonl(records):
+    return "".join(json.dumps(r) + "\n" for r in records).encode()
+
+
+def start_server(config, host="127.0.0.1", port=0):
+    """Start in a background thread; returns (server, provider, base_url)."""
+    provider = FakeProvider(config)
+    server = ThreadingHTTPServer((host, port), provider.handler())
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, provider, base_url
+
+
+def add_provider_args(parser):
+    defaults = ProviderConfig()
+    parser.add_argument("--latency", choices=["fixed", "lognormal", "exponential"],
+                        default=defaults.latency)
+    parser.add_argument("--median-ms", type=float, default=defaults.median_ms)
+    parser.add_argument("--sigma", type=float, default=defaults.sigma)
+    parser.add_argument("--tokens-per-s", type=float, default=defaults.tokens_per_s)
+    parser.add_argument("--rpm", type=float, default=defaults.rpm)
+    parser.add_argument("--burst-every", type=float, default=defaults.burst_every)
+    parser.add_argument("--burst-length", type=float, default=defaults.burst_length)
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--batch-seconds", type=float, default=defaults.batch_seconds)
+    parser.add_argument("--batch-error-rate", type=float, default=defaults.batch_error_rate)
+
+
+def config_from_args(args):
+    return ProviderConfig(latency=args.latency, median_ms=args.median_ms,
+                          sigma=args.sigma, tokens_per_s=args.tokens_per_s,
+                          rpm=args.rpm, burst_every=args.burst_every,
+                          burst_length=args.burst_length,
+                          retry_after=args.retry_after,
+                          batch_seconds=args.batch_seconds,
+                          batch_error_rate=args.batch_error_rate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake chat-completions provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_provider_args(parser)
+    args = parser.parse_args()
+
+    server, _, base_url = start_server(config_from_args(args), args.host, args.port)
+    print(f"Fake provider on {base_url} (GROQ_BASE_URL={base_url}), Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/synthetic.py
+
+"""
+Synthetic pred / gold / confidence data and raw model replies for the
+benchmarks. Everything is generated from a seed, so the same size always
+produces the same data.
+"""
+
+import numpy as np
+
+ENTITIES = [
+    "Barack Obama", "Paris", "the Andromeda Galaxy", "Marie Curie", "1969",
+    "Mount Everest", "the Pacific Ocean", "William Shakespeare", "3677",
+    "acute myocardial infarction", "before the storm", "after the election",
+]
+YES_NO = ["yes", "no"]
+REASONING = [
+    "The statement refers to a well-known fact.",
+    "Considering the context, the first paragraph mentions the relevant entity.",
+    "The question asks about the order of two events.",
+    "Both options seem plausible, but the passage favours one of them.",
+]
+
+
+def make_answers(n, seed=0):
+    """(preds, golds, confidences, sources) with a mix of yes/no, numeric
+    and open-ended answers and partially correct predictions."""
+    rng = np.random.default_rng(seed)
+
+    kind = rng.integers(0, 3, size=n)  # 0 yes/no, 1 entity, 2 entity variant
+    gold_idx = rng.integers(0, len(ENTITIES), size=n)
+    pred_idx = np.where(rng.random(n) < 0.6, gold_idx, rng.integers(0, len(ENTITIES), size=n))
+    yn_gold = rng.integers(0, 2, size=n)
+    yn_pred = np.where(rng.random(n) < 0.7, yn_gold, 1 - yn_gold)
+
+    entities = np.array(ENTITIES, dtype=object)
+    yes_no = np.array(YES_NO, dtype=object)
+    golds = np.where(kind == 0, yes_no[yn_gold], entities[gold_idx])
+    preds = np.where(kind == 0, yes_no[yn_pred], entities[pred_idx])
+    variant = kind == 2
+    preds[variant] = "The answer is " + preds[variant] + "."
+
+    confidences = np.round(np.clip(rng.beta(5, 2, size=n), 0, 1), 2)
+    sources = np.array(["Astro-QA", "GlobalMedQA", "TORQUE", "HotpotQA"], dtype=object)[
+        rng.integers(0, 4, size=n)]
+
+    return preds.tolist(), golds.tolist(), confidences, sources
+
+
+def make_cot_response(rng):
+    """One raw CoT-style reply with the formatting noise seen in practice."""
+    steps = " ".join(rng.choice(REASONING, size=rng.integers(1, 4)))
+    answer = rng.choice(YES_NO + ENTITIES)
+    conf = f"{rng.beta(5, 2):.2f}"
+
+    style = rng.integers(0, 4)
+    if style == 0:
+        return f"{steps}\n{answer}\n{conf}"
+    if style == 1:
+        return f"Let's think step by step.\n{steps}\n\n{answer}\n{conf}\n"
+    if style == 2:
+        return f"{steps}\nFinal answer: {answer}\nConfidence: {conf}"
+    return f"{answer}\n{conf}"
+
+
+def make_cot_responses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [make_cot_response(rng) for _ in range(n)]
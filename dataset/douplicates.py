@@ -1,18 +1,37 @@
-import pandas as pd
+"""
+Exact / near-duplicate and contamination check for the combined dataset.
 
-# Load the dataset
-df = pd.read_json("combined_qa_dataset_800.jsonl", lines=True)
+    python dataset/douplicates.py                                  # combined_qa_dataset_800.jsonl
+    python dataset/douplicates.py data.jsonl --reference data/raw/hotpotqa/train.jsonl
 
-# Check for duplicates based on 'question' and 'answer' columns
-duplicates = df.duplicated(subset=["question", "answer"], keep=False)
+Writes <dataset>.dedup.csv next to the dataset; the inference scripts skip
+the duplicates it lists. See src_combined/dedup.py for the method.
+"""
 
-# Print summary
-num_duplicates = duplicates.sum()
-print(f"Number of duplicate QA pairs: {num_duplicates}")
+import argparse
+import os
+import sys
 
-# Optionally, show the duplicates
-if num_duplicates > 0:
-    print("Duplicate entries:")
-    print(df[duplicates])
-else:
-    print("No duplicates found.")
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# shared pipeline modules (dedup, ...) live in src_combined/
+sys.path.append(os.path.join(HERE, "..", "src_combined"))
+import dedup
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate and contaminated QA items")
+    parser.add_argument("dataset", nargs="?", default=os.path.join(HERE, "combined_qa_dataset_800.jsonl"))
+    parser.add_argument("--reference", nargs="*", default=[],
+                        help="JSONL corpora to check for contamination (e.g. HotpotQA train)")
+    parser.add_argument("--threshold", type=float, default=dedup.NEAR_THRESHOLD,
+                        help="estimated Jaccard similarity of near duplicates")
+    parser.add_argument("--workers", type=int, default=dedup.WORKERS)
+    parser.add_argument("--output", default=None, help="default: <dataset>.dedup.csv")
+    args = parser.parse_args()
+
+    dedup.main(args.dataset, args.reference, args.output, args.workers, args.threshold)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,54 @@
-import pandas as pd
-from datasets import load_dataset, Dataset
+"""
+Build the combined QA evaluation set from five sources.
+
+    python dataset/main.py                       # 250 per source -> combined_qa_dataset_800.jsonl
+    python dataset/main.py --per-source 100 --seed 7 --output small.jsonl
+
+Every source has an adapter that loads it, draws a seeded sample and maps
+it to the unified format (question, answer, type, source). Adapters run in
+parallel processes. Their mapped samples are cached as Arrow files in
+dataset/cache/, keyed by the source version (content hash of local files,
+pinned revision of Hugging Face datasets), the seed and the sample size.
+
+Samples are prefixes of a seeded shuffle, and every adapter maps at least
+PREFETCH items. So a cached sample also answers any smaller request: a
+rebuild with another per-source count takes seconds, and the same
+arguments always give the same file.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
 import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# shared pipeline modules (dedup, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from dedup import item_ids
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_SIZE = 250          # items per source
+SEED = 42
+PREFETCH = 1000            # items mapped per source on a cache miss
+CACHE_DIR = os.path.join(HERE, "cache")
+OUTPUT_FILE = os.path.join(HERE, "combined_qa_dataset_800.jsonl")
+
+# Bump when a map_* function changes, so cached samples are rebuilt.
+MAP_VERSION = 1
+
+# Hugging Face revisions; pin a commit SHA for byte-identical rebuilds
+# across dataset updates.
+MEDQA_REVISION = "main"
+HOTPOT_REVISION = "main"
+
+COLUMNS = ["question", "answer", "type", "source"]
 
 # ============================================================
 # Helper: Safe string conversion
@@ -14,51 +62,24 @@ def to_str(x):
         return str(x)
     return str(x)
 
-# ============================================================
-# 1. LOAD DATASETS
-# ============================================================
-
-# --- Astro-QA (XLSX file) ---
-astro_df_judgement = pd.read_excel("astroqa/judgment_EN.xlsx")
-astro_df_subjective = pd.read_excel("astroqa/subjective question_EN.xlsx")
-
-astro_df_subjective = astro_df_subjective.astype(str)
-astro_df_judgement = astro_df_judgement.astype(str)
-
-astro_judgement = Dataset.from_pandas(astro_df_judgement)
-astro_subjective = Dataset.from_pandas(astro_df_subjective)
-
-# --- GlobalMedQA (HuggingFace) — English only ---
-medqa = load_dataset("mariocedo/GlobalMedQA", "full", split="train")
-medqa_en = medqa.filter(lambda x: x.get("language") == "EN")
-medqa_en_single = medqa_en.filter(lambda x: x.get("multiple_answers") is False)
-
-# --- TORQUE (GitHub local JSON files) ---
-torque = load_dataset(
-    "json",
-    data_files="torque/*.json",
-    split="train"
-)
 
-# --- HotpotQA (HuggingFace) ---
-hotpot = load_dataset("hotpotqa/hotpot_qa", "distractor", split="train")
+def file_hash(paths):
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        h.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()[:16]
 
-# ============================================================
-# 2. SAMPLE 250 ITEMS FROM EACH (pre-mapping)
-# ============================================================
 
-def sample_250(ds):
-    ds = ds.shuffle(seed=42)
-    return ds.select(range(min(250, len(ds))))
-
-astro_200_s  = sample_250(astro_subjective)
-astro_200_j  = sample_250(astro_judgement)
-medqa_200    = sample_250(medqa_en_single)
-torque_200   = sample_250(torque)
-hotpot_200   = sample_250(hotpot)
+def sample_prefix(ds, n, seed):
+    """The first n items of a seeded shuffle (a smaller n is a prefix)."""
+    ds = ds.shuffle(seed=seed)
+    return ds.select(range(min(n, len(ds))))
 
 # ============================================================
-# 3. NORMALIZE & MAP TO UNIFIED FORMAT
+# NORMALIZE & MAP TO UNIFIED FORMAT
 # ============================================================
 
 def map_astro_j(example):
@@ -105,9 +126,10 @@ def map_medqa(example):
         "type": "Multiple-choice"
     }
 
-def map_torque(example, max_per_context=1):
+def map_torque(example, rng, max_per_context=1):
     """
     Map TORQUE examples to QA pairs, including context in the question.
+    rng picks which QA pairs of a passage are kept.
     """
     mapped_qas = []
 
@@ -132,7 +154,7 @@ def map_torque(example, max_per_context=1):
             })
 
         if valid_qas:
-            sampled_qas = random.sample(valid_qas, min(len(valid_qas), max_per_context))
+            sampled_qas = rng.sample(valid_qas, min(len(valid_qas), max_per_context))
             mapped_qas.extend(sampled_qas)
 
     return mapped_qas
@@ -146,76 +168,176 @@ def map_hotpot(example):
     }
 
 # ============================================================
-# Map datasets
+# SOURCE ADAPTERS: version() and build(n, seed) -> list of records
 # ============================================================
 
-astro_mapped_j  = astro_200_j.map(map_astro_j)
-astro_mapped_s  = astro_200_s.map(map_astro_s)
-medqa_mapped    = medqa_200.map(map_medqa)
+ASTRO_J_FILE = os.path.join(HERE, "astroqa", "judgment_EN.xlsx")
+ASTRO_S_FILE = os.path.join(HERE, "astroqa", "subjective question_EN.xlsx")
+TORQUE_GLOB = os.path.join(HERE, "torque", "*.json")
+
+
+def load_astro(path):
+    import pandas as pd
+    from datasets import Dataset
+
+    return Dataset.from_pandas(pd.read_excel(path).astype(str))
+
+
+def build_astro_j(n, seed):
+    return [map_astro_j(ex) for ex in sample_prefix(load_astro(ASTRO_J_FILE), n, seed)]
+
+
+def build_astro_s(n, seed):
+    return [map_astro_s(ex) for ex in sample_prefix(load_astro(ASTRO_S_FILE), n, seed)]
+
+
+def build_medqa(n, seed):
+    from datasets import load_dataset
+
+    # --- GlobalMedQA (HuggingFace) — English, single answer only ---
+    medqa = load_dataset("mariocedo/GlobalMedQA", "full", split="train",
+                         revision=MEDQA_REVISION)
+    medqa = medqa.filter(
+        lambda batch: [lang == "EN" and multi is False
+                       for lang, multi in zip(batch["language"], batch["multiple_answers"])],
+        batched=True)
+    return [map_medqa(ex) for ex in sample_prefix(medqa, n, seed)]
+
 
-# TORQUE: map each example and flatten the list
-torque_mapped_list = []
-for ex in torque_200:
-    torque_mapped_list.extend(map_torque(ex))
+def build_torque(n, seed):
+    from datasets import load_dataset
 
-# Ensure max 250 QAs for TORQUE after mapping
-torque_mapped_list = random.sample(torque_mapped_list, min(250, len(torque_mapped_list)))
-torque_mapped = Dataset.from_list(torque_mapped_list)
+    # --- TORQUE (GitHub local JSON files) ---
+    torque = load_dataset("json", data_files=TORQUE_GLOB, split="train").shuffle(seed=seed)
 
-hotpot_mapped = hotpot_200.map(map_hotpot)
+    # Documents in seeded order, each with its own seeded rng, until n QA
+    # pairs are collected: deterministic, and a smaller n is a prefix.
+    mapped = []
+    for i, ex in enumerate(torque):
+        mapped.extend(map_torque(ex, random.Random(f"{seed}:{i}")))
+        if len(mapped) >= n:
+            break
+    return mapped[:n]
+
+
+def build_hotpot(n, seed):
+    from datasets import load_dataset
+
+    # --- HotpotQA (HuggingFace) ---
+    hotpot = load_dataset("hotpotqa/hotpot_qa", "distractor", split="train",
+                          revision=HOTPOT_REVISION)
+    return [map_hotpot(ex) for ex in sample_prefix(hotpot, n, seed)]
+
+
+@dataclass(frozen=True)
+class Source:
+    name: str
+    build: object       # build(n, seed) -> list of records
+    version: str        # content hash or pinned revision
+
+
+def source_versions():
+    # Computed in the parent only; sources are pickled to the workers,
+    # so build functions must be module-level.
+    return {
+        "astro_judgement": file_hash([ASTRO_J_FILE]),
+        "astro_subjective": file_hash([ASTRO_S_FILE]),
+        "medqa": f"mariocedo/GlobalMedQA@{MEDQA_REVISION}",
+        "torque": file_hash(glob.glob(TORQUE_GLOB)),
+        "hotpot": f"hotpotqa/hotpot_qa@{HOTPOT_REVISION}",
+    }
+
+
+BUILDERS = [  # output order
+    ("astro_judgement", build_astro_j),
+    ("astro_subjective", build_astro_s),
+    ("medqa", build_medqa),
+    ("torque", build_torque),
+    ("hotpot", build_hotpot),
+]
+
+
+def sources():
+    versions = source_versions()
+    return [Source(name, fn, versions[name]) for name, fn in BUILDERS]
 
 # ============================================================
-# 4. COMBINE ALL INTO ONE DATASET
+# CACHE
 # ============================================================
 
-questions = (
-    astro_mapped_j["question"][:] +
-    astro_mapped_s["question"][:] +
-    medqa_mapped["question"][:] +
-    torque_mapped["question"][:] +
-    hotpot_mapped["question"][:]
-)
-
-answers = (
-    astro_mapped_j["answer"][:] +
-    astro_mapped_s["answer"][:] +
-    medqa_mapped["answer"][:] +
-    torque_mapped["answer"][:] +
-    hotpot_mapped["answer"][:]
-)
-
-sources = (
-    astro_mapped_j["source"][:] +
-    astro_mapped_s["source"][:] +
-    medqa_mapped["source"][:] +
-    torque_mapped["source"][:] +
-    hotpot_mapped["source"][:]
-)
-
-types = (
-astro_mapped_j["type"][:] +
-    astro_mapped_s["type"][:] +
-    medqa_mapped["type"][:] +
-    torque_mapped["type"][:] +
-    hotpot_mapped["type"][:]
-)
-
-ids = list(range(len(questions)))  # or start from 1 if you prefer
-
-combined = Dataset.from_dict({
-    "id": ids,              # <-- FIRST COLUMN
-    "question": questions,
-    "answer": answers,
-    "type": types,
-    "source": sources,
-})
-
-
-print(combined)
-print("Total examples:", len(combined))
+def cache_key(source, seed):
+    raw = f"{source.name}|{source.version}|{seed}|{MAP_VERSION}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def cached_sample(source, key, n):
+    """A cached sample of at least n requested items with the same key, if any."""
+    pattern = os.path.join(CACHE_DIR, f"{source.name}-{key}-n*.arrow")
+    sizes = sorted(int(p.rsplit("-n", 1)[1][:-len(".arrow")]) for p in glob.glob(pattern))
+    for size in sizes:
+        if size >= n:
+            path = os.path.join(CACHE_DIR, f"{source.name}-{key}-n{size}.arrow")
+            return feather.read_table(path)
+    return None
+
+
+def load_source(source, n, seed, use_cache=True):
+    """Mapped sample of one source as an Arrow table; runs in a worker."""
+    key = cache_key(source, seed)
+    if use_cache:
+        table = cached_sample(source, key, n)
+        if table is not None:
+            return source.name, table.slice(0, n), True
+
+    size = max(n, PREFETCH)
+    records = source.build(size, seed)
+    table = pa.Table.from_pylist(records, schema=pa.schema([(c, pa.string()) for c in COLUMNS]))
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{source.name}-{key}-n{size}.arrow")
+    feather.write_feather(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return source.name, table.slice(0, n), False
 
 # ============================================================
-# 5. SAVE FINAL MERGED DATASET
+# COMBINE ALL INTO ONE DATASET
 # ============================================================
 
-combined.to_json("combined_qa_dataset_800.jsonl")
+def build(per_source=SAMPLE_SIZE, seed=SEED, workers=None, use_cache=True):
+    todo = sources()
+    with ProcessPoolExecutor(max_workers=workers or len(todo)) as pool:
+        futures = [pool.submit(load_source, s, per_source, seed, use_cache) for s in todo]
+        results = [f.result() for f in futures]
+
+    for name, table, cached in results:
+        print(f"{name:18s} {table.num_rows:5d} items {'(cache)' if cached else ''}")
+
+    combined = pa.concat_tables([table for _, table, _ in results])
+    # ids hash source and question, so they do not shift when a source or
+    # the sample size changes
+    ids = item_ids(combined["source"].to_pylist(), combined["question"].to_pylist())
+    combined = combined.add_column(0, "id", pa.array(ids, pa.string()))
+    return combined
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the combined QA dataset")
+    parser.add_argument("--per-source", type=int, default=SAMPLE_SIZE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true", help="rebuild every source")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    combined = build(args.per_source, args.seed, args.workers, not args.no_cache)
+    print("Total examples:", combined.num_rows)
+
+    # ============================================================
+    # SAVE FINAL MERGED DATASET
+    # ============================================================
+    combined.to_pandas().to_json(args.output, orient="records", lines=True)
+    print(f"Saved -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
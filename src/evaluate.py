@@ -4,17 +4,35 @@ import pandas as pd
 import numpy as np
 import re
 import os
+import sys
 
-# INPUT_CSV = "outputs/baseline_groq_cot.csv"   # change for COT or Self-Consistency
-INPUT_CSV = max(
-    ["outputs/baseline_groq.csv",
-     "outputs/baseline_groq_cot.csv",
-     "outputs/self_consistency_groq.csv"],
-    key=lambda x: os.path.getmtime(x)
-)
+# shared pipeline modules (run registry, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from run_registry import find_runs, set_eval_path
+from tracing import span
+
+# Runs are selected from the run registry by attribute instead of picking the
+# newest of a few hardcoded CSVs. Any run column can be used as a filter,
+# e.g. {"method": "cot"} or {"model": ["llama-3.3-70b-versatile"]}.
+RUN_FILTERS = {"dataset": "hotpot_clean"}
+LATEST_ONLY = True   # newest run per (method, model, dataset)
+
+EVAL_DIR = "outputs/eval"
+OUTPUT_CSV = "outputs/eval_results.csv"
 
 NUM_BINS = 10
 
+# "containment": semantic_match below. "embedding": additionally counts
+# pred and gold as equal when their sentence embeddings are close
+# (src_combined/embeddings.py), e.g. "Obama" vs "Barack H. Obama".
+MATCH = "containment"
+
+# Rows per chunk for result files too large to load at once (see
+# src_combined/chunked_eval.py): only pred / gold / confidence are read and
+# a compact detail file is written per run. None = load whole files.
+CHUNK_SIZE = None
+WORKERS = 1   # processes scoring chunks
+
 # ------------------------------
 # Normalize text for comparison
 # ------------------------------
@@ -88,33 +106,99 @@ def compute_ece(probs, correct, num_bins=10):
     return ece
 
 # ------------------------------
-# Main evaluation
+# Evaluate one run
 # ------------------------------
-def main():
-    df = pd.read_csv(INPUT_CSV)
-
+def correctness(preds, golds):
+    """0/1 per (pred, gold) with the configured MATCH."""
+    correct = np.array([semantic_match(p, g) for p, g in zip(preds, golds)], dtype=bool)
+    if MATCH == "embedding":
+        from embeddings import semantic_matches
+
+        close = semantic_matches(preds.astype(str), golds.astype(str))
+        correct |= np.array(close, dtype=bool)
+    return correct.astype(int)
+
+def score_chunk(chunk):
+    """Chunk scorer of the chunked mode."""
+    return pd.DataFrame({"correct": correctness(chunk["pred"], chunk["gold"])},
+                        index=chunk.index)
+
+def evaluate_run(df):
     # Fix missing confidence
     df["confidence"] = df["confidence"].fillna(0.5)
 
     # Compute semantic correctness
-    df["correct"] = df.apply(
-        lambda row: semantic_match(row["pred"], row["gold"]), axis=1
-    ).astype(int)
+    df["correct"] = correctness(df["pred"], df["gold"])
 
     probs = df["confidence"].values
     correct = df["correct"].values
 
-    acc = correct.mean()
-    brier = brier_score(correct, probs)
-    ece = compute_ece(probs, correct, NUM_BINS)
+    return {
+        "accuracy": correct.mean(),
+        "brier": brier_score(correct, probs),
+        "ece": compute_ece(probs, correct, NUM_BINS),
+    }
+
+# ------------------------------
+# Main evaluation
+# ------------------------------
+def main():
+    runs = find_runs(latest=LATEST_ONLY, **RUN_FILTERS)
+    if not runs:
+        print(f"No registered runs match {RUN_FILTERS}")
+        return
+
+    os.makedirs(EVAL_DIR, exist_ok=True)
+    if CHUNK_SIZE:
+        return main_chunked(runs)
+    frames = []
+
+    for run in runs:
+        with span("read_csv", run_id=run["run_id"]):
+            df = pd.read_csv(run["path"])
+        with span("evaluate_run", run_id=run["run_id"]):
+            metrics = evaluate_run(df)
+
+        print(f"=== Evaluation: {run['run_id']} ({run['method']}, {run['model']}) ===")
+        print(f"Accuracy       : {metrics['accuracy']:.3f}")
+        print(f"Brier Score    : {metrics['brier']:.3f}")
+        print(f"ECE (10 bins)  : {metrics['ece']:.3f}")
+
+        eval_path = os.path.join(EVAL_DIR, f"{run['run_id']}.csv")
+        with span("write_csv", run_id=run["run_id"]):
+            df.to_csv(eval_path, index=False)
+        set_eval_path(run["run_id"], eval_path)
+
+        df.insert(0, "run_id", run["run_id"])
+        df.insert(1, "method", run["method"])
+        frames.append(df)
+
+    with span("write_csv"):
+        pd.concat(frames, ignore_index=True).to_csv(OUTPUT_CSV, index=False)
+    print(f"Saved detailed results for {len(runs)} run(s) -> {OUTPUT_CSV}")
+
+def main_chunked(runs):
+    from chunked_eval import evaluate_file
+
+    evaluated = 0
+    for run in runs:
+        eval_path = os.path.join(EVAL_DIR, f"{run['run_id']}.csv")
+        with span("evaluate_file", run_id=run["run_id"], chunk_size=CHUNK_SIZE):
+            stats = evaluate_file(run["path"], score_chunk, detail_path=eval_path,
+                                  chunk_size=CHUNK_SIZE, workers=WORKERS, num_bins=NUM_BINS)
+        if not stats.n:
+            print(f"Skipping {run['run_id']}: {run['path']} has no result rows")
+            continue
+        set_eval_path(run["run_id"], eval_path)
+        evaluated += 1
+        metrics = stats.table("run").iloc[0]
 
-    print("=== Evaluation ===")
-    print(f"Accuracy       : {acc:.3f}")
-    print(f"Brier Score    : {brier:.3f}")
-    print(f"ECE (10 bins)  : {ece:.3f}")
+        print(f"=== Evaluation: {run['run_id']} ({run['method']}, {run['model']}) ===")
+        print(f"Accuracy       : {metrics['accuracy']:.3f}")
+        print(f"Brier Score    : {metrics['brier']:.3f}")
+        print(f"ECE (10 bins)  : {metrics['ece']:.3f}")
 
-    df.to_csv("outputs/eval_results.csv", index=False)
-    print("Saved detailed results -> outputs/eval_results.csv")
+    print(f"Saved compact detail files for {evaluated} run(s) -> {EVAL_DIR}/")
 
 if __name__ == "__main__":
     main()
@@ -1,58 +1,63 @@
 # src/inference_groq.py
 
-from groq import Groq
-from dotenv import load_dotenv
-load_dotenv()
-
 import os
-import pandas as pd
-import re
-from tqdm import tqdm
+import sys
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# shared pipeline modules (run registry, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from llm_client import complete, model_label
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from tracing import span
+from prompt_builder import load_prompt, PromptStats
+from utils import parse_confidence
 
 INPUT_FILE = "data/processed/hotpot_clean.jsonl"
-OUTPUT_CSV = "outputs/baseline_groq.csv"
-PROMPT_TEMPLATE = open("prompts/baseline.txt").read()
+METHOD = "baseline"  # results go to outputs/baseline/<run_id>.csv
+PROMPT_FILE = "prompts/baseline.txt"
 
 
 # MODEL_NAME = "llama-3.1-8b-instant"
 MODEL_NAME = "llama-3.3-70b-versatile"
 
-def parse_confidence(text):
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    last = lines[-1]
-    m = re.match(r"^0(\.\d+)?$|^1(\.0+)?$", last)
-    return float(last) if m else None
-
 def main():
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
+    import pandas as pd
+    from tqdm import tqdm
 
-    df = pd.read_json(INPUT_FILE, lines=True)
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
     df = df.head(20)  # test on 20 examples first
 
     rows = []
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    prompt_stats = PromptStats()
+    template = load_prompt(PROMPT_FILE, ["context", "question"])
+    started_at = now()
 
     for _, row in tqdm(df.iterrows(), total=len(df)):
         context = row["context"]
         question = row["question"]
         gold = row["answer"]
 
-        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+        with span("format_prompt"):
+            prompt = template.render(context=context, question=question)
 
-        
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        prompt_stats.add(template, prompt)
+
+        response = complete(MODEL_NAME, prompt, usage)
 
         text = response.choices[0].message.content
 
-        conf = parse_confidence(text)
-        lines = text.split("\n")
-        pred = lines[-2].strip() if len(lines) >= 2 else lines[-1].strip()
+        with span("parse"):
+            conf = parse_confidence(text)
+            lines = text.split("\n")
+            pred = lines[-2].strip() if len(lines) >= 2 else lines[-1].strip()
 
         rows.append({
+            "id": row.get("id"),
             "question": question,
             "gold": gold,
             "pred": pred,
@@ -60,8 +65,21 @@ def main():
             "raw_response": text
         })
 
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print("Saved ->", OUTPUT_CSV)
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print("Saved ->", output_csv)
+
+    print(prompt_stats.summary())
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=1,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
+        )
 
 if __name__ == "__main__":
     main()
@@ -1,57 +1,58 @@
 # src/inference_groq_cot.py
 
-from groq import Groq
-from dotenv import load_dotenv
-load_dotenv()
-
 import os
-import pandas as pd
-import re
-from tqdm import tqdm
+import sys
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# shared pipeline modules (run registry, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from llm_client import complete, model_label
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from tracing import span
+from prompt_builder import load_prompt, PromptStats
+from utils import parse_confidence, parse_answer
 
 INPUT_FILE = "data/processed/hotpot_clean.jsonl"
-OUTPUT_CSV = "outputs/baseline_groq_cot.csv"
-PROMPT_TEMPLATE = open("prompts/cot.txt").read()
+METHOD = "cot"  # results go to outputs/cot/<run_id>.csv
+PROMPT_FILE = "prompts/cot.txt"
 
 # MODEL_NAME = "llama-3.1-8b-instant"  # working model
 MODEL_NAME = "llama-3.3-70b-versatile"  # working model
 
-def parse_confidence(text):
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    last = lines[-1]
-    m = re.match(r"^0(\.\d+)?$|^1(\.0+)?$", last)
-    return float(last) if m else None
-
-def parse_answer(text):
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    if len(lines) >= 2:
-        return lines[-2]
-    return lines[-1]
-
 def main():
-    df = pd.read_json(INPUT_FILE, lines=True).head(20)
-    os.makedirs("outputs", exist_ok=True)
+    import pandas as pd
+    from tqdm import tqdm
+
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True).head(20)
 
     rows = []
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    prompt_stats = PromptStats()
+    template = load_prompt(PROMPT_FILE, ["context", "question"])
+    started_at = now()
 
     for _, row in tqdm(df.iterrows(), total=len(df)):
-        prompt = PROMPT_TEMPLATE.format(
-            context=row["context"],
-            question=row["question"]
-        )
+        with span("format_prompt"):
+            prompt = template.render(
+                context=row["context"],
+                question=row["question"]
+            )
 
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}]
-        )
+        prompt_stats.add(template, prompt)
+
+        response = complete(MODEL_NAME, prompt, usage)
 
         text = response.choices[0].message.content
-        pred = parse_answer(text)
-        confidence = parse_confidence(text)
+        with span("parse"):
+            pred = parse_answer(text)
+            confidence = parse_confidence(text)
 
         rows.append({
+            "id": row.get("id"),
             "question": row["question"],
             "gold": row["answer"],
             "pred": pred,
@@ -59,8 +60,21 @@ def main():
             "raw": text
         })
 
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print("Saved ->", OUTPUT_CSV)
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print("Saved ->", output_csv)
+
+    print(prompt_stats.summary())
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=1,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
+        )
 
 if __name__ == "__main__":
     main()
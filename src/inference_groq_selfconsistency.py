@@ -1,74 +1,96 @@
 # src/inference_groq_selfconsistency.py
 
-from groq import Groq
-from dotenv import load_dotenv
-load_dotenv()
-
 import os
-import pandas as pd
-import re
-from collections import Counter
-from tqdm import tqdm
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+import sys
+
+# shared pipeline modules (run registry, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from llm_client import complete, model_label
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from tracing import span
+from prompt_builder import load_prompt, PromptStats
+from sample_store import SampleWriter, majority_vote, samples_path
+from utils import parse_confidence, parse_answer
 
 INPUT_FILE = "data/processed/hotpot_clean.jsonl"
-OUTPUT_CSV = "outputs/self_consistency_groq.csv"
-PROMPT_TEMPLATE = open("prompts/cot.txt").read()
+METHOD = "self_consistency"  # results go to outputs/self_consistency/<run_id>.csv
+PROMPT_FILE = "prompts/cot.txt"
 
 MODEL_NAME = "llama-3.3-70b-versatile"
 NUM_SAMPLES = 5  # number of CoT samples per question
 
-def parse_confidence(text):
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    last = lines[-1]
-    m = re.match(r"^0(\.\d+)?$|^1(\.0+)?$", last)
-    return float(last) if m else None
-
-def parse_answer(text):
-    lines = [l.strip() for l in text.split("\n") if l.strip()]
-    return lines[-2] if len(lines) >= 2 else lines[-1]
-
 def main():
-    df = pd.read_json(INPUT_FILE, lines=True).head(20)
-    os.makedirs("outputs", exist_ok=True)
+    import pandas as pd
+    from tqdm import tqdm
 
-    rows = []
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True).head(20)
 
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        prompt = PROMPT_TEMPLATE.format(
-            context=row["context"],
-            question=row["question"]
-        )
+    rows = []
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    output_samples = samples_path(output_csv)    # one row per sample, see sample_store.py
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    prompt_stats = PromptStats()
+    template = load_prompt(PROMPT_FILE, ["context", "question"])
+    started_at = now()
+    samples = SampleWriter(output_samples)
+
+    for question_idx, (_, row) in enumerate(tqdm(df.iterrows(), total=len(df))):
+        with span("format_prompt"):
+            prompt = template.render(
+                context=row["context"],
+                question=row["question"]
+            )
 
         answers = []
         confidences = []
+        raw_samples = []
 
         for _ in range(NUM_SAMPLES):
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=1.0  # exploration
-            )
+            prompt_stats.add(template, prompt)
+            response = complete(MODEL_NAME, prompt, usage, temperature=1.0)  # exploration
 
             text = response.choices[0].message.content
-            answers.append(parse_answer(text))
-            confidences.append(parse_confidence(text) or 0.5)
+            with span("parse"):
+                answers.append(parse_answer(text))
+                confidences.append(parse_confidence(text) or 0.5)
+            raw_samples.append(text)
+
+        samples.add(question_idx, answers, confidences, raw_samples)
 
         # majority vote
-        pred = Counter(answers).most_common(1)[0][0]
-        avg_conf = sum(confidences) / len(confidences)
+        pred, avg_conf, vote_share = majority_vote(answers, confidences)
 
         rows.append({
+            "id": row.get("id"),
             "question": row["question"],
             "gold": row["answer"],
             "pred": pred,
             "confidence": avg_conf,
-            "samples": answers
+            "num_samples": len(answers),
+            "vote_share": vote_share,
         })
 
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print("Saved ->", OUTPUT_CSV)
+    samples.close()
+
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print("Saved ->", output_csv, "samples ->", output_samples)
+
+    print(prompt_stats.summary())
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=NUM_SAMPLES,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
+        )
 
 if __name__ == "__main__":
     main()
@@ -1,103 +1,177 @@
 # src/plot_metrics.py
 
 import pandas as pd
-import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # headless, no GUI toolkit needed
 import matplotlib.pyplot as plt
+import hashlib
+import json
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# shared pipeline modules (run registry, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from run_registry import find_runs
+from calibration import bin_table
+from tracing import span, count
+
+# Evaluated runs (see evaluate_com.py) are picked from the run registry.
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+LATEST_ONLY = False  # plot every evaluated run, unchanged ones are skipped
 
-INPUT_CSV = "outputs/eval_results_detailed.csv"
 OUT_DIR = "outputs/plots"
+DPI = 150            # raise to 300 for publication figures
+PLOT_WORKERS = os.cpu_count() or 1
 
-os.makedirs(OUT_DIR, exist_ok=True)
+# only these columns are read from the detailed result files
+PLOT_COLUMNS = ["confidence", "exact_match", "token_f1", "bertscore"]
+HASH_FILE = ".plot_hashes.json"
 
 
-def plot_accuracy_bars(df):
+def plot_accuracy_bars(df, out_dir=OUT_DIR):
     """Bar chart comparing accuracy metrics."""
-    metrics = ["exact_match", "token_f1", "bertscore"]
-    values = [df["exact_match"].mean(),
-              df["token_f1"].mean(),
-              df["bertscore"].mean()]
+    # chunked evaluations (see chunked_eval.py) have no bertscore column
+    colors = {"exact_match": "#4E79A7", "token_f1": "#F28E2B", "bertscore": "#59A14F"}
+    metrics = [m for m in colors if m in df.columns]
+    values = [df[m].mean() for m in metrics]
 
     plt.figure(figsize=(7, 5))
-    plt.bar(metrics, values, color=["#4E79A7", "#F28E2B", "#59A14F"])
+    plt.bar(metrics, values, color=[colors[m] for m in metrics])
     plt.ylim(0, 1)
     plt.title("Accuracy Metrics Comparison")
     plt.ylabel("Score")
-    plt.savefig(f"{OUT_DIR}/accuracy_comparison.png", dpi=300)
+    plt.savefig(f"{out_dir}/accuracy_comparison.png", dpi=DPI)
     plt.close()
 
 
-def plot_confidence_hist(df):
+def plot_confidence_hist(df, out_dir=OUT_DIR):
     """Histogram of model confidence."""
     plt.figure(figsize=(7, 5))
     plt.hist(df["confidence"], bins=20, color="#4E79A7", alpha=0.7)
     plt.title("Confidence Distribution")
     plt.xlabel("Confidence")
     plt.ylabel("Frequency")
-    plt.savefig(f"{OUT_DIR}/confidence_histogram.png", dpi=300)
+    plt.savefig(f"{out_dir}/confidence_histogram.png", dpi=DPI)
     plt.close()
 
 
-def plot_reliability_curve(df):
+def plot_reliability_curve(df, out_dir=OUT_DIR):
     """Calibration reliability curve (ECE visualization)."""
-    num_bins = 10
-    bins = np.linspace(0, 1, num_bins + 1)
-
-    df["bin"] = np.digitize(df["confidence"], bins) - 1
-    bin_acc = []
-    bin_conf = []
-
-    for b in range(num_bins):
-        subset = df[df["bin"] == b]
-        if len(subset) == 0:
-            continue
-        bin_conf.append(subset["confidence"].mean())
-        bin_acc.append(subset["exact_match"].mean())
+    # all bin statistics from one groupby instead of one scan per bin
+    bins = bin_table(df.assign(run="run"), ["run"], correct_col="exact_match", num_bins=10)
 
     plt.figure(figsize=(7, 5))
-    plt.plot(bin_conf, bin_acc, marker="o", label="Model")
+    plt.plot(bins["conf"], bins["acc"], marker="o", label="Model")
     plt.plot([0, 1], [0, 1], "--", color="gray", label="Perfect Calibration")
     plt.title("Reliability Curve")
     plt.xlabel("Confidence")
     plt.ylabel("Accuracy")
     plt.legend()
-    plt.savefig(f"{OUT_DIR}/reliability_curve.png", dpi=300)
+    plt.savefig(f"{out_dir}/reliability_curve.png", dpi=DPI)
     plt.close()
 
 
-def plot_conf_vs_bert(df):
+def plot_conf_vs_bert(df, out_dir=OUT_DIR):
     """Scatter plot of confidence vs BERTScore F1."""
     plt.figure(figsize=(7, 5))
     plt.scatter(df["confidence"], df["bertscore"], alpha=0.6, color="#F28E2B")
     plt.xlabel("Confidence")
     plt.ylabel("BERTScore F1")
     plt.title("Confidence vs Semantic Quality")
-    plt.savefig(f"{OUT_DIR}/conf_vs_bert.png", dpi=300)
+    plt.savefig(f"{out_dir}/conf_vs_bert.png", dpi=DPI)
     plt.close()
 
 
-def plot_bert_box(df):
+def plot_bert_box(df, out_dir=OUT_DIR):
     """Boxplot of BERTScore distribution."""
     plt.figure(figsize=(5, 6))
     plt.boxplot(df["bertscore"], vert=True)
     plt.ylabel("BERTScore F1")
     plt.title("BERTScore Distribution")
-    plt.savefig(f"{OUT_DIR}/bert_score_boxplot.png", dpi=300)
+    plt.savefig(f"{out_dir}/bert_score_boxplot.png", dpi=DPI)
     plt.close()
 
 
-def main():
-    df = pd.read_csv(INPUT_CSV)
-
-    print("Generating plots...")
+FIGURES = {
+    "accuracy_comparison.png": plot_accuracy_bars,
+    "confidence_histogram.png": plot_confidence_hist,
+    "reliability_curve.png": plot_reliability_curve,
+    "conf_vs_bert.png": plot_conf_vs_bert,
+    "bert_score_boxplot.png": plot_bert_box,
+}
+
+# figures that need a column not every detail file has
+FIGURE_COLUMNS = {
+    "conf_vs_bert.png": "bertscore",
+    "bert_score_boxplot.png": "bertscore",
+}
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def render_run(run):
+    """Render the figures of one run whose input changed; returns the count."""
+    out_dir = os.path.join(OUT_DIR, run["run_id"])
+    os.makedirs(out_dir, exist_ok=True)
+
+    hash_path = os.path.join(out_dir, HASH_FILE)
+    old_hashes = {}
+    if os.path.exists(hash_path):
+        with open(hash_path) as f:
+            old_hashes = json.load(f)
+
+    key = f"{file_hash(run['eval_path'])}:{DPI}"
+    header = pd.read_csv(run["eval_path"], nrows=0).columns
+    figures = [name for name in FIGURES
+               if FIGURE_COLUMNS.get(name, "confidence") in header]
+    stale = [name for name in figures
+             if old_hashes.get(name) != key
+             or not os.path.exists(os.path.join(out_dir, name))]
+    if not stale:
+        return 0
+
+    with span("read_csv", run_id=run["run_id"]):
+        df = pd.read_csv(run["eval_path"], usecols=lambda c: c in PLOT_COLUMNS)
+    df["confidence"] = df["confidence"].fillna(0.5)
+
+    # only recorded when rendering in-process; pool workers are not traced
+    for name in stale:
+        with span("figure", figure=name):
+            FIGURES[name](df, out_dir)
+        old_hashes[name] = key
+
+    with open(hash_path, "w") as f:
+        json.dump(old_hashes, f, indent=2)
+    return len(stale)
 
-    plot_accuracy_bars(df)
-    plot_confidence_hist(df)
-    plot_reliability_curve(df)
-    plot_conf_vs_bert(df)
-    plot_bert_box(df)
 
-    print(f"All plots saved in {OUT_DIR}/")
+def main():
+    runs = [r for r in find_runs(latest=LATEST_ONLY, **RUN_FILTERS) if r["eval_path"]]
+    if not runs:
+        print(f"No evaluated runs match {RUN_FILTERS}; run evaluate_com.py first")
+        return
+
+    print(f"Generating plots for {len(runs)} run(s)...")
+
+    workers = min(PLOT_WORKERS, len(runs))
+    with span("render", runs=len(runs), workers=workers):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                rendered = list(pool.map(render_run, runs))
+        else:
+            rendered = [render_run(run) for run in runs]
+    count("figures_rendered", sum(rendered))
+
+    print(f"Rendered {sum(rendered)} figure(s), "
+          f"{len(runs) * len(FIGURES) - sum(rendered)} unchanged or not applicable; "
+          f"plots saved in {OUT_DIR}/<run_id>/")
 
 
 if __name__ == "__main__":
@@ -1,48 +1,177 @@
 # src/prepare_data.py
 
-from datasets import load_dataset, DownloadConfig
-import pandas as pd
+"""
+Download a Hugging Face dataset and save every split as JSONL.
+
+    python src/prepare_data.py              # hotpotqa/hotpot_qa -> data/raw/hotpotqa
+    python src/prepare_data.py --offline    # only use what is already cached
+
+Splits are streamed to disk in batches. Their sha256 and the dataset
+fingerprint are recorded in <save_dir>/manifest.json, so a split that is
+already written and unchanged is skipped. When a download fails its
+consistency check, only the failing dataset's cache files are removed
+before the retry, not the whole Hugging Face cache.
+"""
+
+import argparse
+import hashlib
+import json
 import os
 import shutil
+import sys
 from pathlib import Path
 
+# shared pipeline modules (tracing, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+from tracing import span, count
+
+DATASET = "hotpotqa/hotpot_qa"
+SAVE_DIR = "data/raw/hotpotqa"
+CONFIGS = {"hotpotqa/hotpot_qa": "distractor"}
+
+WRITE_BATCH = 1000
+MANIFEST = "manifest.json"
+
 def get_hf_cache_dir():
     hf_cache = os.getenv("HF_DATASETS_CACHE")
     if hf_cache:
         return Path(hf_cache)
     return Path.home() / ".cache" / "huggingface" / "datasets"
 
-def load_and_save(dataset_name, save_dir):
+def get_hub_cache_dir():
+    hub_cache = os.getenv("HF_HUB_CACHE")
+    if hub_cache:
+        return Path(hub_cache)
+    return Path(os.getenv("HF_HOME", Path.home() / ".cache" / "huggingface")) / "hub"
+
+def dataset_cache_paths(dataset_name):
+    """Cache entries of one dataset: the prepared Arrow files, the hub
+    snapshot and the raw downloads whose metadata points at it."""
+    org_name = dataset_name.replace("/", "___")
+    cache = get_hf_cache_dir()
+    paths = [cache / org_name, get_hub_cache_dir() / f"datasets--{dataset_name.replace('/', '--')}"]
+
+    downloads = cache / "downloads"
+    if downloads.exists():
+        for meta in downloads.glob("*.json"):
+            try:
+                url = json.loads(meta.read_text()).get("url", "")
+            except (OSError, ValueError):
+                continue
+            if dataset_name in url:
+                data = meta.with_suffix("")
+                paths += [meta, data, Path(f"{data}.lock")]
+
+    return [p for p in paths if p.exists()]
+
+def clear_dataset_cache(dataset_name):
+    for path in dataset_cache_paths(dataset_name):
+        print(f"Deleting {path} ...")
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+def load(dataset_name, **kwargs):
+    from datasets import load_dataset
+
+    return load_dataset(dataset_name, CONFIGS.get(dataset_name), **kwargs)
+
+# ------------------------------------------------
+# Manifest: sha256 + fingerprint per written split
+# ------------------------------------------------
+def read_manifest(save_dir):
+    path = os.path.join(save_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def write_manifest(save_dir, manifest):
+    path = os.path.join(save_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def split_is_current(entry, save_path, fingerprint):
+    return (entry is not None
+            and entry.get("fingerprint") == fingerprint
+            and os.path.exists(save_path)
+            and os.path.getsize(save_path) == entry.get("bytes")
+            and file_sha256(save_path) == entry.get("sha256"))
+
+def write_split(split_ds, save_path):
+    """Stream a split to JSONL in batches; returns (rows, bytes, sha256)."""
+    h = hashlib.sha256()
+    rows = size = 0
+    with open(save_path + ".tmp", "wb") as f:
+        for batch in split_ds.iter(batch_size=WRITE_BATCH):
+            columns = list(batch)
+            lines = "".join(json.dumps(dict(zip(columns, values))) + "\n"
+                            for values in zip(*batch.values())).encode("utf-8")
+            f.write(lines)
+            h.update(lines)
+            rows += len(batch[columns[0]]) if columns else 0
+            size += len(lines)
+    os.replace(save_path + ".tmp", save_path)
+    return rows, size, h.hexdigest()
+
+def load_and_save(dataset_name, save_dir, offline=False):
     print(f"Loading dataset: {dataset_name} ...")
 
     try:
-        if dataset_name == "hotpotqa/hotpot_qa":
-            ds = load_dataset("hotpotqa/hotpot_qa", "distractor")
-        else:
-            ds = load_dataset(dataset_name)
-    except OSError as e:
-        if "Consistency check failed" in str(e):
-            print("⚠ Consistency check failed. Clearing cache and retrying...")
-
-            cache_path = get_hf_cache_dir()
-            if cache_path.exists():
-                print(f"Deleting cache at {cache_path} ...")
-                shutil.rmtree(cache_path)
-
-            ds = load_dataset("hotpotqa/hotpot_qa", "distractor", 
-                              download_config=DownloadConfig(force_download=True))
-        else:
+        with span("load_dataset", dataset=dataset_name, offline=offline):
+            ds = load(dataset_name)
+    except (OSError, ConnectionError) as e:
+        if offline:
+            sys.exit(f"{dataset_name} is not fully cached; run once without --offline ({e})")
+        if "Consistency check failed" not in str(e):
             raise
+        print("⚠ Consistency check failed. Clearing this dataset's cache and retrying...")
+        from datasets import DownloadConfig
+
+        clear_dataset_cache(dataset_name)
+        with span("load_dataset", dataset=dataset_name, force_download=True):
+            ds = load(dataset_name, download_config=DownloadConfig(force_download=True))
 
     os.makedirs(save_dir, exist_ok=True)
+    manifest = read_manifest(save_dir)
 
     for split in ds.keys():
-        df = pd.DataFrame(ds[split])
         save_path = os.path.join(save_dir, f"{split}.jsonl")
-        df.to_json(save_path, orient="records", lines=True)
+        fingerprint = ds[split]._fingerprint
+        if split_is_current(manifest.get(split), save_path, fingerprint):
+            print(f"Up to date {split} -> {save_path}")
+            continue
+
+        with span("write_jsonl", split=split):
+            rows, size, sha256 = write_split(ds[split], save_path)
+        count("rows", rows)
+        manifest[split] = {"rows": rows, "bytes": size, "sha256": sha256,
+                           "fingerprint": fingerprint}
+        write_manifest(save_dir, manifest)
         print(f"Saved {split} -> {save_path}")
 
     print("✅ Done!\n")
 
 if __name__ == "__main__":
-    load_and_save("hotpotqa/hotpot_qa", "data/raw/hotpotqa")
+    parser = argparse.ArgumentParser(description="Save a Hugging Face dataset as JSONL")
+    parser.add_argument("dataset", nargs="?", default=DATASET)
+    parser.add_argument("--save-dir", default=SAVE_DIR)
+    parser.add_argument("--offline", action="store_true",
+                        help="use only already-cached data, never touch the network")
+    args = parser.parse_args()
+
+    if args.offline:
+        # read by datasets / huggingface_hub at import time
+        os.environ["HF_DATASETS_OFFLINE"] = "1"
+        os.environ["HF_HUB_OFFLINE"] = "1"
+
+    load_and_save(args.dataset, args.save_dir, offline=args.offline)
@@ -4,9 +4,16 @@ Output fields: id, question, answer, context, supporting_facts (optional)
 """
 
 import json
+import os
+import sys
 from pathlib import Path
 from typing import Any, Dict, List
 
+# shared pipeline modules (tracing, ...) live in src_combined/
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src_combined"))
+import tracing
+from dedup import item_id
+
 RAW_PATH = Path("data/raw/hotpotqa/validation.jsonl")
 OUT_PATH = Path("data/processed/hotpot_clean.jsonl")
 
@@ -67,6 +74,7 @@ def extract_context(record: Dict[str, Any]) -> str:
     else:
         return ""
 
+@tracing.span("process")
 def process():
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     count = 0
@@ -78,7 +86,7 @@ def process():
             context = extract_context(obj)
             supporting = extract_supporting_facts(obj)
             out = {
-                "id": obj.get("id") or str(count),
+                "id": obj.get("id") or item_id("hotpotqa", q),
                 "question": q,
                 "answer": a,
                 "context": context,
@@ -86,6 +94,7 @@ def process():
             }
             fout.write(json.dumps(out, ensure_ascii=False) + "\n")
             count += 1
+    tracing.count("records", count)
     print(f"Processed {count} examples -> {OUT_PATH}")
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+# src/utils.py
+
+import re
+
+# Shared by the HotpotQA inference scripts: the prompts ask for the final
+# answer on the second-to-last line and a confidence on the last line.
+
+def parse_confidence(text):
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    last = lines[-1]
+    m = re.match(r"^0(\.\d+)?$|^1(\.0+)?$", last)
+    return float(last) if m else None
+
+def parse_answer(text):
+    lines = [l.strip() for l in text.split("\n") if l.strip()]
+    return lines[-2] if len(lines) >= 2 else lines[-1]
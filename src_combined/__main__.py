@@ -0,0 +1,13 @@
+# src_combined/__main__.py
+
+"""python -m src_combined <command>, see cli.py"""
+
+import os
+import sys
+
+# the modules import each other by plain name (they are also run as scripts)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from cli import main  # noqa: E402
+
+main()
@@ -0,0 +1,198 @@
+# src_combined/aggregators.py
+
+"""
+Self-consistency aggregation rules, computed offline from stored samples.
+
+Every rule runs on the samples of all questions at once (pandas groupby on
+(question, answer)), so a new rule costs no API calls, only a re-run of
+this script over the .samples.parquet files written by the
+self-consistency scripts (see sample_store.py).
+
+Rules (prediction / confidence):
+    majority     most votes / mean verbalized confidence (the original rule)
+    vote_share   most votes / fraction of samples agreeing with it
+    weighted     highest summed verbalized confidence / its share of the total
+    entropy      most votes / 1 - H(vote distribution) / log(num samples)
+
+Answers are grouped by a key before voting:
+    raw          the parsed answer string as is
+    normalized   lowercase, no punctuation, articles or extra whitespace,
+                 so "The Beatles." and "beatles" vote together
+    semantic     normalized, then clustered per question by embedding
+                 similarity, so "Barack Obama" and "Obama" vote together
+                 (see embeddings.py; needs transformers + torch)
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from answer_matching import exact_match
+from calibration import grouped_metrics, format_table
+from run_registry import find_runs, register_run
+from sample_store import samples_path
+
+RULES = ["majority", "vote_share", "weighted", "entropy"]
+ANSWER_KEY = "normalized"
+
+RUN_FILTERS = {"method": "self_consistency"}
+LATEST_ONLY = True
+
+OUTPUT_CSV = "outputs/sc_aggregators.csv"
+
+# Re-aggregated runs for these rules are written next to the original
+# result and registered (method "self_consistency_<rule>"), so
+# evaluate_com.py scores them like any other run. Empty = report only.
+REGISTER_RULES = []
+
+
+# ------------------------------------------------
+# Answer keys
+# ------------------------------------------------
+def normalize_answers(answers):
+    """Vectorized SQuAD-style answer normalization of a string Series."""
+    return (answers.fillna("").astype(str).str.lower()
+            .str.replace(r"[^\w\s]", " ", regex=True)
+            .str.replace(r"\b(a|an|the)\b", " ", regex=True)
+            .str.split().str.join(" "))
+
+
+def answer_keys(answers, key=ANSWER_KEY, groups=None):
+    """Voting key per answer; groups (the question of each answer) is only
+    needed for semantic keys, which are clustered within a question."""
+    if key == "raw":
+        return answers.fillna("").astype(str)
+    if key == "normalized":
+        return normalize_answers(answers)
+    if key == "semantic":
+        from embeddings import semantic_keys
+
+        keys = normalize_answers(answers)
+        return pd.Series(semantic_keys(keys.tolist(), list(groups)), index=answers.index)
+    raise ValueError(f"Unknown answer key: {key}")
+
+
+# ------------------------------------------------
+# Voting
+# ------------------------------------------------
+def vote_table(samples, key=ANSWER_KEY):
+    """
+    One row per (question_idx, answer key): votes, summed confidence, the
+    first raw answer of that group (its display form) and the sample it
+    first appeared in (tie-break: earlier wins, like Counter.most_common).
+    """
+    df = samples[["question_idx", "sample", "pred", "confidence"]].copy()
+    df["confidence"] = df["confidence"].fillna(0.5).astype(float)
+    df["key"] = answer_keys(df["pred"], key, df["question_idx"])
+    df = df.sort_values(["question_idx", "sample"], kind="stable")
+
+    votes = (df.groupby(["question_idx", "key"], sort=False)
+             .agg(votes=("pred", "size"), conf_sum=("confidence", "sum"),
+                  first=("sample", "min"), pred=("pred", "first"))
+             .reset_index())
+
+    per_q = votes.groupby("question_idx")
+    votes["n"] = per_q["votes"].transform("sum")
+    votes["conf_total"] = per_q["conf_sum"].transform("sum")
+    return votes
+
+
+def _winner(votes, by):
+    order = votes.sort_values(["question_idx", by, "first"],
+                              ascending=[True, False, True], kind="stable")
+    return order.drop_duplicates("question_idx").set_index("question_idx")
+
+
+def aggregate(samples, key=ANSWER_KEY, rules=RULES):
+    """
+    Wide table per question_idx: num_samples plus pred_<rule> and
+    conf_<rule> for every rule.
+    """
+    votes = vote_table(samples, key)
+    top = _winner(votes, "votes")
+    out = pd.DataFrame({"num_samples": top["n"]})
+
+    for rule in rules:
+        if rule == "majority":
+            pred = top["pred"]
+            conf = top["conf_total"] / top["n"]
+        elif rule == "vote_share":
+            pred = top["pred"]
+            conf = top["votes"] / top["n"]
+        elif rule == "weighted":
+            best = _winner(votes, "conf_sum")
+            pred = best["pred"]
+            conf = (best["conf_sum"] / best["conf_total"]).where(
+                best["conf_total"] > 0, best["votes"] / best["n"])
+        elif rule == "entropy":
+            p = votes["votes"] / votes["n"]
+            entropy = (-(p * np.log(p))).groupby(votes["question_idx"]).sum()
+            max_entropy = np.log(top["n"].clip(lower=2))
+            pred = top["pred"]
+            conf = 1.0 - entropy.loc[top.index] / max_entropy
+        else:
+            raise ValueError(f"Unknown rule: {rule}")
+        out[f"pred_{rule}"] = pred
+        out[f"conf_{rule}"] = conf.clip(0.0, 1.0)
+
+    return out.reset_index()
+
+
+def long_format(aggregated, rules=RULES):
+    """One row per (question_idx, rule) with pred / confidence columns."""
+    frames = [aggregated[["question_idx", f"pred_{r}", f"conf_{r}"]]
+              .rename(columns={f"pred_{r}": "pred", f"conf_{r}": "confidence"})
+              .assign(rule=r) for r in rules]
+    return pd.concat(frames, ignore_index=True)
+
+
+# ------------------------------------------------
+# Main: score every rule on the stored samples
+# ------------------------------------------------
+def main():
+    runs = [r for r in find_runs(latest=LATEST_ONLY, **RUN_FILTERS)
+            if os.path.exists(samples_path(r["path"]))]
+    if not runs:
+        print(f"No runs matching {RUN_FILTERS} have a samples file; "
+              "re-run a self-consistency script first")
+        return
+
+    frames = []
+    for run in runs:
+        results = pd.read_csv(run["path"])
+        samples = pd.read_parquet(samples_path(run["path"]),
+                                  columns=["question_idx", "sample", "pred", "confidence"])
+        aggregated = aggregate(samples, ANSWER_KEY)
+
+        scored = long_format(aggregated).merge(
+            results.drop(columns=["pred", "confidence"], errors="ignore"),
+            left_on="question_idx", right_index=True)
+        # scored with exact match like evaluate_com.py and sweep.py, so a rule's
+        # metrics here agree with the run it registers; only the voting is normalized
+        scored["correct"] = [int(exact_match(str(p), str(g)))
+                             for p, g in zip(scored["pred"], scored["gold"])]
+        scored.insert(0, "run_id", run["run_id"])
+        frames.append(scored)
+
+        for rule in REGISTER_RULES:
+            out = results.copy()
+            out["pred"] = aggregated.set_index("question_idx")[f"pred_{rule}"]
+            out["confidence"] = aggregated.set_index("question_idx")[f"conf_{rule}"]
+            path = f"{os.path.splitext(run['path'])[0]}_{rule}.csv"
+            out.to_csv(path, index=False)
+            register_run(path, run["model"], f"self_consistency_{rule}", run["dataset"],
+                         num_items=len(out), num_samples=run["num_samples"])
+
+    scored = pd.concat(frames, ignore_index=True)
+    table = grouped_metrics(scored, ["run_id", "rule"])
+    print(f"=== Self-consistency aggregation rules (answers grouped by: {ANSWER_KEY}) ===")
+    print(format_table(table))
+
+    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
+    table.to_csv(OUTPUT_CSV, index=False)
+    print(f"Saved -> {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
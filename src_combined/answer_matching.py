@@ -1,13 +1,10 @@
 import re
-from sklearn.metrics import f1_score
-from bert_score import score
-import numpy as np
 
 """
-Requires the packages bert-score and scikit-learn to be installed:
+bert_score / bert_scores require the bert-score package (torch +
+transformers), which is only imported when they are called:
 
 pip install bert-score
-pip install scikit-learn
 
 """
 
@@ -37,11 +34,13 @@ def f1_token_levels(answers, expected_answers):
     return [f1_token_level(answer, expected_answer) for answer, expected_answer in zip(answers, expected_answers)]
 
 def bert_score(answer, expected_answer):
+    from bert_score import score  # torch + transformers, only load when needed
     P, R, F1 = score([answer], [expected_answer], model_type="microsoft/deberta-xlarge-mnli", lang="en")
     return F1.item()
 
 
 def bert_scores(answers, expected_answers):
+    from bert_score import score
     P, R, F1 = score(answers, expected_answers, model_type="microsoft/deberta-xlarge-mnli", lang="en")
     return F1.tolist()
 
@@ -0,0 +1,194 @@
+# src_combined/batch_backend.py
+
+"""
+Provider batch-API backend, used by llm_client when LLM_BACKEND=batch.
+
+    LLM_BACKEND=batch python inference_groq_com.py
+
+Full-dataset runs do not need interactive latency, and the batch endpoint
+is cheaper and not bound by the per-minute rate limits. Requests from the
+inference threads are queued like in local_backend.py; one worker thread
+collects them until none has arrived for BATCH_WAIT seconds (or
+MAX_REQUESTS are waiting) and writes them as one JSONL file in the
+provider's batch format,
+
+    {"custom_id": "req-17", "method": "POST", "url": "/v1/chat/completions", "body": {...}}
+
+uploads it (files API, purpose "batch"), creates the batch, polls it every
+POLL_EVERY seconds and downloads the output file. Every response is handed
+back to the thread waiting on its custom_id as an ordinary chat-completion
+object, so the scripts parse it with their usual parsers. The input and
+output files are kept in BATCH_DIR.
+
+Calls that depend on an earlier reply of the same item (the cascade
+stages) go into the next batch, so a run takes one batch per round of
+dependent calls. Independent samples of one prompt (self-consistency, the
+cascade's last stage, the sweep) are queued together with complete_many
+and share a batch. Requests the batch did
+not answer (error file, expired window) are sent again as normal chat
+completions. benchmarks/fake_provider.py serves the files and batches
+endpoints for local tests.
+"""
+
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from tracing import span, count
+
+BATCH_DIR = os.getenv("BATCH_DIR", "outputs/batches")
+ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+
+MAX_REQUESTS = 1000          # requests per batch
+# items in flight: every one is a thread blocked on its next batch, so
+# this bounds the threads, not the batch (an item may queue several
+# requests, see complete_many)
+MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "128"))
+BATCH_WAIT = 1.0             # seconds without a new request before submitting
+POLL_EVERY = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from llm_client import get_client
+
+            _engine = BatchEngine(get_client())
+    return _engine
+
+
+def complete(model, prompt, **kwargs):
+    """Blocking single request; answered with the next batch."""
+    return get_engine().submit(model, prompt, **kwargs).result()
+
+
+def complete_many(model, prompt, n, **kwargs):
+    """n independent requests of one prompt, queued together so they share a batch."""
+    engine = get_engine()
+    futures = [engine.submit(model, prompt, **kwargs) for _ in range(n)]
+    return [future.result() for future in futures]
+
+
+# ------------------------------------------------
+# Batch files
+# ------------------------------------------------
+def write_requests(path, requests):
+    """requests: custom_id -> chat-completion body."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests.items():
+            f.write(json.dumps({"custom_id": custom_id, "method": "POST",
+                                "url": ENDPOINT, "body": body}) + "\n")
+
+
+def read_results(text):
+    """Output file -> custom_id -> ChatCompletion, successful requests only."""
+    from groq.types.chat import ChatCompletion
+
+    results = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            continue
+        results[record["custom_id"]] = ChatCompletion.model_validate(response["body"])
+    return results
+
+
+class BatchEngine:
+
+    def __init__(self, client):
+        self.client = client
+        self.requests = queue.Queue()
+        self.ids = itertools.count()
+        self.batches = itertools.count()
+        self.worker = threading.Thread(target=self._serve, daemon=True)
+        self.worker.start()
+
+    def submit(self, model, prompt, **kwargs):
+        future = Future()
+        body = {"model": model, "messages": [{"role": "user", "content": prompt}], **kwargs}
+        self.requests.put((f"req-{next(self.ids)}", body, future))
+        return future
+
+    # ------------------------------------------------
+    # Batching
+    # ------------------------------------------------
+    def _collect(self):
+        """Block for one request, then take more until BATCH_WAIT passes without one."""
+        pending = [self.requests.get()]
+        while len(pending) < MAX_REQUESTS:
+            try:
+                pending.append(self.requests.get(timeout=BATCH_WAIT))
+            except queue.Empty:
+                break
+        return pending
+
+    def _serve(self):
+        while True:
+            pending = self._collect()
+            try:
+                results = self.run_batch({custom_id: body for custom_id, body, _ in pending})
+            except Exception as e:  # hand the error to every waiting caller
+                for _, _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            for custom_id, body, future in pending:
+                response = results.get(custom_id)
+                if response is None:
+                    count("batch_fallbacks")
+                    try:
+                        response = self.client.chat.completions.create(**body)
+                    except Exception as e:
+                        future.set_exception(e)
+                        continue
+                future.set_result(response)
+
+    # ------------------------------------------------
+    # Provider round trip
+    # ------------------------------------------------
+    def run_batch(self, requests):
+        # the sequence number and pid keep names unique within the second
+        name = (f"batch-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+                f"-{next(self.batches)}-{len(requests)}")
+        input_path = os.path.join(BATCH_DIR, f"{name}.input.jsonl")
+        write_requests(input_path, requests)
+
+        with span("batch_upload", requests=len(requests)), open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(input_file_id=input_file.id, endpoint=ENDPOINT,
+                                           completion_window=COMPLETION_WINDOW)
+        print(f"Submitted batch {batch.id} ({len(requests)} requests)")
+
+        with span("batch_wait", batch_id=batch.id):
+            while batch.status not in FINAL_STATUSES:
+                time.sleep(POLL_EVERY)
+                batch = self.client.batches.retrieve(batch.id)
+        count("batches")
+        if batch.status == "failed":
+            raise RuntimeError(f"Batch {batch.id} failed: {batch.errors}")
+
+        if not batch.output_file_id:
+            return {}
+        with span("batch_download", batch_id=batch.id):
+            text = self.client.files.content(batch.output_file_id).text()
+        with open(os.path.join(BATCH_DIR, f"{name}.output.jsonl"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+        results = read_results(text)
+        print(f"Batch {batch.id} {batch.status}: {len(results)} of {len(requests)} answered")
+        return results
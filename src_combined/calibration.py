@@ -0,0 +1,203 @@
+# src_combined/calibration.py
+
+"""
+Vectorized calibration metrics shared by the evaluators.
+
+Everything here works on whole columns at once: confidences are binned with
+one array operation and per-group statistics come out of pandas groupby,
+so one call scores any number of runs / slices together.
+"""
+
+import numpy as np
+
+NUM_BINS = 10
+
+
+# ------------------------------------------------
+# Binning
+# ------------------------------------------------
+def assign_bins(probs, num_bins=NUM_BINS):
+    """Equal-width bin index per confidence; 1.0 falls into the last bin."""
+    probs = np.asarray(probs, dtype=float)
+    return np.clip((probs * num_bins).astype(int), 0, num_bins - 1)
+
+
+# ------------------------------------------------
+# Calibration: Brier Score / ECE
+# ------------------------------------------------
+def brier_score(y_true, y_prob):
+    y_true = np.asarray(y_true, dtype=float)
+    y_prob = np.asarray(y_prob, dtype=float)
+    return np.mean((y_prob - y_true) ** 2)
+
+
+def compute_ece(probs, correct, num_bins=NUM_BINS):
+    probs = np.asarray(probs, dtype=float)
+    correct = np.asarray(correct, dtype=float)
+    if len(probs) == 0:
+        return 0.0
+
+    bins = assign_bins(probs, num_bins)
+    conf_sums = np.bincount(bins, weights=probs, minlength=num_bins)
+    acc_sums = np.bincount(bins, weights=correct, minlength=num_bins)
+
+    return np.abs(conf_sums - acc_sums).sum() / len(probs)
+
+
+# ------------------------------------------------
+# Streaming: sufficient statistics
+# ------------------------------------------------
+class CalibrationAccumulator:
+    """
+    Constant-memory sufficient statistics for accuracy / Brier / ECE:
+    per-bin counts, confidence sums and correct sums, plus the sum of
+    squared errors. Rows can be added one at a time or as arrays, and
+    accumulators over disjoint rows merge by addition.
+    """
+
+    def __init__(self, num_bins=NUM_BINS):
+        self.num_bins = num_bins
+        self.counts = np.zeros(num_bins)
+        self.conf_sums = np.zeros(num_bins)
+        self.correct_sums = np.zeros(num_bins)
+        self.sq_err_sum = 0.0
+
+    @property
+    def n(self):
+        return int(self.counts.sum())
+
+    def add(self, confidence, correct):
+        b = min(max(int(confidence * self.num_bins), 0), self.num_bins - 1)
+        self.counts[b] += 1
+        self.conf_sums[b] += confidence
+        self.correct_sums[b] += correct
+        self.sq_err_sum += (confidence - correct) ** 2
+
+    def add_many(self, confidences, correct):
+        confidences = np.asarray(confidences, dtype=float)
+        correct = np.asarray(correct, dtype=float)
+        bins = assign_bins(confidences, self.num_bins)
+        self.counts += np.bincount(bins, minlength=self.num_bins)
+        self.conf_sums += np.bincount(bins, weights=confidences, minlength=self.num_bins)
+        self.correct_sums += np.bincount(bins, weights=correct, minlength=self.num_bins)
+        self.sq_err_sum += float(((confidences - correct) ** 2).sum())
+        return self
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.conf_sums += other.conf_sums
+        self.correct_sums += other.correct_sums
+        self.sq_err_sum += other.sq_err_sum
+        return self
+
+    def metrics(self):
+        n = self.n
+        if n == 0:
+            return {"n": 0}
+        return {
+            "n": n,
+            "accuracy": float(self.correct_sums.sum() / n),
+            "mean_conf": float(self.conf_sums.sum() / n),
+            "brier": float(self.sq_err_sum / n),
+            "ece": float(np.abs(self.conf_sums - self.correct_sums).sum() / n),
+        }
+
+
+# ------------------------------------------------
+# Bootstrap confidence intervals
+# ------------------------------------------------
+def bootstrap_ci(probs, correct, num_boot=1000, alpha=0.05,
+                 num_bins=NUM_BINS, seed=0):
+    """
+    Percentile bootstrap CIs for accuracy, Brier and ECE.
+
+    All resamples are scored at once: an (num_boot, n) index matrix and one
+    bincount over (resample, bin) cells for the ECE terms.
+    """
+    probs = np.asarray(probs, dtype=float)
+    correct = np.asarray(correct, dtype=float)
+    n = len(probs)
+    if n == 0:
+        return {}
+
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, n, size=(num_boot, n))
+    p, c = probs[idx], correct[idx]
+
+    cells = (np.arange(num_boot)[:, None] * num_bins
+             + assign_bins(probs, num_bins)[idx]).ravel()
+    size = num_boot * num_bins
+    conf_sums = np.bincount(cells, weights=p.ravel(), minlength=size)
+    acc_sums = np.bincount(cells, weights=c.ravel(), minlength=size)
+    ece = np.abs(conf_sums - acc_sums).reshape(num_boot, num_bins).sum(axis=1) / n
+
+    stats = {
+        "accuracy": c.mean(axis=1),
+        "brier": ((p - c) ** 2).mean(axis=1),
+        "ece": ece,
+    }
+    q = [100 * alpha / 2, 100 * (1 - alpha / 2)]
+    return {name: tuple(np.percentile(values, q)) for name, values in stats.items()}
+
+
+# ------------------------------------------------
+# Grouped metric tables
+# ------------------------------------------------
+def bin_table(df, keys, conf_col="confidence", correct_col="correct",
+              num_bins=NUM_BINS):
+    """Per (keys..., bin) counts and mean confidence / accuracy."""
+    keys = list(keys)
+    binned = df[keys + [conf_col, correct_col]].copy()
+    binned["bin"] = assign_bins(binned[conf_col].values, num_bins)
+
+    table = (
+        binned.groupby(keys + ["bin"], observed=True, sort=True)
+        .agg(n=(conf_col, "size"),
+             conf=(conf_col, "mean"),
+             acc=(correct_col, "mean"))
+        .reset_index()
+    )
+    return table
+
+
+def grouped_metrics(df, keys, conf_col="confidence", correct_col="correct",
+                    extra_cols=(), num_bins=NUM_BINS):
+    """
+    Accuracy, Brier, ECE (plus the mean of any extra_cols) per group.
+
+    The per-row terms are computed once for the whole frame; the group
+    table is then two groupbys: one over keys for the means and one over
+    (keys, bin) for the ECE terms.
+    """
+    keys = list(keys)
+    extra_cols = [c for c in extra_cols if c in df.columns]
+
+    work = df[keys + [conf_col, correct_col] + extra_cols].copy()
+    work["sq_err"] = (work[conf_col] - work[correct_col]) ** 2
+    work["bin"] = assign_bins(work[conf_col].values, num_bins)
+
+    aggs = {
+        "n": (conf_col, "size"),
+        "accuracy": (correct_col, "mean"),
+        "mean_conf": (conf_col, "mean"),
+        "brier": ("sq_err", "mean"),
+    }
+    for col in extra_cols:
+        aggs[col] = (col, "mean")
+
+    table = work.groupby(keys, observed=True, sort=True).agg(**aggs)
+
+    # ECE = sum over bins |sum(conf) - sum(correct)| / n
+    per_bin = work.groupby(keys + ["bin"], observed=True).agg(
+        conf_sum=(conf_col, "sum"), acc_sum=(correct_col, "sum")
+    )
+    gap = (per_bin["conf_sum"] - per_bin["acc_sum"]).abs()
+    table["ece"] = gap.groupby(level=keys).sum() / table["n"]
+
+    return table.reset_index()
+
+
+def format_table(table, float_cols=None):
+    float_cols = float_cols or [c for c in table.columns if table[c].dtype.kind == "f"]
+    return table.to_string(index=False,
+                           formatters={c: "{:.3f}".format for c in float_cols})
@@ -0,0 +1,161 @@
+# src_combined/cascade_thresholds.py
+
+"""
+Learn the escalation thresholds of the cascade (inference_groq_com_cascade.py)
+offline from past evaluated baseline / CoT / self-consistency runs.
+
+For every pair of thresholds (t_cot, t_sc) the cascade answers a question
+with the baseline if its confidence is >= t_cot, otherwise with CoT if the
+CoT confidence is >= t_sc, otherwise with self-consistency. Replaying this
+on stored runs gives the mean API calls per item and the resulting
+accuracy / Brier / ECE for every pair, i.e. the cost-vs-ECE curve, without
+any new calls.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from calibration import brier_score, compute_ece
+from run_registry import find_runs
+
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+STAGES = ["baseline", "cot", "self_consistency"]
+
+THRESHOLD_GRID = np.round(np.linspace(0.0, 1.0, 21), 2)
+# Highest mean calls per item we are willing to pay for; the thresholds with
+# the lowest ECE under this budget are saved.
+MAX_CALLS_PER_ITEM = 2.5
+
+OUT_CURVE_CSV = "outputs/cascade_curve.csv"
+OUT_THRESHOLDS = "outputs/cascade_thresholds.json"
+OUT_PLOT = "outputs/plots/cascade_cost_vs_ece.png"
+
+
+# ------------------------------------------------
+# Join the stage runs per question
+# ------------------------------------------------
+def load_stage_results():
+    runs = {}
+    for run in find_runs(latest=True, method=STAGES, **RUN_FILTERS):
+        if run["eval_path"] and run["method"] not in runs:
+            runs[run["method"]] = run
+
+    missing = [s for s in STAGES if s not in runs]
+    if missing:
+        raise RuntimeError(f"No evaluated runs for stage(s) {missing}; "
+                           "run the inference scripts and evaluate_com.py first")
+
+    joined = None
+    for stage in STAGES:
+        df = pd.read_csv(runs[stage]["eval_path"])
+        df = df[["question", "confidence", "correct"]].drop_duplicates("question")
+        df = df.rename(columns={"confidence": f"conf_{stage}",
+                                "correct": f"correct_{stage}"})
+        joined = df if joined is None else joined.merge(df, on="question")
+
+    sc_samples = runs["self_consistency"]["num_samples"] or 5
+    return joined, sc_samples
+
+
+# ------------------------------------------------
+# Replay the cascade for every threshold pair
+# ------------------------------------------------
+def cascade_curve(joined, sc_samples, grid=THRESHOLD_GRID):
+    conf = {s: joined[f"conf_{s}"].fillna(0.5).values for s in STAGES}
+    correct = {s: joined[f"correct_{s}"].values for s in STAGES}
+
+    rows = []
+    for t_cot in grid:
+        escalate_cot = conf["baseline"] < t_cot
+        for t_sc in grid:
+            escalate_sc = escalate_cot & (conf["cot"] < t_sc)
+            stage_conf = np.where(escalate_sc, conf["self_consistency"],
+                                  np.where(escalate_cot, conf["cot"], conf["baseline"]))
+            stage_correct = np.where(escalate_sc, correct["self_consistency"],
+                                     np.where(escalate_cot, correct["cot"], correct["baseline"]))
+
+            # the CoT answer is reused as the first self-consistency sample
+            calls = 1 + escalate_cot + escalate_sc * (sc_samples - 1)
+
+            rows.append({
+                "t_cot": t_cot,
+                "t_sc": t_sc,
+                "calls_per_item": calls.mean(),
+                "share_cot": escalate_cot.mean(),
+                "share_sc": escalate_sc.mean(),
+                "accuracy": stage_correct.mean(),
+                "brier": brier_score(stage_correct, stage_conf),
+                "ece": compute_ece(stage_conf, stage_correct),
+            })
+
+    return pd.DataFrame(rows)
+
+
+def pareto_front(curve):
+    """Threshold pairs not beaten on both calls and ECE."""
+    curve = curve.sort_values(["calls_per_item", "ece"])
+    best = curve["ece"].cummin()
+    return curve[curve["ece"] <= best].drop_duplicates("calls_per_item")
+
+
+def plot_curve(curve, front, chosen, out_path=OUT_PLOT):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    plt.figure(figsize=(7, 5))
+    plt.scatter(curve["calls_per_item"], curve["ece"], s=8, alpha=0.3,
+                color="gray", label="threshold pairs")
+    plt.plot(front["calls_per_item"], front["ece"], marker="o", label="Pareto front")
+    plt.scatter([chosen["calls_per_item"]], [chosen["ece"]], color="red",
+                zorder=3, label="chosen")
+    plt.xlabel("API calls per item")
+    plt.ylabel("ECE")
+    plt.title("Cascade cost vs calibration")
+    plt.legend()
+    plt.savefig(out_path, dpi=150)
+    plt.close()
+
+
+def main():
+    joined, sc_samples = load_stage_results()
+    print(f"Replaying cascade on {len(joined)} questions "
+          f"(self-consistency = {sc_samples} samples)")
+
+    curve = cascade_curve(joined, sc_samples)
+    front = pareto_front(curve)
+
+    affordable = curve[curve["calls_per_item"] <= MAX_CALLS_PER_ITEM]
+    chosen = affordable.sort_values(["ece", "calls_per_item"]).iloc[0]
+
+    os.makedirs(os.path.dirname(OUT_CURVE_CSV), exist_ok=True)
+    curve.to_csv(OUT_CURVE_CSV, index=False)
+    plot_curve(curve, front, chosen)
+
+    thresholds = {
+        "t_cot": float(chosen["t_cot"]),
+        "t_sc": float(chosen["t_sc"]),
+        "expected_calls_per_item": float(chosen["calls_per_item"]),
+        "expected_ece": float(chosen["ece"]),
+        "max_calls_per_item": MAX_CALLS_PER_ITEM,
+        "num_questions": int(len(joined)),
+    }
+    with open(OUT_THRESHOLDS, "w") as f:
+        json.dump(thresholds, f, indent=2)
+
+    print("--- Pareto front (calls/item vs ECE) ---")
+    print(front[["t_cot", "t_sc", "calls_per_item", "accuracy", "brier", "ece"]]
+          .to_string(index=False, float_format="{:.3f}".format))
+    print(f"\nChosen: escalate to CoT below {thresholds['t_cot']:.2f}, "
+          f"to self-consistency below {thresholds['t_sc']:.2f} "
+          f"({thresholds['expected_calls_per_item']:.2f} calls/item, "
+          f"ECE {thresholds['expected_ece']:.3f})")
+    print(f"Saved -> {OUT_THRESHOLDS}, {OUT_CURVE_CSV}, {OUT_PLOT}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# src_combined/chunked_eval.py
+
+"""
+Out-of-core evaluation of result files of any size.
+
+A result CSV is read in CHUNK_SIZE-row chunks, and only the columns the
+metrics need are parsed (no question text in memory twice, never the raw
+responses). Each chunk is scored by a score function and reduced to
+sufficient statistics: a CalibrationAccumulator (bin counts and sums,
+squared errors) plus column sums, for the whole run and for every value of
+the slicing columns. Chunk statistics merge by addition, so chunks can be
+scored by a process pool in any order and memory stays bounded by a few
+chunks.
+
+The per-row detail is written as it goes, to a compact CSV with only the
+DETAIL_COLUMNS present (scores, confidence, slices; no raw responses), which
+is what the run registry's eval_path points at:
+
+    stats = evaluate_file(run["path"], score_fn, ["source"],
+                          detail_path="outputs/eval/<run_id>.csv")
+    stats.table("run"), stats.table("source"), stats.bins()
+
+score_fn(chunk) returns a DataFrame of new columns for the chunk, at least
+"correct"; prepare_fn(chunk), if given, returns the chunk with columns
+filled in before scoring (e.g. backfilled slices). Both must be
+module-level functions when WORKERS > 1.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from calibration import CalibrationAccumulator, NUM_BINS
+
+CHUNK_SIZE = 50_000
+WORKERS = 1
+
+# columns a scorer may read; the rest of the result file is never parsed
+INPUT_COLUMNS = ["id", "question", "source", "type", "stage", "num_calls",
+                 "pred", "gold", "confidence"]
+DETAIL_COLUMNS = ["id", "question", "source", "type", "stage", "num_calls",
+                  "pred", "gold", "confidence", "correct",
+                  "exact_match", "token_f1", "semantic_match"]
+
+
+class SliceStats:
+    """Sufficient statistics per (group column, value); ("run", "") is the whole run."""
+
+    def __init__(self, num_bins=NUM_BINS):
+        self.num_bins = num_bins
+        self.acc = {}
+        self.sums = {}
+
+    def _slot(self, key):
+        if key not in self.acc:
+            self.acc[key] = CalibrationAccumulator(self.num_bins)
+            self.sums[key] = {}
+        return self.acc[key], self.sums[key]
+
+    def add_frame(self, df, group_cols=(), extra_cols=()):
+        extra_cols = [c for c in extra_cols if c in df.columns]
+        groups = [("run", None)] + [(c, c) for c in group_cols if c in df.columns]
+        for name, col in groups:
+            parts = [("", df)] if col is None else df.groupby(
+                df[col].fillna("unknown").astype(str), sort=False)
+            for value, part in parts:
+                acc, sums = self._slot((name, value))
+                acc.add_many(part["confidence"].to_numpy(), part["correct"].to_numpy())
+                for c in extra_cols:
+                    values = pd.to_numeric(part[c], errors="coerce")
+                    total, count = sums.get(c, (0.0, 0))
+                    sums[c] = (total + float(values.sum()), count + int(values.notna().sum()))
+        return self
+
+    def merge(self, other):
+        for key, acc in other.acc.items():
+            mine, sums = self._slot(key)
+            mine.merge(acc)
+            for c, (total, count) in other.sums[key].items():
+                t, n = sums.get(c, (0.0, 0))
+                sums[c] = (t + total, n + count)
+        return self
+
+    @property
+    def n(self):
+        """Rows in the whole run (0 for a result file without rows)."""
+        acc = self.acc.get(("run", ""))
+        return 0 if acc is None else acc.n
+
+    def table(self, group_by="run"):
+        """Same columns as calibration.grouped_metrics (without the keys)."""
+        rows = []
+        for (name, value), acc in sorted(self.acc.items()):
+            if name != group_by:
+                continue
+            row = {} if group_by == "run" else {group_by: value}
+            row.update(acc.metrics())
+            for c, (total, count) in self.sums[name, value].items():
+                row[c] = total / count if count else float("nan")
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def bins(self):
+        """Whole-run bin table: bin, n, conf, acc (non-empty bins only)."""
+        acc = self.acc.get(("run", ""))
+        if acc is None:
+            return pd.DataFrame(columns=["bin", "n", "conf", "acc"])
+        nonzero = acc.counts > 0
+        return pd.DataFrame({
+            "bin": acc.counts.nonzero()[0],
+            "n": acc.counts[nonzero].astype(int),
+            "conf": acc.conf_sums[nonzero] / acc.counts[nonzero],
+            "acc": acc.correct_sums[nonzero] / acc.counts[nonzero],
+        })
+
+
+def score_chunk(task):
+    """Worker: score one chunk, return (its statistics, its detail rows)."""
+    chunk, score_fn, prepare_fn, group_cols, extra_cols, num_bins = task
+    if prepare_fn is not None:
+        chunk = prepare_fn(chunk)
+    chunk["confidence"] = pd.to_numeric(chunk["confidence"], errors="coerce").fillna(0.5)
+    for col in ("pred", "gold"):
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype(str)   # like evaluate_com.load_runs
+
+    scored = pd.concat([chunk, score_fn(chunk)], axis=1)
+    scored["correct"] = scored["correct"].astype(int)
+    stats = SliceStats(num_bins).add_frame(scored, group_cols, extra_cols)
+    return stats, scored[[c for c in DETAIL_COLUMNS if c in scored.columns]]
+
+
+def bounded_map(pool, fn, items, window):
+    """pool.map that keeps at most window tasks in flight (Executor.map
+    would read every chunk up front), results in input order."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE, columns=INPUT_COLUMNS):
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in columns if c in header]
+    yield from pd.read_csv(path, usecols=usecols, chunksize=chunk_size)
+
+
+def evaluate_file(path, score_fn, group_cols=(), extra_cols=(), detail_path=None,
+                  chunk_size=CHUNK_SIZE, workers=WORKERS, num_bins=NUM_BINS,
+                  prepare_fn=None):
+    """Map score_chunk over the chunks of path, reduce the statistics."""
+    stats = SliceStats(num_bins)
+    tasks = ((chunk, score_fn, prepare_fn, group_cols, extra_cols, num_bins)
+             for chunk in iter_chunks(path, chunk_size))
+
+    if detail_path and os.path.dirname(detail_path):
+        os.makedirs(os.path.dirname(detail_path), exist_ok=True)
+    tmp_path = f"{detail_path}.tmp" if detail_path else None
+
+    def reduce(results):
+        for i, (chunk_stats, detail) in enumerate(results):
+            stats.merge(chunk_stats)
+            if tmp_path:
+                detail.to_csv(tmp_path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # in chunk order, so the detail file stays in input order
+            reduce(bounded_map(pool, score_chunk, tasks, 2 * workers))
+    else:
+        reduce(map(score_chunk, tasks))
+
+    if tmp_path and os.path.exists(tmp_path):
+        os.replace(tmp_path, detail_path)
+    return stats
@@ -0,0 +1,170 @@
+# src_combined/cli.py
+
+"""
+Command-line entry point: python -m src_combined <command> ...
+
+    parse  FILE [--style cot]        parse model replies (text file, CSV or stdin)
+    ece    FILE [--conf-col ...]     accuracy / Brier / ECE of a result CSV
+    runs   [--method ...]            list registered runs
+    diff   RUN_A RUN_B [...]         per-item flips / confidence deltas vs RUN_A
+
+    evaluate | report | recalibrate | thresholds | compare | aggregate | dedup
+    | sweep                          run the corresponding pipeline step
+
+Nothing heavy is imported here: parse and ece only need the standard
+library and numpy, so they start in a fraction of a second. The pipeline
+steps import their modules (pandas, matplotlib, bert_score, ...) only when
+selected.
+"""
+
+import argparse
+import csv
+import importlib
+import sys
+
+# command -> module whose main() runs it
+PIPELINE_COMMANDS = {
+    "evaluate": "evaluate_com",
+    "report": "report",
+    "recalibrate": "recalibration",
+    "thresholds": "cascade_thresholds",
+    "compare": "plot_compare",
+    "aggregate": "aggregators",
+    "dedup": "dedup",
+    "sweep": "sweep",
+}
+
+
+def open_input(path):
+    return sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+
+
+# ------------------------------------------------
+# parse
+# ------------------------------------------------
+def cmd_parse(args):
+    from parsing import parse_baseline_output, parse_cot_output
+
+    parse = parse_cot_output if args.style == "cot" else parse_baseline_output
+
+    with open_input(args.file) as f:
+        if not args.file.endswith(".csv"):
+            ans, conf, _ = parse(f.read())
+            print(f"{ans}\t{conf}")
+            return
+
+        reader = csv.DictReader(f)
+        if args.column not in (reader.fieldnames or []):
+            sys.exit(f"{args.file}: no column {args.column!r} ({reader.fieldnames})")
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["pred", "confidence"])
+        for row in reader:
+            ans, conf, _ = parse(row[args.column] or "")
+            writer.writerow([ans, conf])
+
+
+# ------------------------------------------------
+# ece
+# ------------------------------------------------
+def cmd_ece(args):
+    import numpy as np
+    from calibration import brier_score, compute_ece
+
+    conf, correct = [], []
+    with open_input(args.file) as f:
+        reader = csv.DictReader(f)
+        fields = reader.fieldnames or []
+        if args.correct_col not in fields:
+            if not {"pred", "gold"} <= set(fields):
+                sys.exit(f"{args.file}: needs a {args.correct_col!r} column or pred/gold")
+            from answer_matching import exact_match
+        for row in reader:
+            value = row.get(args.conf_col)
+            conf.append(float(value) if value not in (None, "") else 0.5)
+            if args.correct_col in fields:
+                correct.append(float(row[args.correct_col]))
+            else:
+                correct.append(exact_match(row["pred"], row["gold"]))
+
+    conf = np.array(conf)
+    correct = np.array(correct)
+    print(f"n        : {len(conf)}")
+    print(f"accuracy : {correct.mean():.3f}")
+    print(f"brier    : {brier_score(correct, conf):.3f}")
+    print(f"ece      : {compute_ece(conf, correct, args.bins):.3f}  ({args.bins} bins)")
+
+
+# ------------------------------------------------
+# runs
+# ------------------------------------------------
+def cmd_runs(args):
+    from run_registry import find_runs
+
+    filters = {k: getattr(args, k) for k in ("method", "model", "dataset")
+               if getattr(args, k)}
+    for run in find_runs(latest=args.latest, **filters):
+        evaluated = "evaluated" if run["eval_path"] else ""
+        print(f"{run['run_id']:40s} {run['method']:18s} {run['model']:26s} "
+              f"{run['dataset']:26s} n={run['num_items']:<5d} {evaluated}")
+
+
+# ------------------------------------------------
+# diff
+# ------------------------------------------------
+def cmd_diff(args):
+    import run_diff
+
+    run_diff.main(args.run_ids, args.by, args.output)
+
+
+def cmd_pipeline(args):
+    importlib.import_module(PIPELINE_COMMANDS[args.command]).main()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src_combined",
+                                     description="LLM calibration pipeline tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parse", help="parse model replies into answer + confidence")
+    p.add_argument("file", help="reply text file, result CSV, or - for stdin")
+    p.add_argument("--style", choices=["baseline", "cot"], default="cot")
+    p.add_argument("--column", default="raw_response", help="reply column of a CSV")
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("ece", help="accuracy, Brier score and ECE of a result CSV")
+    p.add_argument("file", help="result CSV, or - for stdin")
+    p.add_argument("--conf-col", default="confidence")
+    p.add_argument("--correct-col", default="correct",
+                   help="0/1 column; exact match of pred/gold when missing")
+    p.add_argument("--bins", type=int, default=10)
+    p.set_defaults(func=cmd_ece)
+
+    p = sub.add_parser("runs", help="list registered runs")
+    p.add_argument("--method")
+    p.add_argument("--model")
+    p.add_argument("--dataset")
+    p.add_argument("--latest", action="store_true")
+    p.set_defaults(func=cmd_runs)
+
+    p = sub.add_parser("diff", help="per-item diff of runs, joined on item id")
+    p.add_argument("run_ids", nargs="+", metavar="run_id",
+                   help="base run, then the runs compared to it")
+    p.add_argument("--by", nargs="*", default=["source"], help="slice columns")
+    p.add_argument("--output", help="CSV of the per-item diff")
+    p.set_defaults(func=cmd_diff)
+
+    for name, module in PIPELINE_COMMANDS.items():
+        p = sub.add_parser(name, help=f"run {module}.py")
+        p.set_defaults(func=cmd_pipeline)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
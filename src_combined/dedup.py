@@ -0,0 +1,337 @@
+# src_combined/dedup.py
+
+"""
+Exact and near-duplicate detection for QA datasets, plus a contamination
+check against a reference corpus (e.g. the HotpotQA train split).
+
+Questions are normalized (lowercase, no punctuation or extra whitespace),
+cut into word shingles and summarized by a MinHash signature. Locality
+sensitive hashing over bands of the signature yields candidate pairs in
+near-linear time; a candidate is a near duplicate when the estimated
+Jaccard similarity of the two shingle sets is at least NEAR_THRESHOLD.
+
+Records are read as a stream of JSONL lines and signatures are computed in
+CHUNK_SIZE chunks by a process pool. Only the signatures of the evaluation
+set are kept in memory; reference records are hashed, looked up and
+discarded, so the reference can have millions of lines.
+
+The result is a dedup map next to the dataset:
+
+    data/combined_qa_dataset_800.dedup.csv    id, kind, duplicate_of, similarity, same_answer
+
+kind is "exact" (same normalized question and answer as an earlier item),
+"near" (a paraphrase of an earlier item with the same answer), "variant"
+(a similar question with another answer, e.g. two TORQUE questions on one
+passage; kept by default) or "contaminated" (close to a reference record,
+duplicate_of is "<file>:<line>"). The inference scripts drop the ids
+listed with a kind in SKIP_KINDS, see drop_duplicates().
+"""
+
+import hashlib
+import json
+import os
+import re
+import zlib
+from collections import Counter
+from multiprocessing import Pool
+
+import numpy as np
+
+INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
+REFERENCE_FILES = ["data/raw/hotpotqa/train.jsonl"]   # skipped when missing
+
+NUM_PERM = 128
+BANDS = 16                 # 16 bands x 8 rows: candidates above ~0.7 Jaccard
+SHINGLE_SIZE = 3           # words per shingle
+NEAR_THRESHOLD = 0.8       # estimated Jaccard at or above which items are duplicates
+CHUNK_SIZE = 2000          # records per worker task
+WORKERS = os.cpu_count()
+
+# kinds whose items the inference scripts skip
+SKIP_KINDS = ("exact", "near")
+
+MAP_COLUMNS = ["id", "kind", "duplicate_of", "similarity", "same_answer"]
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# permutation parameters below 2**32, so a * hash + b never overflows uint64
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+# one 64-bit hash per band: dot product with random odd multipliers (mod 2**64)
+_BAND_MULT = _rng.randint(0, 1 << 62, size=NUM_PERM // BANDS, dtype=np.uint64) * 2 + 1
+
+
+def dedup_map_path(dataset_file):
+    """'data/combined_qa_dataset_800.jsonl' -> 'data/combined_qa_dataset_800.dedup.csv'"""
+    return os.path.splitext(dataset_file)[0] + ".dedup.csv"
+
+
+# ------------------------------------------------
+# Signatures
+# ------------------------------------------------
+def normalize(text):
+    text = re.sub(r"[^\w\s]", " ", str(text or "").lower())
+    return " ".join(text.split())
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    words = text.split()
+    if len(words) <= k:
+        return {text} if text else set()
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash(texts):
+    """(n, NUM_PERM) MinHash signatures of normalized texts, computed for the
+    whole batch at once; empty texts get all-_MAX_HASH signatures."""
+    hashes, starts = [], []
+    for text in texts:
+        starts.append(len(hashes))
+        hashes.extend(zlib.crc32(g.encode()) for g in shingles(text))
+    sigs = np.full((len(texts), NUM_PERM), _MAX_HASH, dtype=np.uint64)
+    if not hashes:
+        return sigs
+    h = np.array(hashes, dtype=np.uint64)
+    permuted = ((_PERM_A[:, None] * h[None, :] + _PERM_B[:, None]) % _PRIME) & _MAX_HASH
+    starts = np.array(starts)
+    nonempty = starts < np.r_[starts[1:], len(h)]
+    sigs[nonempty] = np.minimum.reduceat(permuted, starts[nonempty], axis=1).T
+    return sigs
+
+
+def item_id(source, question):
+    """Stable id of a dataset item: a hash of its source and question text,
+    so it survives rebuilds and reordering of the dataset (a row number
+    does not) and results of different runs can be joined on it."""
+    raw = f"{source}\x1f{question}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def item_ids(sources, questions):
+    """item_id per row; repeats of a (source, question) get a "-<n>" suffix
+    so ids stay unique (the dedup map then lists them as exact duplicates)."""
+    seen, ids = Counter(), []
+    for source, question in zip(sources, questions):
+        key = item_id(source, question)
+        seen[key] += 1
+        ids.append(key if seen[key] == 1 else f"{key}-{seen[key]}")
+    return ids
+
+
+def exact_key(question, answer):
+    raw = f"{normalize(question)}\x1f{normalize(answer)}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).digest()
+
+
+def band_hashes(sigs):
+    """(n, BANDS) uint64 LSH bucket keys of an (n, NUM_PERM) signature matrix."""
+    with np.errstate(over="ignore"):
+        return (sigs.reshape(len(sigs), BANDS, -1) * _BAND_MULT).sum(axis=2)
+
+
+def signature_chunk(chunk):
+    """Worker: [(key, question, answer)] -> (keys, answers, exact keys, signatures, bands)."""
+    keys = [key for key, _, _ in chunk]
+    answers = [normalize(answer) for _, _, answer in chunk]
+    exact = [exact_key(question, answer) for _, question, answer in chunk]
+    sigs = minhash([normalize(question) for _, question, _ in chunk])
+    return keys, answers, exact, sigs, band_hashes(sigs)
+
+
+# ------------------------------------------------
+# Streaming
+# ------------------------------------------------
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """Chunks of (key, question, answer) from a JSONL file; key is the id field
+    or, without one, "<file>:<line>"."""
+    name = os.path.basename(path)
+    chunk = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            key = obj.get("id", f"{name}:{line_no}")
+            chunk.append((key, obj.get("question", ""), obj.get("answer", "")))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_signatures(path, pool):
+    yield from pool.imap(signature_chunk, iter_chunks(path))
+
+
+# ------------------------------------------------
+# LSH index
+# ------------------------------------------------
+class LSHIndex:
+    """Band buckets over the signatures of the indexed items."""
+
+    def __init__(self):
+        self.buckets = [{} for _ in range(BANDS)]
+        self.signatures = []
+        self._sorted_keys = None
+
+    def query(self, sig, bands, threshold=NEAR_THRESHOLD):
+        """[(position, estimated Jaccard)] of indexed items similar to sig."""
+        if sig[0] == _MAX_HASH:   # empty text
+            return []
+        candidates = set()
+        for buckets, band in zip(self.buckets, bands.tolist()):
+            candidates.update(buckets.get(band, ()))
+        hits = []
+        for pos in candidates:
+            similarity = float(np.mean(self.signatures[pos] == sig))
+            if similarity >= threshold:
+                hits.append((pos, similarity))
+        return sorted(hits)
+
+    def candidate_rows(self, bands):
+        """Rows of an (n, BANDS) band matrix sharing at least one bucket with
+        the index, vectorized so non-matching records cost no Python loop."""
+        if self._sorted_keys is None:
+            self._sorted_keys = [np.array(sorted(b), dtype=np.uint64) for b in self.buckets]
+        mask = np.zeros(len(bands), dtype=bool)
+        for b, keys in enumerate(self._sorted_keys):
+            mask |= np.isin(bands[:, b], keys, assume_unique=False)
+        return np.flatnonzero(mask)
+
+    def add(self, sig, bands):
+        pos = len(self.signatures)
+        self.signatures.append(sig)
+        self._sorted_keys = None
+        if sig[0] != _MAX_HASH:
+            for buckets, band in zip(self.buckets, bands.tolist()):
+                buckets.setdefault(band, []).append(pos)
+        return pos
+
+
+# ------------------------------------------------
+# Detection
+# ------------------------------------------------
+def find_duplicates(path, reference_files=(), workers=WORKERS, threshold=NEAR_THRESHOLD):
+    """Dedup map rows (dicts with MAP_COLUMNS) for the dataset at path."""
+    rows = []
+    index = LSHIndex()
+    keys, answers, first_exact = [], [], {}
+
+    with Pool(workers) as pool:
+        for chunk_keys, chunk_answers, chunk_exact, sigs, bands in iter_signatures(path, pool):
+            for key, answer, ek, sig, band in zip(chunk_keys, chunk_answers, chunk_exact, sigs, bands):
+                if ek in first_exact:
+                    rows.append({"id": key, "kind": "exact", "duplicate_of": keys[first_exact[ek]],
+                                 "similarity": 1.0, "same_answer": True})
+                else:
+                    hits = index.query(sig, band, threshold)
+                    if hits:
+                        # earliest similar item with the same answer, else the earliest
+                        same_hits = [h for h in hits if answers[h[0]] == answer]
+                        pos, similarity = (same_hits or hits)[0]
+                        same = bool(same_hits)
+                        rows.append({"id": key, "kind": "near" if same else "variant",
+                                     "duplicate_of": keys[pos], "similarity": round(similarity, 4),
+                                     "same_answer": same})
+                    first_exact.setdefault(ek, len(keys))
+                index.add(sig, band)
+                keys.append(key)
+                answers.append(answer)
+
+        for ref in reference_files:
+            if not os.path.exists(ref):
+                print(f"Reference {ref} not found, skipped")
+                continue
+            contaminated = {}
+            for ref_keys, ref_answers, _, sigs, bands in iter_signatures(ref, pool):
+                for i in index.candidate_rows(bands):
+                    for pos, similarity in index.query(sigs[i], bands[i], threshold):
+                        if similarity > contaminated.get(pos, (None, 0.0))[1]:
+                            contaminated[pos] = (ref_keys[i], similarity,
+                                                 ref_answers[i] == answers[pos])
+            for pos, (ref_key, similarity, same) in sorted(contaminated.items()):
+                rows.append({"id": keys[pos], "kind": "contaminated", "duplicate_of": ref_key,
+                             "similarity": round(similarity, 4), "same_answer": same})
+
+    return rows, keys
+
+
+def resolve(rows):
+    """Point every exact / near duplicate at the canonical (first) item of its group."""
+    parent = {r["id"]: r["duplicate_of"] for r in rows if r["kind"] in ("exact", "near")}
+    for row in rows:
+        if row["kind"] in ("exact", "near"):
+            target = row["duplicate_of"]
+            while target in parent:
+                target = parent[target]
+            row["duplicate_of"] = target
+    return rows
+
+
+def write_map(rows, path):
+    import csv
+
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MAP_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# ------------------------------------------------
+# Inference side
+# ------------------------------------------------
+def drop_duplicates(df, dataset_file, kinds=SKIP_KINDS):
+    """
+    df without the items the dataset's dedup map lists with one of kinds
+    (matched on the id column). Unchanged when there is no map.
+    """
+    import pandas as pd
+
+    path = dedup_map_path(dataset_file)
+    if not os.path.exists(path) or "id" not in df.columns:
+        return df
+    dedup = pd.read_csv(path, dtype={"id": str})
+    skip = set(dedup.loc[dedup["kind"].isin(kinds), "id"])
+    keep = ~df["id"].astype(str).isin(skip)
+    if not keep.all():
+        print(f"Skipping {int((~keep).sum())} duplicate items listed in {path}")
+    return df[keep]
+
+
+def summarize(rows, dataset_file):
+    """Counts per kind, and per source when the dataset has one."""
+    sources = {}
+    with open(dataset_file, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                obj = json.loads(line)
+                if "id" in obj:
+                    sources[obj["id"]] = obj.get("source", "")
+
+    by_kind = Counter(r["kind"] for r in rows)
+    by_source = Counter((r["kind"], sources.get(r["id"], "")) for r in rows)
+    lines = [f"{kind:13s} {n:6d}" for kind, n in sorted(by_kind.items())]
+    lines += [f"  {kind:11s} {source or '-':24s} {n:6d}"
+              for (kind, source), n in sorted(by_source.items())]
+    return "\n".join(lines)
+
+
+def main(input_file=INPUT_FILE, reference_files=REFERENCE_FILES, output=None,
+         workers=WORKERS, threshold=NEAR_THRESHOLD):
+    output = output or dedup_map_path(input_file)
+    rows, keys = find_duplicates(input_file, reference_files, workers, threshold)
+    rows = resolve(rows)
+    write_map(rows, output)
+
+    print(f"{len(keys)} items, {sum(r['kind'] in SKIP_KINDS for r in rows)} duplicates")
+    if rows:
+        print(summarize(rows, input_file))
+    print(f"Saved -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# src_combined/embeddings.py
+
+"""
+Embedding-based answer equivalence on CPU, with a persistent cache.
+
+Open-ended answers ("Barack Obama" vs "Obama", "in 1994" vs "1994") are
+compared by the cosine similarity of sentence embeddings from a small
+local model (all-MiniLM-L6-v2, ~23M parameters, runs fine on CPU) instead
+of string containment or per-pair BERTScore:
+
+    same = semantic_matches(preds, golds)          # evaluation, 0/1 per pair
+    keys = semantic_keys(answers, question_ids)    # voting, see aggregators.py
+
+Every distinct normalized answer is encoded once, ever: vectors are stored
+in a SQLite cache keyed by (model, normalized text), and only cache misses
+are sent through the model, in batches sorted by length to keep padding
+small. transformers / torch are imported on the first cache miss.
+"""
+
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+CACHE_DB = os.getenv("EMBED_CACHE_DB", "outputs/embeddings.sqlite")
+BATCH_SIZE = 64
+MAX_TOKENS = 64           # answers are short; longer ones are truncated
+SIM_THRESHOLD = 0.85      # cosine similarity at or above which answers are equivalent
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text  TEXT NOT NULL,
+    dim   INTEGER NOT NULL,
+    vec   BLOB NOT NULL,
+    PRIMARY KEY (model, text)
+);
+"""
+
+_model = None
+
+
+def normalize_text(text):
+    """Same normalization as aggregators.normalize_answers, for one string."""
+    text = re.sub(r"[^\w\s]", " ", str(text or "").lower())
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return " ".join(text.split())
+
+
+# ------------------------------------------------
+# Cache
+# ------------------------------------------------
+def connect(db_path=None):
+    db_path = db_path or CACHE_DB
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def cache_get(conn, texts, model=EMBED_MODEL):
+    found = {}
+    texts = list(texts)
+    for i in range(0, len(texts), 500):  # stay below SQLite's variable limit
+        chunk = texts[i:i + 500]
+        rows = conn.execute(
+            f"SELECT text, vec FROM embeddings WHERE model = ? AND text IN "
+            f"({','.join('?' * len(chunk))})", [model, *chunk])
+        for text, vec in rows:
+            found[text] = np.frombuffer(vec, dtype=np.float32)
+    return found
+
+
+def cache_put(conn, vectors, model=EMBED_MODEL):
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text, dim, vec) VALUES (?, ?, ?, ?)",
+            [(model, text, len(vec), vec.astype(np.float32).tobytes())
+             for text, vec in vectors.items()])
+
+
+# ------------------------------------------------
+# Model
+# ------------------------------------------------
+def load_model():
+    global _model
+    if _model is None:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        torch.set_grad_enabled(False)
+        tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL)
+        model = AutoModel.from_pretrained(EMBED_MODEL).eval()
+        _model = (tokenizer, model)
+    return _model
+
+
+def encode_batch(texts):
+    """Mean-pooled, L2-normalized embeddings of one batch (float32 array)."""
+    tokenizer, model = load_model()
+    batch = tokenizer(texts, padding=True, truncation=True,
+                      max_length=MAX_TOKENS, return_tensors="pt")
+    hidden = model(**batch).last_hidden_state
+    mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+    pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+    pooled = pooled / pooled.norm(dim=1, keepdim=True).clamp(min=1e-9)
+    return pooled.numpy().astype(np.float32)
+
+
+def embed(texts, db_path=None):
+    """
+    Embedding matrix aligned with texts. Texts are normalized first; only
+    normalized strings missing from the cache are encoded.
+    """
+    keys = [normalize_text(t) for t in texts]
+    unique = list(dict.fromkeys(keys))
+
+    conn = connect(db_path)
+    vectors = cache_get(conn, unique)
+    missing = sorted((k for k in unique if k not in vectors), key=len)
+    new = {}
+    for i in range(0, len(missing), BATCH_SIZE):
+        batch = missing[i:i + BATCH_SIZE]
+        new.update(zip(batch, encode_batch(batch)))
+    if new:
+        cache_put(conn, new)
+        vectors.update(new)
+    conn.close()
+
+    if not keys:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([vectors[k] for k in keys])
+
+
+# ------------------------------------------------
+# Equivalence
+# ------------------------------------------------
+def cluster_labels(vectors, threshold=SIM_THRESHOLD):
+    """
+    Greedy threshold clustering: in order, each unassigned answer opens a
+    cluster with every unassigned answer at least threshold-similar to it.
+    Returns the index of each answer's cluster leader.
+    """
+    sim = vectors @ vectors.T
+    labels = np.full(len(vectors), -1)
+    for i in range(len(vectors)):
+        if labels[i] < 0:
+            labels[(labels < 0) & (sim[i] >= threshold)] = i
+            labels[i] = i
+    return labels
+
+
+def semantic_keys(answers, groups, threshold=SIM_THRESHOLD):
+    """
+    Voting key per answer: the normalized text of its cluster leader among
+    the answers of the same group (question). answers and groups are
+    equal-length sequences; returns a list of keys.
+    """
+    keys = [normalize_text(a) for a in answers]
+    unique = list(dict.fromkeys(keys))
+    index = {k: i for i, k in enumerate(unique)}
+    vectors = embed(unique)
+
+    members = {}
+    for key, group in zip(keys, groups):
+        members.setdefault(group, {})[key] = None
+
+    leader = {}
+    for group, group_keys in members.items():
+        group_keys = list(group_keys)
+        labels = cluster_labels(vectors[[index[k] for k in group_keys]], threshold)
+        for key, label in zip(group_keys, labels):
+            leader[group, key] = group_keys[label]
+
+    return [leader[group, key] for key, group in zip(keys, groups)]
+
+
+def semantic_matches(preds, golds, threshold=SIM_THRESHOLD):
+    """1.0 where pred and gold are equal after normalization or embed close."""
+    preds, golds = list(preds), list(golds)
+    vectors = embed(preds + golds)
+    p, g = vectors[:len(preds)], vectors[len(preds):]
+    same = np.array([normalize_text(a) == normalize_text(b) for a, b in zip(preds, golds)])
+    return ((np.einsum("ij,ij->i", p, g) >= threshold) | same).astype(float).tolist()
@@ -1,106 +1,299 @@
 # src/evaluate_com.py
 
 import pandas as pd
-import numpy as np
-import re
 import os
+from functools import lru_cache
 
 # Import your new matching functions
 from answer_matching import (
     exact_match,
     f1_token_level,
-    bert_score
+    bert_scores
 )
+from calibration import grouped_metrics, bin_table, bootstrap_ci, format_table
+from run_registry import (
+    find_runs, set_eval_path, save_metrics, save_intervals, save_bins
+)
+from tracing import span, count
+
+# Runs are selected from the run registry by attribute (any run column),
+# e.g. {"method": ["baseline", "cot"], "model": "llama-3.1-8b-instant"}.
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+LATEST_ONLY = True   # newest run per (method, model, dataset)
+
+# Besides whole runs, metrics are also broken down by these columns.
+GROUP_COLUMNS = ["source", "type"]
+
+# Older result files lack source/type; they are backfilled from the
+# dataset by question text when this file exists.
+DATASET_FILE = "data/combined_qa_dataset_800.jsonl"
+
+# Per slice, the cheapest method whose ECE is within this of the best
+# method on that slice is recommended.
+ECE_TOLERANCE = 0.02
 
-INPUT_CSV = "outputs/baseline_groq.csv"
+EVAL_DIR = "outputs/eval"
+OUTPUT_CSV = "outputs/eval_results_detailed.csv"
 NUM_BINS = 10
+NUM_BOOTSTRAP = 1000  # resamples for the per-run 95% CIs
+
+# Also report embedding equivalence of pred and gold (embeddings.py, small
+# CPU model with a persistent cache) next to exact match / token F1. Off by
+# default: it needs torch / transformers and downloads the model on first use.
+SEMANTIC_MATCH = False
+
+# Rows per chunk for result files too large to load at once (see
+# chunked_eval.py); None loads every run into one frame as before. The
+# chunked mode skips BERTScore and the bootstrap intervals, and writes a
+# compact per-run detail file instead of the combined OUTPUT_CSV.
+CHUNK_SIZE = None
+WORKERS = 1   # processes scoring chunks in the chunked mode
 
 
 # ------------------------------------------------
-# Normalization for fallback semantic checks
+# Load all selected runs into one frame
 # ------------------------------------------------
-def normalize(text):
-    if text is None:
-        return ""
-    text = str(text).lower().strip()
-    text = re.sub(r"[^a-z0-9\s]", "", text)
-    return " ".join(text.split())
+def load_runs(runs):
+    frames = []
+    for run in runs:
+        with span("read_csv", run_id=run["run_id"]):
+            df = pd.read_csv(run["path"])
+        df.insert(0, "run_id", run["run_id"])
+        df.insert(1, "method", run["method"])
+        df.insert(2, "model", run["model"])
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+    df = backfill_slices(df)
+
+    # Fix missing confidence
+    df["confidence"] = df["confidence"].fillna(0.5)
+    df["pred"] = df["pred"].astype(str)
+    df["gold"] = df["gold"].astype(str)
+    return df
+
+
+@lru_cache(maxsize=1)
+def dataset_slices():
+    """question -> GROUP_COLUMNS of DATASET_FILE, read once per process."""
+    return (pd.read_json(DATASET_FILE, lines=True)[["question"] + GROUP_COLUMNS]
+            .drop_duplicates("question"))
+
+
+def backfill_slices(df):
+    missing = [c for c in GROUP_COLUMNS if c not in df.columns or df[c].isna().any()]
+    if not missing or not os.path.exists(DATASET_FILE):
+        return df
+
+    df = df.merge(dataset_slices(), on="question", how="left", suffixes=("", "_dataset"))
+    for col in GROUP_COLUMNS:
+        if col in df.columns and f"{col}_dataset" in df.columns:
+            df[col] = df[col].fillna(df.pop(f"{col}_dataset"))
+    return df
 
 
 # ------------------------------------------------
-# Calibration: Brier Score
+# Which slices need the expensive methods
 # ------------------------------------------------
-def brier_score(y_true, y_prob):
-    return np.mean((y_prob - y_true) ** 2)
+def slice_recommendations(table, runs, col):
+    """
+    For every value of col, pick the cheapest method (API calls per item)
+    whose ECE is within ECE_TOLERANCE of the best method on that slice.
+    """
+    cost = pd.DataFrame(runs)[["run_id", "method", "num_samples"]]
+    table = table.merge(cost, on="run_id")
+    # cascade runs record the calls they actually made per item
+    calls = table["num_calls"] if "num_calls" in table else pd.Series(float("nan"), table.index)
+    table["calls"] = calls.fillna(table["num_samples"]).fillna(1)
+
+    best = table.groupby(col)["ece"].transform("min")
+    ok = table[table["ece"] <= best + ECE_TOLERANCE]
+    pick = ok.sort_values([col, "calls", "ece"]).drop_duplicates(col)
+
+    pick = pick.rename(columns={"method": "recommended", "ece": "ece_recommended"})
+    pick["best_ece"] = best.loc[pick.index]
+    return pick[[col, "recommended", "calls", "ece_recommended", "best_ece", "n"]]
 
 
 # ------------------------------------------------
-# Calibration: Expected Calibration Error
+# Text matching metrics, once per unique (pred, gold)
 # ------------------------------------------------
-def compute_ece(probs, correct, num_bins=10):
-    bins = np.linspace(0, 1, num_bins + 1)
-    ece = 0.0
+def score_pairs(df):
+    """
+    Runs share most (pred, gold) pairs (yes/no answers, repeated golds),
+    so every metric is computed on the de-duplicated pairs only and merged
+    back. BERTScore is a single batched call, i.e. one model load; the
+    embedding match only encodes answers not already in its cache.
+    """
+    pairs = df[["pred", "gold"]].drop_duplicates(ignore_index=True)
+    preds = pairs["pred"].tolist()
+    golds = pairs["gold"].tolist()
+
+    with span("exact_match"):
+        pairs["exact_match"] = [exact_match(p, g) for p, g in zip(preds, golds)]
+    with span("token_f1"):
+        pairs["token_f1"] = [f1_token_level(p, g) for p, g in zip(preds, golds)]
+    with span("bertscore", pairs=len(pairs)):
+        pairs["bertscore"] = bert_scores(preds, golds)
+    if SEMANTIC_MATCH:
+        from embeddings import semantic_matches
 
-    for i in range(num_bins):
-        mask = (probs >= bins[i]) & (probs < bins[i + 1])
-        if mask.sum() == 0:
+        with span("semantic_match", pairs=len(pairs)):
+            pairs["semantic_match"] = semantic_matches(preds, golds)
+    count("rows", len(df))
+    count("unique_pairs", len(pairs))
+
+    print(f"Scored {len(pairs)} unique (pred, gold) pairs for {len(df)} rows")
+    return df.merge(pairs, on=["pred", "gold"], how="left")
+
+
+def score_matches(chunk):
+    """Chunk scorer of the chunked mode: score_pairs without BERTScore."""
+    pairs = chunk[["pred", "gold"]].drop_duplicates(ignore_index=True)
+    preds = pairs["pred"].tolist()
+    golds = pairs["gold"].tolist()
+
+    pairs["exact_match"] = [exact_match(p, g) for p, g in zip(preds, golds)]
+    pairs["token_f1"] = [f1_token_level(p, g) for p, g in zip(preds, golds)]
+    if SEMANTIC_MATCH:
+        from embeddings import semantic_matches
+
+        pairs["semantic_match"] = semantic_matches(preds, golds)
+
+    scores = chunk[["pred", "gold"]].merge(pairs, on=["pred", "gold"], how="left")
+    scores = scores.drop(columns=["pred", "gold"]).set_index(chunk.index)
+    scores["correct"] = scores["exact_match"]
+    return scores
+
+
+# ------------------------------------------------
+# Chunked (out-of-core) evaluation
+# ------------------------------------------------
+def main_chunked(runs):
+    from chunked_eval import evaluate_file
+
+    extra = ["token_f1", "semantic_match", "num_calls"]
+    per_run, per_slice, bins = [], {col: [] for col in GROUP_COLUMNS}, []
+
+    for run in runs:
+        run_id = run["run_id"]
+        eval_path = os.path.join(EVAL_DIR, f"{run_id}.csv")
+        with span("evaluate_file", run_id=run_id, chunk_size=CHUNK_SIZE):
+            stats = evaluate_file(run["path"], score_matches, GROUP_COLUMNS, extra,
+                                  detail_path=eval_path, chunk_size=CHUNK_SIZE,
+                                  workers=WORKERS, num_bins=NUM_BINS,
+                                  prepare_fn=backfill_slices)
+        if not stats.n:
+            print(f"Skipping {run_id}: {run['path']} has no result rows")
             continue
+        set_eval_path(run_id, eval_path)
+        count("rows", stats.n)
 
-        avg_conf = probs[mask].mean()
-        avg_acc = correct[mask].mean()
+        per_run.append(stats.table("run").assign(run_id=run_id))
+        bins.append(stats.bins().assign(run_id=run_id))
+        for col in GROUP_COLUMNS:
+            table = stats.table(col)
+            if len(table):
+                per_slice[col].append(table.assign(run_id=run_id))
 
-        ece += abs(avg_conf - avg_acc) * (mask.sum() / len(probs))
+    if not per_run:
+        return
+    per_run = pd.concat(per_run, ignore_index=True).merge(
+        pd.DataFrame(runs)[["run_id", "method", "model"]], on="run_id")
+    save_metrics(per_run, "run")
+    save_bins(pd.concat(bins, ignore_index=True))
 
-    return ece
+    print("=== Evaluation (per run, chunked) ===")
+    print(format_table(per_run[["run_id", "method", "model", "n", "accuracy", "token_f1",
+                                "brier", "ece"]
+                               + (["semantic_match"] if SEMANTIC_MATCH else [])]))
+
+    for col, tables in per_slice.items():
+        if not tables:
+            continue
+        table = pd.concat(tables, ignore_index=True)
+        table = table[["run_id"] + [c for c in table.columns if c != "run_id"]]
+        save_metrics(table, col)
+        print(f"\n=== Evaluation (per run, per {col}) ===")
+        print(format_table(table))
+        if len(runs) > 1:
+            print(f"\n--- Cheapest well-calibrated method per {col} ---")
+            print(format_table(slice_recommendations(table, runs, col)))
+
+    print(f"\nSaved compact detail files for {len(per_run)} run(s) -> {EVAL_DIR}/")
 
 
 # ------------------------------------------------
 # Main Evaluation Pipeline
 # ------------------------------------------------
 def main():
-    df = pd.read_csv(INPUT_CSV)
+    runs = find_runs(latest=LATEST_ONLY, **RUN_FILTERS)
+    if not runs:
+        print(f"No registered runs match {RUN_FILTERS}")
+        return
+    if CHUNK_SIZE:
+        return main_chunked(runs)
 
-    # Fix missing confidence
-    df["confidence"] = df["confidence"].fillna(0.5)
+    with span("load_runs", runs=len(runs)):
+        df = load_runs(runs)
+    with span("score_pairs"):
+        df = score_pairs(df)
+    df["correct"] = df["exact_match"]  # For calibration, binary needed
 
-    preds = df["pred"].astype(str).tolist()
-    golds = df["gold"].astype(str).tolist()
+    extra = ["token_f1", "bertscore", "semantic_match", "num_calls"]
 
-    # ---------- TEXT MATCHING METRICS ----------
-    df["exact_match"] = [
-        exact_match(p, g) for p, g in zip(preds, golds)
-    ]
+    # ---------- PER RUN ----------
+    with span("metrics_per_run"):
+        per_run = grouped_metrics(df, ["run_id"], extra_cols=extra, num_bins=NUM_BINS)
+        per_run = per_run.merge(pd.DataFrame(runs)[["run_id", "method", "model"]], on="run_id")
+        save_metrics(per_run, "run")
+        save_bins(bin_table(df, ["run_id"], num_bins=NUM_BINS))
+    with span("bootstrap", num_boot=NUM_BOOTSTRAP):
+        for run_id, run_df in df.groupby("run_id", sort=False):
+            save_intervals(run_id, bootstrap_ci(run_df["confidence"].values,
+                                                run_df["correct"].values,
+                                                num_boot=NUM_BOOTSTRAP,
+                                                num_bins=NUM_BINS))
 
-    df["token_f1"] = [
-        f1_token_level(p, g) for p, g in zip(preds, golds)
-    ]
+    print("=== Evaluation (per run) ===")
+    print(format_table(per_run[["run_id", "method", "model", "n", "accuracy",
+                                "token_f1", "bertscore", "brier", "ece"]
+                               + (["semantic_match"] if SEMANTIC_MATCH else [])]))
 
-    df["bertscore"] = [
-        bert_score(p, g) for p, g in zip(preds, golds)
-    ]
+    # ---------- PER SLICE ----------
+    for col in GROUP_COLUMNS:
+        if col not in df.columns:
+            continue
+        df[col] = df[col].fillna("unknown")
+        with span("metrics_per_slice", column=col):
+            table = grouped_metrics(df, ["run_id", col], extra_cols=extra, num_bins=NUM_BINS)
+            save_metrics(table, col)
 
-    # Accuracy = mean of exact match
-    acc = df["exact_match"].mean()
+        print(f"\n=== Evaluation (per run, per {col}) ===")
+        print(format_table(table))
 
-    # ---------- CALIBRATION METRICS ----------
-    probs = df["confidence"].values
-    correct_binary = df["exact_match"].values  # For calibration, binary needed
+        if len(runs) > 1:
+            print(f"\n--- Cheapest well-calibrated method per {col} ---")
+            print(format_table(slice_recommendations(table, runs, col)))
 
-    brier = brier_score(correct_binary, probs)
-    ece = compute_ece(probs, correct_binary, NUM_BINS)
+    # ---------- CASCADE STAGES ----------
+    if "stage" in df.columns and df["stage"].notna().any():
+        staged = df[df["stage"].notna()]
+        table = grouped_metrics(staged, ["run_id", "stage"], extra_cols=extra, num_bins=NUM_BINS)
+        print("\n=== Cascade runs (per answering stage) ===")
+        print(format_table(table))
 
-    # ---------- PRINT RESULTS ----------
-    print("=== Evaluation ===")
-    print(f"Exact-Match Accuracy   : {acc:.3f}")
-    print(f"Avg Token F1           : {df['token_f1'].mean():.3f}")
-    print(f"Avg BERTScore F1       : {df['bertscore'].mean():.3f}")
-    print("--- Calibration ---")
-    print(f"Brier Score            : {brier:.3f}")
-    print(f"ECE (10 bins)          : {ece:.3f}")
+    # ---------- SAVE ----------
+    with span("write_csv"):
+        os.makedirs(EVAL_DIR, exist_ok=True)
+        for run_id, run_df in df.groupby("run_id", sort=False):
+            eval_path = os.path.join(EVAL_DIR, f"{run_id}.csv")
+            run_df.drop(columns=["run_id", "method", "model"]).to_csv(eval_path, index=False)
+            set_eval_path(run_id, eval_path)
 
-    # Save detailed result sheet
-    df.to_csv("outputs/eval_results_detailed.csv", index=False)
-    print("Saved detailed results -> outputs/eval_results_detailed.csv")
+        # Save detailed result sheet
+        df.to_csv(OUTPUT_CSV, index=False)
+    print(f"\nSaved detailed results for {len(runs)} run(s) -> {OUTPUT_CSV}")
 
 
 if __name__ == "__main__":
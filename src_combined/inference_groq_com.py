@@ -1,91 +1,102 @@
 # src/inference_groq_com.py
 
 import os
-import pandas as pd
-from groq import Groq
-from dotenv import load_dotenv
-from tqdm import tqdm
-import re
 
-load_dotenv()
+from dedup import drop_duplicates
+from live_metrics import LiveMetrics
+from llm_client import chat_with_logprobs, model_label
+from parsing import parse_baseline_output, is_parse_failure
+from prompt_builder import load_prompt, PromptStats
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from sequential import run_items, stratified_order
+from tracing import span
 
-file = open("Groq_api_key.txt", "r")
-key = file.read()
-client = Groq(api_key=key)
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
 
 INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
-OUTPUT_CSV = "outputs/baseline_groq.csv"
-PROMPT_TEMPLATE = open("prompts/baseline.txt").read()
+METHOD = "baseline"  # results go to outputs/baseline/<run_id>.csv
+PROMPT_FILE = os.path.join(PROMPT_DIR, "baseline.txt")
 
 # MODEL_NAME = "llama-3.1-8b-instant"
 MODEL_NAME = "llama-3.3-70b-versatile"
-
-
-def parse_model_output(text):
-    txt = text.lower().strip()
-
-    # detect yes/no anywhere in text
-    if "yes" in txt:
-        ans = "yes"
-    elif "no" in txt:
-        ans = "no"
-    elif "true" in txt:
-        ans = "yes"
-    elif "false" in txt:
-        ans = "no"
-    else:
-        ans = "yes"  # fallback
-
-    # extract first float between 0 and 1
-    numbers = re.findall(r"0\.\d+|1\.0+|1|0", txt)
-
-    conf = None
-    for num in numbers:
-        try:
-            v = float(num)
-            if 0 <= v <= 1:
-                conf = v
-                break
-        except:
-            pass
-
-    if conf is None:
-        conf = 0.5
-
-    return ans, conf, text
+CONCURRENCY = 1   # parallel requests, see benchmarks/bench_inference.py
+SEQUENTIAL = False  # stop once the metric CIs are narrow enough, see sequential.py
+
+
+def answer_question(row, usage, prompt_stats=None):
+    question = row["question"]
+    gold = row["answer"]
+
+    with span("format_prompt"):
+        template = load_prompt(PROMPT_FILE, ["question"])
+        prompt = template.render(question=question)
+    if prompt_stats is not None:
+        prompt_stats.add(template, prompt)
+
+    text, logprob_conf = chat_with_logprobs(MODEL_NAME, prompt, usage)
+    with span("parse"):
+        pred, conf, raw = parse_baseline_output(text)
+
+    return {
+        "id": row.get("id"),
+        "question": question,
+        "source": row.get("source"),
+        "type": row.get("type"),
+        "gold": gold,
+        "pred": pred,
+        "confidence": conf,
+        "logprob_confidence": logprob_conf,
+        "parse_ok": not is_parse_failure(text, "baseline"),
+        "raw_response": raw
+    }
 
 
 def main():
-    df = pd.read_json(INPUT_FILE, lines=True)
-    df = df.head(500)  # small evaluation batch
+    import pandas as pd
 
-    rows = []
-
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        question = row["question"]
-        gold = row["answer"]
-
-        prompt = PROMPT_TEMPLATE.format(question=question)
-
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}]
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    df = drop_duplicates(df, INPUT_FILE)
+    if SEQUENTIAL:
+        df = stratified_order(df)
+    else:
+        df = df.head(500)  # small evaluation batch
+
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    live = LiveMetrics(output_csv)
+    prompt_stats = PromptStats()
+    started_at = now()
+
+    items = [row for _, row in df.iterrows()]
+    with span("inference", items=len(items), concurrency=CONCURRENCY):
+        rows = run_items(
+            lambda row: answer_question(row, usage, prompt_stats),
+            items, CONCURRENCY, usage, SEQUENTIAL, live)
+    live.close()
+
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print(f"Saved -> {output_csv}")
+
+    print(prompt_stats.summary())
+    if usage.cached_tokens:
+        print(f"Provider prefix cache: {usage.cached_tokens / usage.prompt_tokens:.1%} "
+              f"of prompt tokens")
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=1,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
         )
 
-        text = response.choices[0].message.content.strip()
-        pred, conf, raw = parse_model_output(text)
-
-        rows.append({
-            "question": question,
-            "gold": gold,
-            "pred": pred,
-            "confidence": conf,
-            "raw_response": raw
-        })
-
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print(f"Saved -> {OUTPUT_CSV}")
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,171 @@
+# src/inference_groq_com_cascade.py
+
+import os
+import json
+from collections import Counter
+
+from dedup import drop_duplicates
+from live_metrics import LiveMetrics
+from llm_client import chat, chat_samples, model_label
+from parsing import parse_baseline_output, parse_cot_output, is_parse_failure
+from prompt_builder import load_prompt, PromptStats
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from sequential import run_items, stratified_order
+from tracing import span, count
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
+METHOD = "cascade"  # results go to outputs/cascade/<run_id>.csv
+
+BASELINE_PROMPT_FILE = os.path.join(PROMPT_DIR, "baseline.txt")
+COT_PROMPT_FILE = os.path.join(PROMPT_DIR, "cot_statement.txt")
+
+MODEL_NAME = "llama-3.1-8b-instant"
+NUM_SAMPLES = 5   # self-consistency samples, the CoT answer counts as the first
+TEMPERATURE = 1.0   # self-consistency sampling temperature, as in inference_groq_com_selfconsistency.py
+CONCURRENCY = 1   # parallel questions, see benchmarks/bench_inference.py
+SEQUENTIAL = False  # stop once the metric CIs are narrow enough, see sequential.py
+
+# Learned offline by cascade_thresholds.py; the defaults are only used
+# until that has been run once.
+THRESHOLDS_FILE = "outputs/cascade_thresholds.json"
+DEFAULT_THRESHOLDS = {"t_cot": 0.8, "t_sc": 0.7}
+
+
+def load_thresholds():
+    if os.path.exists(THRESHOLDS_FILE):
+        with open(THRESHOLDS_FILE) as f:
+            thresholds = json.load(f)
+        print(f"Using learned thresholds from {THRESHOLDS_FILE}")
+    else:
+        thresholds = DEFAULT_THRESHOLDS
+        print(f"{THRESHOLDS_FILE} not found, using default thresholds")
+    return thresholds["t_cot"], thresholds["t_sc"]
+
+
+def ask(template, prompt, usage, prompt_stats=None):
+    if prompt_stats is not None:
+        prompt_stats.add(template, prompt)
+    return chat(MODEL_NAME, prompt, usage)
+
+
+def answer_question(question, t_cot, t_sc, usage, prompt_stats=None):
+    """
+    Cheapest stage first: baseline, then CoT if the baseline confidence is
+    below t_cot, then self-consistency if the CoT confidence is below t_sc.
+    """
+    # --- stage 1: baseline ---
+    baseline = load_prompt(BASELINE_PROMPT_FILE, ["question"])
+    text = ask(baseline, baseline.render(question=question), usage, prompt_stats)
+    with span("parse"):
+        pred, conf, _ = parse_baseline_output(text)
+        parse_ok = not is_parse_failure(text, "baseline")
+    result = {"stage": "baseline", "num_calls": 1,
+              "conf_baseline": conf, "pred": pred, "confidence": conf, "parse_ok": parse_ok}
+    if conf >= t_cot:
+        return result
+
+    # --- stage 2: CoT ---
+    cot = load_prompt(COT_PROMPT_FILE, ["question"])
+    cot_prompt = cot.render(question=question)
+    text = ask(cot, cot_prompt, usage, prompt_stats)
+    with span("parse"):
+        pred, conf, _ = parse_cot_output(text)
+        parse_ok = not is_parse_failure(text)
+    result.update({"stage": "cot", "num_calls": 2,
+                   "conf_cot": conf, "pred": pred, "confidence": conf, "parse_ok": parse_ok})
+    if conf >= t_sc:
+        return result
+
+    # --- stage 3: self-consistency, reusing the CoT sample ---
+    answers, confidences = [pred], [conf]
+    if prompt_stats is not None:
+        for _ in range(NUM_SAMPLES - 1):
+            prompt_stats.add(cot, cot_prompt)
+    for text in chat_samples(MODEL_NAME, cot_prompt, NUM_SAMPLES - 1, usage,
+                             temperature=TEMPERATURE):
+        with span("parse"):
+            p, c, _ = parse_cot_output(text)
+            parse_ok = parse_ok and not is_parse_failure(text)
+        answers.append(p)
+        confidences.append(c)
+
+    result.update({
+        "stage": "self_consistency",
+        "num_calls": 1 + NUM_SAMPLES,
+        "pred": Counter(answers).most_common(1)[0][0],
+        "confidence": sum(confidences) / len(confidences),
+        "parse_ok": parse_ok,   # every sample parsed, like the self-consistency script
+    })
+    return result
+
+
+def main():
+    import pandas as pd
+
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    df = drop_duplicates(df, INPUT_FILE)
+    if SEQUENTIAL:
+        df = stratified_order(df)
+    else:
+        df = df.head(20)
+
+    t_cot, t_sc = load_thresholds()
+
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    live = LiveMetrics(output_csv)
+    prompt_stats = PromptStats()
+    started_at = now()
+
+    def run_row(row):
+        question = row["question"]
+        result = answer_question(question, t_cot, t_sc, usage, prompt_stats)
+        count(f"answered_by_{result['stage']}")
+        return {
+            "id": row.get("id"),
+            "question": question,
+            "source": row.get("source"),
+            "type": row.get("type"),
+            "gold": row["answer"],
+            **result,
+        }
+
+    items = [row for _, row in df.iterrows()]
+    with span("inference", items=len(items), concurrency=CONCURRENCY):
+        rows = run_items(run_row, items, CONCURRENCY, usage, SEQUENTIAL, live)
+    live.close()
+
+    out = pd.DataFrame(rows)
+    with span("write_csv"):
+        out.to_csv(output_csv, index=False)
+    print(f"Saved -> {output_csv}")
+
+    print("--- Stage that answered ---")
+    print(out["stage"].value_counts().to_string())
+    print(f"API calls per item: {out['num_calls'].mean():.2f} "
+          f"(self-consistency everywhere: {NUM_SAMPLES})")
+
+    print(prompt_stats.summary())
+    if usage.cached_tokens:
+        print(f"Provider prefix cache: {usage.cached_tokens / usage.prompt_tokens:.1%} "
+              f"of prompt tokens")
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=NUM_SAMPLES,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,135 +1,106 @@
 # src/inference_groq_com_cot.py
 
 import os
-import pandas as pd
-from groq import Groq
-from dotenv import load_dotenv
-from tqdm import tqdm
-import re
 
-load_dotenv()
+from dedup import drop_duplicates
+from live_metrics import LiveMetrics
+from llm_client import chat_with_logprobs, model_label
+from parsing import parse_cot_output, is_parse_failure
+from prompt_builder import load_prompt, PromptStats
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from sequential import run_items, stratified_order
+from tracing import span
 
-file = open("Groq_api_key.txt", "r")
-key = file.read()
-client = Groq(api_key=key)
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
 
 INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
-OUTPUT_CSV = "outputs/baseline_groq_cot.csv"
+METHOD = "cot"  # results go to outputs/cot/<run_id>.csv
 
 # Chain-of-Thought style prompt
-COT_PROMPT_TEMPLATE = """
-You are a scientific fact verification assistant.
-
-You will decide whether the following statement is factually true or false.
-First, think step by step and reason briefly.
-Then, on the LAST TWO LINES, output ONLY:
-
-yes or no
-a confidence score between 0 and 1
-
-Do NOT add labels like "Answer" or "Confidence".
-Do NOT add any other text after the confidence.
-
-Statement: {question}
-"""
+COT_PROMPT_FILE = os.path.join(PROMPT_DIR, "cot_statement.txt")
 
 
 MODEL_NAME = "llama-3.1-8b-instant"   # you can swap to a stronger model if you want
-
-
-def parse_model_output(text: str):
-    """
-    Parse model output of the form:
-
-    <reasoning...>
-    yes
-    0.87
-
-    Robust to minor formatting issues.
-    """
-    txt = text.strip()
-    lines = [l.strip().lower() for l in txt.split("\n") if l.strip()]
-
-    # --- extract yes/no / true/false ---
-    ans = None
-
-    # check lines from bottom upwards (answer should be near the end)
-    for l in reversed(lines):
-        if l in ["yes", "no", "true", "false"]:
-            if l in ["yes", "true"]:
-                ans = "yes"
-            else:
-                ans = "no"
-            break
-
-    # fallback: look anywhere in text
-    if ans is None:
-        low = txt.lower()
-        if " yes" in " " + low or low.startswith("yes"):
-            ans = "yes"
-        elif " no" in " " + low or low.startswith("no"):
-            ans = "no"
-        elif "true" in low:
-            ans = "yes"
-        elif "false" in low:
-            ans = "no"
-        else:
-            ans = "yes"   # default fallback
-
-    # --- extract confidence (first number between 0 and 1) ---
-    conf = None
-    low = txt.lower()
-    numbers = re.findall(r"\d*\.\d+|\d+", low)  # grab all numbers
-
-    for num in numbers:
-        try:
-            v = float(num)
-            if 0 <= v <= 1:
-                conf = v
-                break
-        except ValueError:
-            continue
-
-    if conf is None:
-        conf = 0.5
-
-    return ans, conf, text
+CONCURRENCY = 1   # parallel requests, see benchmarks/bench_inference.py
+SEQUENTIAL = False  # stop once the metric CIs are narrow enough, see sequential.py
+
+
+def answer_question(row, usage, prompt_stats=None):
+    question = row["question"]
+    gold = row["answer"]
+
+    with span("format_prompt"):
+        template = load_prompt(COT_PROMPT_FILE, ["question"])
+        prompt = template.render(question=question)
+    if prompt_stats is not None:
+        prompt_stats.add(template, prompt)
+
+    text, logprob_conf = chat_with_logprobs(MODEL_NAME, prompt, usage)
+    with span("parse"):
+        pred, conf, raw = parse_cot_output(text)
+
+    return {
+        "id": row.get("id"),
+        "question": question,
+        "source": row.get("source"),
+        "type": row.get("type"),
+        "gold": gold,
+        "pred": pred,
+        "confidence": conf,
+        "logprob_confidence": logprob_conf,
+        "parse_ok": not is_parse_failure(text),
+        "raw_response": raw
+    }
 
 
 def main():
-    df = pd.read_json(INPUT_FILE, lines=True)
-
-    # you can change 100 to a larger number if you want
-    df = df.head(20)
-
-    rows = []
-
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        question = row["question"]
-        gold = row["answer"]
-
-        prompt = COT_PROMPT_TEMPLATE.format(question=question)
-
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}]
+    import pandas as pd
+
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    df = drop_duplicates(df, INPUT_FILE)
+
+    if SEQUENTIAL:
+        df = stratified_order(df)
+    else:
+        # you can change 100 to a larger number if you want
+        df = df.head(20)
+
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    live = LiveMetrics(output_csv)
+    prompt_stats = PromptStats()
+    started_at = now()
+
+    items = [row for _, row in df.iterrows()]
+    with span("inference", items=len(items), concurrency=CONCURRENCY):
+        rows = run_items(
+            lambda row: answer_question(row, usage, prompt_stats),
+            items, CONCURRENCY, usage, SEQUENTIAL, live)
+    live.close()
+
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print(f"Saved -> {output_csv}")
+
+    print(prompt_stats.summary())
+    if usage.cached_tokens:
+        print(f"Provider prefix cache: {usage.cached_tokens / usage.prompt_tokens:.1%} "
+              f"of prompt tokens")
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=1,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
         )
 
-        text = response.choices[0].message.content.strip()
-        pred, conf, raw = parse_model_output(text)
-
-        rows.append({
-            "question": question,
-            "gold": gold,
-            "pred": pred,
-            "confidence": conf,
-            "raw_response": raw
-        })
-
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print(f"Saved -> {OUTPUT_CSV}")
-
 
 if __name__ == "__main__":
     main()
@@ -1,136 +1,130 @@
 # src/inference_groq_com_selfconsistency.py
 
 import os
-import pandas as pd
-from groq import Groq
-from dotenv import load_dotenv
-from tqdm import tqdm
-import re
-from collections import Counter
 
-load_dotenv()
+from dedup import drop_duplicates
+from live_metrics import LiveMetrics
+from llm_client import chat_samples, model_label
+from parsing import parse_cot_output, is_parse_failure
+from prompt_builder import load_prompt, PromptStats
+from run_registry import (register_run, new_run_id, run_output_path, dataset_name,
+                          now, UsageCounter)
+from sample_store import SampleWriter, majority_vote, samples_path
+from sequential import run_items, stratified_order
+from tracing import span
 
-file = open("Groq_api_key.txt", "r")
-key = file.read()
-client = Groq(api_key=key)
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
 
 INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
-OUTPUT_CSV = "outputs/self_consistency_groq.csv"
+METHOD = "self_consistency"  # results go to outputs/self_consistency/<run_id>.csv
 
-COT_PROMPT_TEMPLATE = """
-You are a scientific fact verification assistant.
-
-You will decide whether the following statement is factually true or false.
-First, think step by step and reason briefly.
-Then, on the LAST TWO LINES, output ONLY:
-
-yes or no
-a confidence score between 0 and 1
-
-Do NOT add labels like "Answer" or "Confidence".
-Do NOT add any other text after the confidence.
-
-Statement: {question}
-"""
+# Chain-of-Thought style prompt
+COT_PROMPT_FILE = os.path.join(PROMPT_DIR, "cot_statement.txt")
 
 MODEL_NAME = "llama-3.1-8b-instant"   # can swap later
 NUM_SAMPLES = 5                       # number of CoT samples per question
+TEMPERATURE = 1.0                     # sampling temperature; tune both with sweep.py
+CONCURRENCY = 1   # parallel questions, see benchmarks/bench_inference.py
+SEQUENTIAL = False  # stop once the metric CIs are narrow enough, see sequential.py
 
 
-def parse_model_output(text: str):
-    txt = text.strip()
-    lines = [l.strip().lower() for l in txt.split("\n") if l.strip()]
-
-    # --- extract yes/no / true/false ---
-    ans = None
-    for l in reversed(lines):
-        if l in ["yes", "no", "true", "false"]:
-            if l in ["yes", "true"]:
-                ans = "yes"
-            else:
-                ans = "no"
-            break
-
-    if ans is None:
-        low = txt.lower()
-        if " yes" in " " + low or low.startswith("yes"):
-            ans = "yes"
-        elif " no" in " " + low or low.startswith("no"):
-            ans = "no"
-        elif "true" in low:
-            ans = "yes"
-        elif "false" in low:
-            ans = "no"
-        else:
-            ans = "yes"
-
-    # --- extract confidence ---
-    conf = None
-    low = txt.lower()
-    numbers = re.findall(r"\d*\.\d+|\d+", low)
-
-    for num in numbers:
-        try:
-            v = float(num)
-            if 0 <= v <= 1:
-                conf = v
-                break
-        except ValueError:
-            continue
-
-    if conf is None:
-        conf = 0.5
-
-    return ans, conf, text
+def answer_question(row, usage, prompt_stats=None, samples=None):
+    """Aggregate row for one question; the individual samples go to samples
+    (a SampleWriter) when given, keyed by the row's position row.name."""
+    question = row["question"]
+    gold = row["answer"]
 
+    answers = []
+    confidences = []
+    raw_samples = []
+    parse_failures = 0
 
-def main():
-    df = pd.read_json(INPUT_FILE, lines=True)
-    df = df.head(20)  
+    # every sample sends the same prompt, so it is rendered once
+    with span("format_prompt"):
+        template = load_prompt(COT_PROMPT_FILE, ["question"])
+        prompt = template.render(question=question)
 
-    rows = []
-
-    for _, row in tqdm(df.iterrows(), total=len(df)):
-        question = row["question"]
-        gold = row["answer"]
+    if prompt_stats is not None:
+        for _ in range(NUM_SAMPLES):
+            prompt_stats.add(template, prompt)
+
+    # the samples are independent: sent together, one batch in batch mode
+    texts = chat_samples(MODEL_NAME, prompt, NUM_SAMPLES, usage, temperature=TEMPERATURE)
+    for text in texts:
+        with span("parse"):
+            pred, conf, raw = parse_cot_output(text)
+            parse_failures += is_parse_failure(text)
+
+        answers.append(pred)
+        confidences.append(conf)
+        raw_samples.append(raw)
+
+    if samples is not None:
+        samples.add(row.name, answers, confidences, raw_samples)
+
+    # majority vote, average confidence
+    final_pred, avg_conf, vote_share = majority_vote(answers, confidences)
+
+    return {
+        "id": row.get("id"),
+        "question": question,
+        "source": row.get("source"),
+        "type": row.get("type"),
+        "gold": gold,
+        "pred": final_pred,
+        "confidence": avg_conf,
+        "num_samples": len(answers),
+        "vote_share": vote_share,
+        "parse_ok": parse_failures == 0,
+    }
 
-        answers = []
-        confidences = []
-        raw_samples = []
 
-        for _ in range(NUM_SAMPLES):
-            prompt = COT_PROMPT_TEMPLATE.format(question=question)
-
-            response = client.chat.completions.create(
-                model=MODEL_NAME,
-                messages=[{"role": "user", "content": prompt}]
-            )
-
-            text = response.choices[0].message.content.strip()
-            pred, conf, raw = parse_model_output(text)
-
-            answers.append(pred)
-            confidences.append(conf)
-            raw_samples.append(raw)
-
-        # majority vote
-        counts = Counter(answers)
-        final_pred = counts.most_common(1)[0][0]
-
-        # average confidence
-        avg_conf = sum(confidences) / len(confidences)
-
-        rows.append({
-            "question": question,
-            "gold": gold,
-            "pred": final_pred,
-            "confidence": avg_conf,
-            "raw_responses": raw_samples  # list of all raw CoT outputs
-        })
-
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    pd.DataFrame(rows).to_csv(OUTPUT_CSV, index=False)
-    print(f"Saved -> {OUTPUT_CSV}")
+def main():
+    import pandas as pd
+
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    df = drop_duplicates(df, INPUT_FILE)
+    if SEQUENTIAL:
+        df = stratified_order(df)
+    else:
+        df = df.head(20).reset_index(drop=True)
+
+    run_id = new_run_id(METHOD)
+    output_csv = run_output_path(METHOD, run_id)
+    output_samples = samples_path(output_csv)    # one row per sample, see sample_store.py
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    usage = UsageCounter()
+    live = LiveMetrics(output_csv)
+    prompt_stats = PromptStats()
+    started_at = now()
+
+    items = [row for _, row in df.iterrows()]
+    with span("inference", items=len(items), concurrency=CONCURRENCY), \
+            SampleWriter(output_samples) as samples:
+        rows = run_items(
+            lambda row: answer_question(row, usage, prompt_stats, samples),
+            items, CONCURRENCY, usage, SEQUENTIAL, live)
+    live.close()
+
+    with span("write_csv"):
+        pd.DataFrame(rows).to_csv(output_csv, index=False)
+    print(f"Saved -> {output_csv}, samples -> {output_samples}")
+
+    print(prompt_stats.summary())
+    if usage.cached_tokens:
+        print(f"Provider prefix cache: {usage.cached_tokens / usage.prompt_tokens:.1%} "
+              f"of prompt tokens")
+
+    with span("register_run"):
+        register_run(
+            output_csv, model_label(MODEL_NAME), METHOD, dataset_name(INPUT_FILE),
+            num_items=len(rows), num_samples=NUM_SAMPLES,
+            started_at=started_at,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            run_id=run_id,
+        )
 
 
 if __name__ == "__main__":
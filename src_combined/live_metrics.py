@@ -0,0 +1,115 @@
+# src_combined/live_metrics.py
+
+"""
+Live metrics while inference is running.
+
+Every finished item is scored on the spot (exact match of pred / gold,
+like the sequential mode) and folded into a CalibrationAccumulator, so
+memory stays constant however long the run. The progress bar shows
+running accuracy / ECE / Brier, throughput and the parse-failure rate,
+and a snapshot is written every FLUSH_EVERY seconds to
+
+    <output>.live.json      e.g. outputs/baseline/<run_id>.live.json
+
+which can be watched from another shell (watch cat ...). A run whose
+parse-failure rate is above ABORT_PARSE_FAILURE_RATE after MIN_ITEMS
+items is stopped with an error instead of spending the rest of the budget.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from calibration import CalibrationAccumulator, NUM_BINS
+
+FLUSH_EVERY = 5.0                  # seconds between JSON snapshots
+MIN_ITEMS = 30                     # before the abort rule applies
+ABORT_PARSE_FAILURE_RATE = None    # e.g. 0.5; None = never abort
+
+
+def live_path(output_csv):
+    """'outputs/baseline/<run_id>.csv' -> 'outputs/baseline/<run_id>.live.json'"""
+    return os.path.splitext(output_csv)[0] + ".live.json"
+
+
+class LiveMetrics:
+    """
+    Thread-safe running metrics of one run. Rows are the result dicts of
+    the inference scripts; a row's "parse_ok" (when present) counts towards
+    the parse-failure rate.
+    """
+
+    def __init__(self, output_csv, num_bins=NUM_BINS, flush_every=FLUSH_EVERY):
+        self.path = live_path(output_csv)
+        self.flush_every = flush_every
+        self.acc = CalibrationAccumulator(num_bins)
+        self.items = 0
+        self.parse_checked = 0
+        self.parse_failures = 0
+        self.started = time.monotonic()
+        self.last_flush = self.started
+        self._lock = threading.Lock()
+
+    def add(self, row):
+        from sequential import score_row
+
+        confidence, correct = score_row(row)
+        with self._lock:
+            self.items += 1
+            self.acc.add(confidence, correct)
+            if "parse_ok" in row:
+                self.parse_checked += 1
+                self.parse_failures += not row["parse_ok"]
+            flush = time.monotonic() - self.last_flush >= self.flush_every
+        if flush:
+            self.flush()
+        self.check_abort()
+
+    @property
+    def parse_failure_rate(self):
+        return self.parse_failures / self.parse_checked if self.parse_checked else 0.0
+
+    def check_abort(self):
+        if (ABORT_PARSE_FAILURE_RATE is not None and self.parse_checked >= MIN_ITEMS
+                and self.parse_failure_rate > ABORT_PARSE_FAILURE_RATE):
+            self.flush()
+            raise RuntimeError(
+                f"Aborting: {self.parse_failure_rate:.0%} of {self.parse_checked} replies "
+                f"could not be parsed (limit {ABORT_PARSE_FAILURE_RATE:.0%}), see {self.path}")
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                **self.acc.metrics(),
+                "items": self.items,
+                "elapsed_s": round(elapsed, 2),
+                "items_per_s": self.items / elapsed if elapsed > 0 else 0.0,
+                "parse_failure_rate": self.parse_failure_rate,
+                "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+
+    def flush(self):
+        snapshot = self.snapshot()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self.last_flush = time.monotonic()
+
+    def postfix(self):
+        """Short status for the progress bar."""
+        m = self.snapshot()
+        if not m["n"]:
+            return ""
+        return (f"acc={m['accuracy']:.3f} ece={m['ece']:.3f} brier={m['brier']:.3f} "
+                f"{m['items_per_s']:.1f} it/s parse_fail={m['parse_failure_rate']:.0%}")
+
+    def close(self):
+        self.flush()
+        return self.snapshot()
@@ -0,0 +1,166 @@
+# src_combined/llm_client.py
+
+"""
+Chat-completion client shared by the combined-dataset inference scripts.
+
+The client is created on first use (not at import), so scripts can be
+imported by the benchmarks and tools without an API key. Setting
+GROQ_BASE_URL points it at another endpoint, e.g. the fake provider in
+benchmarks/fake_provider.py; LLM_BACKEND=local runs a model on the local
+CPU instead (see local_backend.py), LLM_BACKEND=batch sends the requests
+through the provider's batch API (see batch_backend.py).
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import span, count
+
+API_KEY_FILE = "Groq_api_key.txt"
+MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+BACKEND = os.getenv("LLM_BACKEND", "groq")   # groq | local | batch
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            from groq import Groq
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            if os.path.exists(API_KEY_FILE):
+                with open(API_KEY_FILE) as f:
+                    key = f.read().strip()
+            else:
+                key = os.getenv("GROQ_API_KEY")
+            _client = Groq(api_key=key, max_retries=MAX_RETRIES)
+    return _client
+
+
+def model_label(model):
+    """Model name to record for a run: the local model when it answers."""
+    if BACKEND == "local":
+        from local_backend import LOCAL_MODEL
+
+        return f"local:{LOCAL_MODEL}"
+    return model
+
+
+def complete(model, prompt, usage=None, **kwargs):
+    """Single-turn completion, returns the chat-completion response."""
+    with span("api_call", model=model, backend=BACKEND):
+        if BACKEND == "local":
+            from local_backend import complete as local_complete
+
+            response = local_complete(prompt, **kwargs)
+        elif BACKEND == "batch":
+            from batch_backend import complete as batch_complete
+
+            kwargs.pop("logprobs", None)
+            response = batch_complete(model, prompt, **kwargs)
+        else:
+            kwargs.pop("logprobs", None)
+            response = get_client().chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                **kwargs
+            )
+    count("api_calls")
+    if usage is not None:
+        usage.add(response)
+    return response
+
+
+def chat(model, prompt, usage=None, **kwargs):
+    """Single-turn completion, returns the stripped reply text."""
+    return complete(model, prompt, usage, **kwargs).choices[0].message.content.strip()
+
+
+def chat_samples(model, prompt, n, usage=None, **kwargs):
+    """
+    n independent replies to one prompt (stripped texts). The batch backend
+    queues all of them at once, so they land in one batch; the other
+    backends send them one after another as before.
+    """
+    if BACKEND != "batch":
+        return [chat(model, prompt, usage, **kwargs) for _ in range(n)]
+
+    from batch_backend import complete_many
+
+    kwargs.pop("logprobs", None)
+    with span("api_call", model=model, backend=BACKEND, samples=n):
+        responses = complete_many(model, prompt, n, **kwargs)
+    count("api_calls", len(responses))
+    if usage is not None:
+        for response in responses:
+            usage.add(response)
+    return [r.choices[0].message.content.strip() for r in responses]
+
+
+def chat_with_logprobs(model, prompt, usage=None, **kwargs):
+    """
+    (reply text, confidence from token log-probabilities). The confidence is
+    the geometric mean probability of the generated tokens, None when the
+    backend returns no logprobs (only the local backend does).
+    """
+    choice = complete(model, prompt, usage, logprobs=True, **kwargs).choices[0]
+    content = getattr(getattr(choice, "logprobs", None), "content", None)
+    confidence = None
+    if content:
+        confidence = math.exp(sum(t.logprob for t in content) / len(content))
+    return choice.message.content.strip(), confidence
+
+
+def run_concurrently(fn, items, concurrency=1, progress=True, live=None):
+    """
+    fn(item) for every item, results in input order. Threads, because the
+    work is waiting on the network; concurrency=1 keeps the old sequential
+    behaviour. Every result is passed to live.add() (see live_metrics.py),
+    whose status is shown in the progress bar; an exception from it stops
+    the run without starting the remaining items.
+    """
+    from tqdm import tqdm
+
+    items = list(items)
+    if BACKEND == "local":
+        # callers only wait on the batching thread; enough of them to fill a batch
+        from local_backend import MAX_BATCH
+
+        concurrency = max(concurrency, MAX_BATCH)
+    elif BACKEND == "batch":
+        # every item waits on its next batch in a thread of its own; enough of
+        # them to fill batches, bounded so a large run does not start
+        # thousands of threads
+        from batch_backend import MAX_ITEMS
+
+        concurrency = max(concurrency, min(len(items), MAX_ITEMS))
+
+    results = []
+    with tqdm(total=len(items), disable=not progress) as bar:
+        def done(result):
+            results.append(result)
+            if live is not None:
+                live.add(result)
+                bar.set_postfix_str(live.postfix(), refresh=False)
+            bar.update()
+
+        if concurrency <= 1:
+            for item in items:
+                done(fn(item))
+            return results
+
+        pool = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            for result in pool.map(fn, items):
+                done(result)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+    return results
@@ -0,0 +1,195 @@
+# src_combined/local_backend.py
+
+"""
+Local CPU backend: a small instruction-tuned model through transformers,
+used by llm_client when LLM_BACKEND=local.
+
+    LLM_BACKEND=local LOCAL_MODEL=Qwen/Qwen2.5-0.5B-Instruct python inference_groq_com.py
+
+Requests from the inference threads are queued and served by one worker
+thread with dynamic batching: it collects what arrives within BATCH_WAIT
+seconds (up to MAX_BATCH requests with the same generation settings),
+sorts the prompts by token length and cuts them into sub-batches of at
+most MAX_BATCH_TOKENS padded tokens, so short prompts are not padded to
+the longest one. Each sub-batch is one generate() call with the KV cache
+on and per-token scores kept, from which the log-probability of every
+generated token is returned.
+
+Replies have the shape of a chat-completion response (choices[0].message,
+choices[0].logprobs.content, usage), so UsageCounter and the scripts do
+not care which backend produced them. Nothing is loaded until the first
+request; set HF_HUB_OFFLINE=1 to run from the local model cache.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+LOCAL_MODEL = os.getenv("LOCAL_MODEL", "Qwen/Qwen2.5-0.5B-Instruct")
+NUM_THREADS = int(os.getenv("LOCAL_THREADS", os.cpu_count() or 1))
+
+MAX_BATCH = 16               # requests collected per step
+MAX_BATCH_TOKENS = 4096      # padded prompt tokens per generate() call
+BATCH_WAIT = 0.02            # seconds to wait for more requests
+MAX_NEW_TOKENS = 256
+TEMPERATURE = 1.0            # when a request sets none, like the provider's default
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = LocalEngine(LOCAL_MODEL)
+    return _engine
+
+
+def complete(prompt, **kwargs):
+    """Blocking single request; batched with concurrent callers."""
+    return get_engine().submit(prompt, **kwargs).result()
+
+
+class LocalEngine:
+
+    def __init__(self, model_name):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        torch.set_num_threads(NUM_THREADS)
+        torch.set_grad_enabled(False)
+        self.torch = torch
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=torch.float32).eval()
+
+        self.requests = queue.Queue()
+        self.worker = threading.Thread(target=self._serve, daemon=True)
+        self.worker.start()
+
+    def submit(self, prompt, temperature=None, max_tokens=MAX_NEW_TOKENS, top_p=1.0, **_):
+        future = Future()
+        temperature = TEMPERATURE if temperature is None else temperature
+        settings = (float(temperature), int(max_tokens or MAX_NEW_TOKENS), float(top_p))
+        self.requests.put((self._encode(prompt), settings, future))
+        return future
+
+    def _encode(self, prompt):
+        messages = [{"role": "user", "content": prompt}]
+        if self.tokenizer.chat_template:
+            return self.tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        return self.tokenizer(prompt)["input_ids"]
+
+    # ------------------------------------------------
+    # Batching
+    # ------------------------------------------------
+    def _collect(self):
+        """Block for one request, then take whatever arrives within BATCH_WAIT."""
+        pending = [self.requests.get()]
+        deadline = time.monotonic() + BATCH_WAIT
+        while len(pending) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _serve(self):
+        while True:
+            pending = self._collect()
+            by_settings = {}
+            for request in pending:
+                by_settings.setdefault(request[1], []).append(request)
+
+            for settings, requests in by_settings.items():
+                requests.sort(key=lambda r: len(r[0]))
+                for batch in split_by_tokens(requests):
+                    try:
+                        responses = self._generate([r[0] for r in batch], *settings)
+                    except Exception as e:  # hand the error to every waiting caller
+                        for _, _, future in batch:
+                            future.set_exception(e)
+                        continue
+                    for (_, _, future), response in zip(batch, responses):
+                        future.set_result(response)
+
+    # ------------------------------------------------
+    # Generation
+    # ------------------------------------------------
+    def _generate(self, prompts, temperature, max_tokens, top_p):
+        torch = self.torch
+        tokenizer = self.tokenizer
+
+        width = max(len(p) for p in prompts)
+        pad = tokenizer.pad_token_id
+        input_ids = torch.tensor([[pad] * (width - len(p)) + list(p) for p in prompts])
+        attention_mask = torch.tensor([[0] * (width - len(p)) + [1] * len(p) for p in prompts])
+
+        sampling = temperature > 0
+        out = self.model.generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            max_new_tokens=max_tokens,
+            do_sample=sampling,
+            temperature=temperature if sampling else None,
+            top_p=top_p if sampling else None,
+            use_cache=True,
+            output_scores=True,
+            return_dict_in_generate=True,
+            pad_token_id=pad,
+        )
+        logprobs = self.model.compute_transition_scores(
+            out.sequences, out.scores, normalize_logits=True)
+        generated = out.sequences[:, width:]
+
+        stop = {tokenizer.eos_token_id, pad}
+        if self.model.generation_config.eos_token_id is not None:
+            eos = self.model.generation_config.eos_token_id
+            stop.update(eos if isinstance(eos, list) else [eos])
+
+        responses = []
+        for prompt, ids, scores in zip(prompts, generated.tolist(), logprobs.tolist()):
+            n = next((i for i, t in enumerate(ids) if t in stop), len(ids))
+            tokens = [tokenizer.decode([t]) for t in ids[:n]]
+            responses.append(make_response(
+                self.model_name, tokenizer.decode(ids[:n], skip_special_tokens=True),
+                tokens, scores[:n], len(prompt)))
+        return responses
+
+
+def split_by_tokens(requests, max_tokens=MAX_BATCH_TOKENS):
+    """Length-sorted requests -> sub-batches whose padded size stays in budget."""
+    batch = []
+    for request in requests:
+        longest = len(request[0])   # sorted, so the newest is the longest
+        if batch and (len(batch) + 1) * longest > max_tokens:
+            yield batch
+            batch = []
+        batch.append(request)
+    if batch:
+        yield batch
+
+
+def make_response(model, text, tokens, logprobs, prompt_tokens):
+    """Chat-completion-shaped reply."""
+    content = [SimpleNamespace(token=t, logprob=lp) for t, lp in zip(tokens, logprobs)]
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(
+            message=SimpleNamespace(role="assistant", content=text),
+            logprobs=SimpleNamespace(content=content),
+            finish_reason="stop",
+        )],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(tokens),
+                              prompt_tokens_details=None),
+    )
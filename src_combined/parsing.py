@@ -0,0 +1,111 @@
+# src_combined/parsing.py
+
+"""
+Parsers for the model replies of the combined-dataset prompts.
+
+Shared by the baseline, CoT, self-consistency and cascade scripts. The
+parsers never fail: a reply without an answer or a confidence gets the
+fallback ("yes", 0.5). baseline_fields / cot_fields return None for what
+the reply lacks, and is_parse_failure() tells when a fallback was used, so
+it always agrees with the parser.
+"""
+
+import re
+
+BASELINE_NUMBER = r"0\.\d+|1\.0+|1|0"
+COT_NUMBER = r"\d*\.\d+|\d+"
+
+
+def first_probability(text, pattern):
+    """First number matching pattern that lies in [0, 1], or None."""
+    for num in re.findall(pattern, text):
+        try:
+            v = float(num)
+        except ValueError:
+            continue
+        if 0 <= v <= 1:
+            return v
+    return None
+
+
+def baseline_fields(text):
+    """Baseline prompt: (answer, confidence) found in the reply, None where
+    the reply has none. yes/no plus a confidence anywhere in the reply."""
+    txt = text.lower().strip()
+
+    # detect yes/no anywhere in text
+    if "yes" in txt:
+        ans = "yes"
+    elif "no" in txt:
+        ans = "no"
+    elif "true" in txt:
+        ans = "yes"
+    elif "false" in txt:
+        ans = "no"
+    else:
+        ans = None
+
+    # extract first float between 0 and 1
+    return ans, first_probability(txt, BASELINE_NUMBER)
+
+
+def cot_fields(text: str):
+    """
+    CoT prompt: (answer, confidence) found in a reply of the form
+
+    <reasoning...>
+    yes
+    0.87
+
+    None where the reply has none. Robust to minor formatting issues.
+    """
+    txt = text.strip()
+    lines = [l.strip().lower() for l in txt.split("\n") if l.strip()]
+
+    # --- extract yes/no / true/false ---
+    ans = None
+
+    # check lines from bottom upwards (answer should be near the end)
+    for l in reversed(lines):
+        if l in ["yes", "no", "true", "false"]:
+            if l in ["yes", "true"]:
+                ans = "yes"
+            else:
+                ans = "no"
+            break
+
+    # fallback: look anywhere in text
+    if ans is None:
+        low = txt.lower()
+        if " yes" in " " + low or low.startswith("yes"):
+            ans = "yes"
+        elif " no" in " " + low or low.startswith("no"):
+            ans = "no"
+        elif "true" in low:
+            ans = "yes"
+        elif "false" in low:
+            ans = "no"
+
+    # --- extract confidence (first number between 0 and 1) ---
+    return ans, first_probability(txt.lower(), COT_NUMBER)
+
+
+def with_fallback(ans, conf):
+    return ("yes" if ans is None else ans), (0.5 if conf is None else conf)
+
+
+def parse_baseline_output(text):
+    """Baseline prompt: (answer, confidence, raw reply), with fallbacks."""
+    return (*with_fallback(*baseline_fields(text)), text)
+
+
+def parse_cot_output(text: str):
+    """CoT prompt: (answer, confidence, raw reply), with fallbacks."""
+    return (*with_fallback(*cot_fields(text)), text)
+
+
+def is_parse_failure(text, style="cot"):
+    """True when the parser of that style fell back to a default for the
+    answer or the confidence of this reply."""
+    fields = cot_fields if style == "cot" else baseline_fields
+    return None in fields(text or "")
@@ -1,22 +1,53 @@
+import os
+import matplotlib
+matplotlib.use("Agg")  # headless, no GUI toolkit needed
 import matplotlib.pyplot as plt
 import numpy as np
 
-methods = ["Baseline", "CoT", "Self-Consistency"]
-accuracy = [0.20, 0.10, 0.10]
-brier = [0.557, 0.773, 0.737]
-ece = [0.09, 0.365, 0.773]
-
-x = np.arange(len(methods))
-width = 0.25
-
-plt.figure(figsize=(10,6))
-plt.bar(x - width, accuracy, width, label="Accuracy")
-plt.bar(x, brier, width, label="Brier Score")
-plt.bar(x + width, ece, width, label="ECE")
-
-plt.xticks(x, methods)
-plt.ylabel("Score")
-plt.title("Baseline vs CoT vs Self-Consistency")
-plt.legend()
-plt.grid(axis='y', linestyle='--', alpha=0.6)
-plt.show()
+from run_registry import find_runs, load_metrics
+
+# Metrics come from the registry (written by evaluate_com.py), so the chart
+# always reflects the latest evaluated run per method.
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+METHOD_LABELS = {
+    "baseline": "Baseline",
+    "cot": "CoT",
+    "self_consistency": "Self-Consistency",
+}
+OUT_PNG = "outputs/plots/plot_compare.png"
+
+
+def main():
+    run_ids = [r["run_id"] for r in find_runs(latest=True, **RUN_FILTERS)]
+    rows = load_metrics(run_ids, group_by="run")
+    if not rows:
+        print(f"No evaluated runs match {RUN_FILTERS}; run evaluate_com.py first")
+        return
+
+    methods = [f"{METHOD_LABELS.get(r['method'], r['method'])}\n{r['model']}" for r in rows]
+    accuracy = [r["accuracy"] for r in rows]
+    brier = [r["brier"] for r in rows]
+    ece = [r["ece"] for r in rows]
+
+    x = np.arange(len(methods))
+    width = 0.25
+
+    plt.figure(figsize=(10,6))
+    plt.bar(x - width, accuracy, width, label="Accuracy")
+    plt.bar(x, brier, width, label="Brier Score")
+    plt.bar(x + width, ece, width, label="ECE")
+
+    plt.xticks(x, methods)
+    plt.ylabel("Score")
+    plt.title(" vs ".join(METHOD_LABELS.get(r["method"], r["method"]) for r in rows))
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.6)
+
+    os.makedirs(os.path.dirname(OUT_PNG), exist_ok=True)
+    plt.savefig(OUT_PNG, dpi=150)
+    plt.close()
+    print(f"Saved -> {OUT_PNG}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import json
 import os
 
+from dedup import item_ids
+
 RAW_FILE = "data/raw/combined/combined_qa_ds.jsonl"
 OUT_FILE = "data/processed/combined_clean.jsonl"
 
@@ -15,20 +17,25 @@ def normalize_answer(ans):
 def main():
     os.makedirs("data/processed", exist_ok=True)
 
-    with open(RAW_FILE, "r", encoding="utf8") as fin, \
-         open(OUT_FILE, "w", encoding="utf8") as fout:
-
-        for idx, line in enumerate(fin):
-            obj = json.loads(line)
+    with open(RAW_FILE, "r", encoding="utf8") as fin:
+        records = [json.loads(line) for line in fin]
+    # stable across re-orderings of the raw file, unlike the line number
+    ids = item_ids([obj.get("source", "") for obj in records],
+                   [obj.get("question", "") for obj in records])
 
+    with open(OUT_FILE, "w", encoding="utf8") as fout:
+        for item, obj in zip(ids, records):
             question = obj.get("question", "")
             answer = normalize_answer(obj.get("answer", ""))
 
             out = {
-                "id": idx,
+                "id": item,
                 "question": question,
                 "context": "",   # no context available
-                "answer": answer
+                "answer": answer,
+                # kept so evaluation can break calibration down by slice
+                "source": obj.get("source", ""),
+                "type": obj.get("type", "")
             }
 
             fout.write(json.dumps(out) + "\n")
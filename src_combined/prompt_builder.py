@@ -0,0 +1,109 @@
+# src_combined/prompt_builder.py
+
+"""
+Prompt templates, compiled once and checked against the fields a script
+fills in.
+
+    template = load_prompt(os.path.join(PROMPT_DIR, "cot_statement.txt"), ["question"])
+    prompt = template.render(question=question)
+
+Templates are parsed a single time into static text and placeholders
+instead of re-parsing the file with str.format for every request. A
+placeholder the script does not provide, or a value the template never
+uses (e.g. a {context} that was dropped from the file), raises ValueError
+on load instead of silently producing a different prompt.
+
+Layout: providers with prompt caching reuse the longest prompt prefix
+they have already seen, so templates keep all static instructions before
+the first placeholder and the per-item text at the end. PromptStats
+reports how much of the prompt text sent in a run was such a shared
+prefix.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from string import Formatter
+
+
+class PromptTemplate:
+    def __init__(self, text, fields=None, name="prompt"):
+        self.name = name
+        self.text = text
+        self.segments = []  # (static text, placeholder or None)
+
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise ValueError(f"{name}: unsupported placeholder {{{field}}}")
+            self.segments.append((literal, field))
+
+        self.fields = tuple(dict.fromkeys(f for _, f in self.segments if f is not None))
+        self.field_set = frozenset(self.fields)
+        if fields is not None and set(fields) != self.field_set:
+            raise ValueError(f"{name}: template placeholders {sorted(self.fields)} "
+                             f"do not match the fields provided {sorted(fields)}")
+
+        # static text before the first placeholder is identical in every
+        # request; static text after it cannot be cached by the provider
+        if self.fields:
+            self.static_prefix = self.segments[0][0]
+            self.static_after_first_field = sum(len(lit) for lit, _ in self.segments[1:])
+        else:
+            self.static_prefix = "".join(lit for lit, _ in self.segments)
+            self.static_after_first_field = 0
+
+    def render(self, **values):
+        if values.keys() != self.field_set:
+            missing = self.field_set - values.keys()
+            unused = values.keys() - self.field_set
+            raise ValueError(f"{self.name}: missing {sorted(missing)}, unused {sorted(unused)}")
+        return "".join(lit if f is None else lit + str(values[f])
+                       for lit, f in self.segments)
+
+    def __repr__(self):
+        return (f"PromptTemplate({self.name!r}, fields={self.fields}, "
+                f"static_prefix={len(self.static_prefix)} chars)")
+
+
+@lru_cache(maxsize=None)
+def _load(path, fields):
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    return PromptTemplate(text, fields, name=os.path.basename(path))
+
+
+def load_prompt(path, fields=None):
+    """Read and compile a template file once per process."""
+    return _load(path, None if fields is None else tuple(fields))
+
+
+class PromptStats:
+    """
+    Shared-prefix accounting for one run (thread-safe). Every prompt is
+    compared with the previous prompt of the same template: repeated
+    samples of one question share everything, different questions share
+    the static instruction block.
+    """
+
+    def __init__(self):
+        self.prompts = 0
+        self.chars = 0
+        self.shared_chars = 0
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def add(self, template, prompt):
+        with self._lock:
+            previous = self._last.get(template.name, "")
+            self._last[template.name] = prompt
+            self.prompts += 1
+            self.chars += len(prompt)
+            self.shared_chars += len(os.path.commonprefix([previous, prompt]))
+
+    @property
+    def shared_prefix_ratio(self):
+        return self.shared_chars / self.chars if self.chars else 0.0
+
+    def summary(self):
+        return (f"Prompts: {self.prompts}, shared prefix {self.shared_prefix_ratio:.1%} "
+                f"of {self.chars} chars")
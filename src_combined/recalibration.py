@@ -0,0 +1,245 @@
+# src_combined/recalibration.py
+
+"""
+Post-hoc recalibration of verbalized confidences.
+
+A calibrator is fitted on (confidence, correct) pairs from an evaluated run
+and stored as a small JSON dict, e.g.
+
+    {"method": "platt", "a": 1.7, "b": -0.4}
+
+so it can be applied to new inference output one item at a time with
+calibrate_one() (constant work per item; isotonic does a bisect over its
+few breakpoints) or to whole columns with apply_calibrator().
+
+Methods: histogram binning, isotonic regression, Platt scaling, beta
+calibration and temperature scaling. cross_fit() gives out-of-fold
+calibrated confidences so the improvement can be measured honestly on the
+same run the maps are learned from.
+"""
+
+import bisect
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from calibration import brier_score, compute_ece, format_table
+from run_registry import find_runs
+
+METHODS = ["histogram", "isotonic", "platt", "beta", "temperature"]
+
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+NUM_FOLDS = 5
+HIST_BINS = 10
+OUT_DIR = "outputs/calibrators"
+
+EPS = 1e-6
+
+
+def _clip(p):
+    return np.clip(np.asarray(p, dtype=float), EPS, 1 - EPS)
+
+
+def _logit(p):
+    p = _clip(p)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+def _logistic_fit(features, y):
+    """Unregularized logistic regression, returns (coefs, intercept)."""
+    from sklearn.linear_model import LogisticRegression
+
+    if len(np.unique(y)) < 2:
+        # degenerate fold: predict the constant base rate
+        rate = float(np.clip(np.mean(y), EPS, 1 - EPS))
+        return [0.0] * features.shape[1], math.log(rate / (1 - rate))
+
+    model = LogisticRegression(C=1e6, max_iter=1000)
+    model.fit(features, y)
+    return model.coef_[0].tolist(), float(model.intercept_[0])
+
+
+# ------------------------------------------------
+# Fitting
+# ------------------------------------------------
+def fit_calibrator(conf, correct, method="isotonic", num_bins=HIST_BINS):
+    conf = np.asarray(conf, dtype=float)
+    correct = np.asarray(correct, dtype=float)
+
+    if method == "histogram":
+        bins = np.clip((conf * num_bins).astype(int), 0, num_bins - 1)
+        counts = np.bincount(bins, minlength=num_bins)
+        hits = np.bincount(bins, weights=correct, minlength=num_bins)
+        centers = (np.arange(num_bins) + 0.5) / num_bins
+        values = np.where(counts > 0, hits / np.maximum(counts, 1), centers)
+        return {"method": method, "num_bins": num_bins, "values": values.tolist()}
+
+    if method == "isotonic":
+        from sklearn.isotonic import IsotonicRegression
+
+        iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip")
+        iso.fit(conf, correct)
+        return {"method": method,
+                "x": iso.X_thresholds_.tolist(),
+                "y": iso.y_thresholds_.tolist()}
+
+    if method == "platt":
+        (a,), b = _logistic_fit(_logit(conf)[:, None], correct)
+        return {"method": method, "a": a, "b": b}
+
+    if method == "beta":
+        # Kull et al. (2017): logit(p') = a*ln(p) - b*ln(1-p) + c
+        p = _clip(conf)
+        (a, b), c = _logistic_fit(np.column_stack([np.log(p), -np.log(1 - p)]), correct)
+        return {"method": method, "a": a, "b": b, "c": c}
+
+    if method == "temperature":
+        z = _logit(conf)
+        temps = np.logspace(-1.5, 1.5, 301)
+        probs = _clip(_sigmoid(z[None, :] / temps[:, None]))
+        nll = -(correct * np.log(probs) + (1 - correct) * np.log(1 - probs)).mean(axis=1)
+        return {"method": method, "temperature": float(temps[np.argmin(nll)])}
+
+    raise ValueError(f"Unknown calibration method: {method}")
+
+
+# ------------------------------------------------
+# Applying
+# ------------------------------------------------
+def apply_calibrator(cal, conf):
+    """Vectorized: calibrated confidences for a whole column."""
+    conf = np.asarray(conf, dtype=float)
+    method = cal["method"]
+
+    if method == "histogram":
+        n = cal["num_bins"]
+        bins = np.clip((conf * n).astype(int), 0, n - 1)
+        return np.asarray(cal["values"])[bins]
+    if method == "isotonic":
+        return np.interp(conf, cal["x"], cal["y"])
+    if method == "platt":
+        return _sigmoid(cal["a"] * _logit(conf) + cal["b"])
+    if method == "beta":
+        p = _clip(conf)
+        return _sigmoid(cal["a"] * np.log(p) - cal["b"] * np.log(1 - p) + cal["c"])
+    if method == "temperature":
+        return _sigmoid(_logit(conf) / cal["temperature"])
+
+    raise ValueError(f"Unknown calibration method: {method}")
+
+
+def calibrate_one(cal, c):
+    """Scalar version for streaming inference output, no numpy per item."""
+    if c is None or (isinstance(c, float) and math.isnan(c)):
+        c = 0.5
+    method = cal["method"]
+    p = min(max(float(c), EPS), 1 - EPS)
+
+    if method == "histogram":
+        n = cal["num_bins"]
+        return cal["values"][min(max(int(c * n), 0), n - 1)]
+    if method == "isotonic":
+        x, y = cal["x"], cal["y"]
+        if c <= x[0]:
+            return y[0]
+        if c >= x[-1]:
+            return y[-1]
+        i = bisect.bisect_right(x, c)
+        return y[i - 1] + (y[i] - y[i - 1]) * (c - x[i - 1]) / (x[i] - x[i - 1])
+
+    logit = math.log(p / (1 - p))
+    if method == "platt":
+        z = cal["a"] * logit + cal["b"]
+    elif method == "beta":
+        z = cal["a"] * math.log(p) - cal["b"] * math.log(1 - p) + cal["c"]
+    elif method == "temperature":
+        z = logit / cal["temperature"]
+    else:
+        raise ValueError(f"Unknown calibration method: {method}")
+    return 1.0 / (1.0 + math.exp(-z))
+
+
+# ------------------------------------------------
+# Cross-fitting
+# ------------------------------------------------
+def cross_fit(conf, correct, method="isotonic", num_folds=NUM_FOLDS, seed=0):
+    """Out-of-fold calibrated confidences (each item mapped by a calibrator
+    that never saw it). Runs with fewer items than num_folds use one fold
+    per item; at least two items are needed."""
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    conf = np.asarray(conf, dtype=float)
+    correct = np.asarray(correct, dtype=int)
+    out = np.empty_like(conf)
+    num_folds = min(num_folds, len(conf))
+    if num_folds < 2:
+        raise ValueError(f"cross_fit needs at least 2 items, got {len(conf)}")
+
+    if np.bincount(correct, minlength=2).min() >= num_folds:
+        folds = StratifiedKFold(num_folds, shuffle=True, random_state=seed).split(conf, correct)
+    else:
+        folds = KFold(num_folds, shuffle=True, random_state=seed).split(conf)
+
+    for train, test in folds:
+        cal = fit_calibrator(conf[train], correct[train], method)
+        out[test] = apply_calibrator(cal, conf[test])
+    return out
+
+
+def save_calibrator(cal, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(cal, f)
+
+
+def load_calibrator(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ------------------------------------------------
+# Fit all methods on the latest evaluated runs
+# ------------------------------------------------
+def main():
+    runs = [r for r in find_runs(latest=True, **RUN_FILTERS) if r["eval_path"]]
+    if not runs:
+        print(f"No evaluated runs match {RUN_FILTERS}; run evaluate_com.py first")
+        return
+
+    rows = []
+    for run in runs:
+        df = pd.read_csv(run["eval_path"], usecols=["confidence", "correct"])
+        conf = df["confidence"].fillna(0.5).values
+        correct = df["correct"].values.astype(int)
+        if len(df) < 2:
+            print(f"Skipping {run['run_id']}: {len(df)} evaluated item(s), too few to cross-fit")
+            continue
+
+        rows.append({"run_id": run["run_id"], "method": run["method"],
+                     "calibrator": "none", "brier": brier_score(correct, conf),
+                     "ece": compute_ece(conf, correct)})
+
+        for method in METHODS:
+            oof = cross_fit(conf, correct, method)
+            rows.append({"run_id": run["run_id"], "method": run["method"],
+                         "calibrator": method, "brier": brier_score(correct, oof),
+                         "ece": compute_ece(oof, correct)})
+
+            path = os.path.join(OUT_DIR, f"{run['run_id']}-{method}.json")
+            save_calibrator(fit_calibrator(conf, correct, method), path)
+
+    print(f"=== Recalibration ({NUM_FOLDS}-fold cross-fitted) ===")
+    print(format_table(pd.DataFrame(rows)))
+    print(f"Saved fitted calibrators -> {OUT_DIR}/")
+
+
+if __name__ == "__main__":
+    main()
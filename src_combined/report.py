@@ -0,0 +1,193 @@
+# src_combined/report.py
+
+"""
+Build one self-contained HTML calibration report plus a JSON sidecar.
+
+Everything comes from the aggregates evaluate_com.py stores in the run
+registry (per-run and per-slice metrics, bootstrap CIs, reliability bins);
+result CSVs are never opened, so the cost grows with the number of runs,
+not with the number of rows behind them.
+"""
+
+import html
+import json
+import os
+
+from run_registry import find_runs, load_metrics, load_table
+
+RUN_FILTERS = {"dataset": "combined_qa_dataset_800"}
+LATEST_ONLY = True   # newest run per (method, model, dataset)
+SLICES = ["source", "type"]
+
+OUT_DIR = "outputs/report"
+OUT_HTML = os.path.join(OUT_DIR, "report.html")
+OUT_JSON = os.path.join(OUT_DIR, "report.json")
+
+RUN_FIELDS = ["run_id", "method", "model", "dataset", "num_items", "num_samples",
+              "finished_at", "prompt_tokens", "completion_tokens"]
+METRICS = ["accuracy", "brier", "ece", "token_f1", "bertscore", "mean_conf"]
+
+CSS = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin: 1em 0; font-size: 13px; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: right; }
+th { background: #f3f3f3; }
+td.txt { text-align: left; }
+.diagrams { display: flex; flex-wrap: wrap; gap: 1em; }
+.diagram { font-size: 12px; }
+"""
+
+
+# ------------------------------------------------
+# Collect aggregates
+# ------------------------------------------------
+def collect(runs):
+    run_ids = [r["run_id"] for r in runs]
+    metrics = {m["run_id"]: m for m in load_metrics(run_ids, group_by="run")}
+
+    intervals, bins = {}, {}
+    for row in load_table("intervals", run_ids):
+        intervals.setdefault(row["run_id"], {})[row["metric"]] = [row["lo"], row["hi"]]
+    for row in load_table("bins", run_ids):
+        bins.setdefault(row["run_id"], []).append(
+            {k: row[k] for k in ("bin", "n", "conf", "acc")})
+
+    report = {"runs": [], "slices": {}}
+    for run in runs:
+        rid = run["run_id"]
+        if rid not in metrics:
+            continue  # registered but not evaluated yet
+        report["runs"].append({
+            **{k: run[k] for k in RUN_FIELDS},
+            "metrics": {k: metrics[rid].get(k) for k in ["n"] + METRICS},
+            "ci95": intervals.get(rid, {}),
+            "bins": sorted(bins.get(rid, []), key=lambda b: b["bin"]),
+        })
+
+    evaluated = [r["run_id"] for r in report["runs"]]
+    for col in SLICES:
+        report["slices"][col] = [
+            {"run_id": m["run_id"], "method": m["method"], "value": m["group_value"],
+             **{k: m[k] for k in ["n"] + METRICS}}
+            for m in load_metrics(evaluated, group_by=col)
+        ]
+    return report
+
+
+# ------------------------------------------------
+# HTML rendering
+# ------------------------------------------------
+def fmt(value, digits=3):
+    if value is None:
+        return "&ndash;"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return html.escape(str(value))
+
+
+def table(headers, rows, text_cols=()):
+    out = ["<table><tr>" + "".join(f"<th>{html.escape(h)}</th>" for h in headers) + "</tr>"]
+    for row in rows:
+        cells = []
+        for h, v in zip(headers, row):
+            cls = ' class="txt"' if h in text_cols else ""
+            cells.append(f"<td{cls}>{v}</td>")
+        out.append("<tr>" + "".join(cells) + "</tr>")
+    out.append("</table>")
+    return "\n".join(out)
+
+
+def with_ci(value, ci):
+    if not ci:
+        return fmt(value)
+    return f"{fmt(value)} <small>[{fmt(ci[0])}, {fmt(ci[1])}]</small>"
+
+
+def reliability_svg(bins, size=220, pad=28):
+    """Inline SVG reliability diagram, marker area proportional to bin count."""
+    inner = size - 2 * pad
+
+    def xy(conf, acc):
+        return pad + conf * inner, size - pad - acc * inner
+
+    parts = [f'<svg width="{size}" height="{size}" xmlns="http://www.w3.org/2000/svg">',
+             f'<rect x="{pad}" y="{pad}" width="{inner}" height="{inner}" fill="none" stroke="#999"/>',
+             f'<line x1="{pad}" y1="{size - pad}" x2="{size - pad}" y2="{pad}" '
+             'stroke="#bbb" stroke-dasharray="4"/>']
+
+    total = sum(b["n"] for b in bins) or 1
+    points = [xy(b["conf"], b["acc"]) for b in bins]
+    if len(points) > 1:
+        path = " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+        parts.append(f'<polyline points="{path}" fill="none" stroke="#4E79A7" stroke-width="2"/>')
+    for (x, y), b in zip(points, bins):
+        r = 2 + 8 * (b["n"] / total) ** 0.5
+        parts.append(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="{r:.1f}" fill="#4E79A7" '
+                     f'fill-opacity="0.7"><title>n={b["n"]}</title></circle>')
+
+    parts.append(f'<text x="{size / 2}" y="{size - 6}" text-anchor="middle">confidence</text>')
+    parts.append(f'<text x="10" y="{size / 2}" transform="rotate(-90 10 {size / 2})" '
+                 'text-anchor="middle">accuracy</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def render_html(report):
+    body = ["<h1>Calibration report</h1>",
+            f"<p>{len(report['runs'])} run(s)</p>", "<h2>Runs</h2>"]
+
+    headers = ["run", "method", "model", "n", "accuracy", "brier", "ece",
+               "token F1", "BERTScore", "tokens"]
+    rows = []
+    for r in report["runs"]:
+        m, ci = r["metrics"], r["ci95"]
+        rows.append([
+            fmt(r["run_id"]), fmt(r["method"]), fmt(r["model"]), fmt(m["n"], 0),
+            with_ci(m["accuracy"], ci.get("accuracy")),
+            with_ci(m["brier"], ci.get("brier")),
+            with_ci(m["ece"], ci.get("ece")),
+            fmt(m["token_f1"]), fmt(m["bertscore"]),
+            fmt((r["prompt_tokens"] or 0) + (r["completion_tokens"] or 0)),
+        ])
+    body.append(table(headers, rows, text_cols=("run", "method", "model")))
+    body.append("<p><small>Brackets: 95% bootstrap intervals.</small></p>")
+
+    body.append("<h2>Reliability diagrams</h2><div class=\"diagrams\">")
+    for r in report["runs"]:
+        body.append(f'<div class="diagram">{reliability_svg(r["bins"])}'
+                    f'<br>{fmt(r["method"])} &middot; {fmt(r["model"])}</div>')
+    body.append("</div>")
+
+    for col, slice_rows in report["slices"].items():
+        if not slice_rows:
+            continue
+        body.append(f"<h2>Per {html.escape(col)}</h2>")
+        headers = ["method", col, "n", "accuracy", "brier", "ece"]
+        rows = [[fmt(s["method"]), fmt(s["value"]), fmt(s["n"], 0),
+                 fmt(s["accuracy"]), fmt(s["brier"]), fmt(s["ece"])]
+                for s in slice_rows]
+        body.append(table(headers, rows, text_cols=("method", col)))
+
+    return ("<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>Calibration report</title><style>{CSS}</style></head>"
+            f"<body>{''.join(body)}</body></html>")
+
+
+def main():
+    runs = find_runs(latest=LATEST_ONLY, **RUN_FILTERS)
+    report = collect(runs)
+    if not report["runs"]:
+        print(f"No evaluated runs match {RUN_FILTERS}; run evaluate_com.py first")
+        return
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    with open(OUT_JSON, "w") as f:
+        json.dump(report, f, indent=2)
+    with open(OUT_HTML, "w", encoding="utf-8") as f:
+        f.write(render_html(report))
+
+    print(f"Report for {len(report['runs'])} run(s) -> {OUT_HTML} (+ {OUT_JSON})")
+
+
+if __name__ == "__main__":
+    main()
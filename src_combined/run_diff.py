@@ -0,0 +1,205 @@
+# src_combined/run_diff.py
+
+"""
+Per-item diff between runs, joined on the item id.
+
+Every run is reduced once to a small index file, sorted by id,
+
+    outputs/index/<run_id>-<sha>.parquet      id, source, type, confidence, correct
+
+built by streaming the result CSV in chunks (see chunked_eval.py) and
+scoring it with exact match like evaluate_com.py. The index name carries
+the first characters of the result file's sha256 as registered, and a run
+whose file no longer matches its registry row is refused, so an index
+always describes the data the run produced. Comparing many large runs
+reads a few small columnar files instead of re-parsing and re-scoring the
+CSVs, and the join is a merge of two sorted indexes.
+
+Item ids are hashes of source and question (dedup.item_id), so they match
+across runs even when the dataset was rebuilt or reordered in between.
+
+For every run against the first one:
+
+    flip matrix       correct / wrong in A  x  correct / wrong in B
+    confidence delta  B - A, overall and for fixed / broken / unchanged items
+    per source        n, accuracy of A and B, fixed, broken, mean delta
+
+    python -m src_combined diff <run_a> <run_b> [<run_c> ...] [--by source]
+
+Runs written before result rows carried an id fall back to the question
+text as the key.
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+INDEX_DIR = "outputs/index"
+INDEX_COLUMNS = ["id", "source", "type", "confidence", "correct"]
+KEY_COLUMN = "id"
+FALLBACK_KEY = "question"
+
+FLIPS = {(1, 1): "both_correct", (0, 0): "both_wrong", (0, 1): "fixed", (1, 0): "broken"}
+
+
+# ------------------------------------------------
+# Index
+# ------------------------------------------------
+def index_path(run, index_dir=None):
+    sha = run.get("file_sha256")
+    name = f"{run['run_id']}-{sha[:12]}" if sha else run["run_id"]
+    return os.path.join(index_dir or INDEX_DIR, f"{name}.parquet")
+
+
+def index_is_current(path, run):
+    if not os.path.exists(path):
+        return False
+    if run.get("file_sha256"):   # the name already pins the result file's content
+        return True
+    return os.path.getmtime(path) >= os.path.getmtime(run["path"])
+
+
+def score_index_chunk(chunk, key):
+    from answer_matching import exact_match
+
+    pairs = chunk[["pred", "gold"]].astype(str).drop_duplicates(ignore_index=True)
+    pairs["correct"] = [exact_match(p, g) for p, g in zip(pairs["pred"], pairs["gold"])]
+    scored = chunk[["pred", "gold"]].astype(str).merge(pairs, on=["pred", "gold"], how="left")
+
+    return pd.DataFrame({
+        "id": chunk[key].astype(str).to_numpy(),
+        "source": chunk.get("source", pd.Series(index=chunk.index, dtype=object))
+                       .fillna("unknown").astype(str).to_numpy(),
+        "type": chunk.get("type", pd.Series(index=chunk.index, dtype=object))
+                     .fillna("unknown").astype(str).to_numpy(),
+        "confidence": pd.to_numeric(chunk["confidence"], errors="coerce")
+                        .fillna(0.5).to_numpy(),
+        "correct": scored["correct"].astype("int8").to_numpy(),
+    })
+
+
+def build_index(run, index_dir=None, chunk_size=None):
+    """Index of one run (a run registry dict), rebuilt when out of date."""
+    from chunked_eval import CHUNK_SIZE, iter_chunks
+    from run_registry import file_is_current
+
+    if not file_is_current(run):
+        raise ValueError(f"{run['run_id']}: {run['path']} is missing or changed since "
+                         f"the run was registered")
+    path = index_path(run, index_dir)
+    if index_is_current(path, run):
+        return path
+
+    header = pd.read_csv(run["path"], nrows=0).columns
+    key = KEY_COLUMN if KEY_COLUMN in header else FALLBACK_KEY
+    if key != KEY_COLUMN:
+        print(f"{run['run_id']}: no {KEY_COLUMN!r} column, matching on {FALLBACK_KEY!r}")
+
+    columns = [key, "source", "type", "pred", "gold", "confidence"]
+    parts = [score_index_chunk(chunk, key)
+             for chunk in iter_chunks(run["path"], chunk_size or CHUNK_SIZE, columns)]
+    index = pd.concat(parts, ignore_index=True) if parts else \
+        pd.DataFrame(columns=INDEX_COLUMNS)
+    # an item answered twice (e.g. a resumed run) counts with its last answer
+    index = index.drop_duplicates("id", keep="last").sort_values("id", kind="stable")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    index.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def load_index(run, index_dir=None):
+    return pd.read_parquet(build_index(run, index_dir)).set_index("id")
+
+
+# ------------------------------------------------
+# Diff
+# ------------------------------------------------
+def diff_items(a, b):
+    """Items present in both indexes: correct / confidence of A and B, delta, flip."""
+    joined = a.join(b[["confidence", "correct"]], how="inner", lsuffix="_a", rsuffix="_b")
+    joined["delta"] = joined["confidence_b"] - joined["confidence_a"]
+    joined["flip"] = [FLIPS[key] for key in zip(joined["correct_a"], joined["correct_b"])]
+    return joined
+
+
+def flip_matrix(items):
+    matrix = pd.crosstab(items["correct_a"].map({1: "A correct", 0: "A wrong"}),
+                         items["correct_b"].map({1: "B correct", 0: "B wrong"}))
+    return matrix.reindex(index=["A correct", "A wrong"], columns=["B correct", "B wrong"],
+                          fill_value=0)
+
+
+def confidence_deltas(items):
+    """Mean / median confidence change, overall and per flip kind."""
+    groups = [("all", items)] + list(items.groupby("flip", sort=True))
+    return pd.DataFrame([{
+        "items": name,
+        "n": len(part),
+        "mean_delta": part["delta"].mean(),
+        "median_delta": part["delta"].median(),
+        "mean_abs_delta": part["delta"].abs().mean(),
+    } for name, part in groups])
+
+
+def slice_table(items, by="source"):
+    grouped = items.groupby(by, sort=True)
+    return pd.DataFrame({
+        "n": grouped.size(),
+        "acc_a": grouped["correct_a"].mean(),
+        "acc_b": grouped["correct_b"].mean(),
+        "fixed": grouped["flip"].agg(lambda f: int((f == "fixed").sum())),
+        "broken": grouped["flip"].agg(lambda f: int((f == "broken").sum())),
+        "mean_delta": grouped["delta"].mean(),
+    }).reset_index()
+
+
+def format_table(df):
+    return df.to_string(index=False, float_format=lambda x: f"{x:.3f}")
+
+
+def main(run_ids, by=("source",), output=None, index_dir=None):
+    from run_registry import get_run
+
+    if len(run_ids) < 2:
+        sys.exit("diff needs a base run and at least one run to compare")
+    runs = [get_run(run_id) for run_id in run_ids]
+    try:
+        base = load_index(runs[0], index_dir)
+        others = [load_index(run, index_dir) for run in runs[1:]]
+    except ValueError as e:
+        sys.exit(str(e))
+    frames = []
+
+    for run, other in zip(runs[1:], others):
+        items = diff_items(base, other)
+        only_a = len(base) - len(items)
+        only_b = len(other) - len(items)
+
+        print(f"=== {runs[0]['run_id']} (A) -> {run['run_id']} (B) ===")
+        print(f"{len(items)} shared items, {only_a} only in A, {only_b} only in B\n")
+        if not len(items):
+            continue
+        print(flip_matrix(items).to_string())
+        print(f"\naccuracy {items['correct_a'].mean():.3f} -> {items['correct_b'].mean():.3f}"
+              f"  (fixed {int((items['flip'] == 'fixed').sum())}, "
+              f"broken {int((items['flip'] == 'broken').sum())})\n")
+        print(format_table(confidence_deltas(items)))
+        for col in by:
+            print(f"\n--- per {col} ---")
+            print(format_table(slice_table(items, col)))
+        print()
+
+        frames.append(items.reset_index().assign(run_a=runs[0]["run_id"], run_b=run["run_id"]))
+
+    if output and frames:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+        pd.concat(frames, ignore_index=True).to_csv(output, index=False)
+        print(f"Saved per-item diff -> {output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,345 @@
+# src_combined/run_registry.py
+
+"""
+Small local SQLite index of inference runs.
+
+Every inference script registers its output file here together with the
+model, method, dataset, sample count, timestamps and token usage, so the
+evaluation, plotting and comparison steps can select runs by attribute
+instead of guessing from file modification times.
+
+Each run writes its own file, outputs/<method>/<run_id>.csv (the run id is
+created before inference starts, see new_run_id / run_output_path), and
+the file's size and sha256 are stored with the run: find_runs skips runs
+whose file has been changed or replaced since, so a row never points at
+another run's data.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+REGISTRY_DB = os.getenv("RUN_REGISTRY_DB", "outputs/runs.sqlite")
+OUTPUT_DIR = "outputs"
+
+RUN_COLUMNS = [
+    "run_id",
+    "path",
+    "model",
+    "method",
+    "dataset",
+    "num_items",
+    "num_samples",
+    "started_at",
+    "finished_at",
+    "prompt_tokens",
+    "completion_tokens",
+    "eval_path",
+    "file_size",
+    "file_sha256",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id            TEXT PRIMARY KEY,
+    path              TEXT NOT NULL,
+    model             TEXT,
+    method            TEXT,
+    dataset           TEXT,
+    num_items         INTEGER,
+    num_samples       INTEGER,
+    started_at        TEXT,
+    finished_at       TEXT,
+    prompt_tokens     INTEGER,
+    completion_tokens INTEGER,
+    eval_path         TEXT,
+    file_size         INTEGER,
+    file_sha256       TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_attrs ON runs (method, model, dataset);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id      TEXT NOT NULL,
+    group_by    TEXT NOT NULL,
+    group_value TEXT NOT NULL,
+    n           INTEGER,
+    accuracy    REAL,
+    mean_conf   REAL,
+    brier       REAL,
+    ece         REAL,
+    token_f1    REAL,
+    bertscore   REAL,
+    PRIMARY KEY (run_id, group_by, group_value)
+);
+
+CREATE TABLE IF NOT EXISTS intervals (
+    run_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    lo     REAL,
+    hi     REAL,
+    PRIMARY KEY (run_id, metric)
+);
+
+CREATE TABLE IF NOT EXISTS bins (
+    run_id TEXT NOT NULL,
+    bin    INTEGER NOT NULL,
+    n      INTEGER,
+    conf   REAL,
+    acc    REAL,
+    PRIMARY KEY (run_id, bin)
+);
+"""
+
+METRIC_COLUMNS = ["n", "accuracy", "mean_conf", "brier", "ece", "token_f1", "bertscore"]
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def connect(db_path=None):
+    db_path = db_path or REGISTRY_DB
+    if os.path.dirname(db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    # registries created before the file checksums were recorded
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+    for column, kind in (("file_size", "INTEGER"), ("file_sha256", "TEXT")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE runs ADD COLUMN {column} {kind}")
+    return conn
+
+
+def dataset_name(input_file):
+    """'data/combined_qa_dataset_800.jsonl' -> 'combined_qa_dataset_800'"""
+    return os.path.splitext(os.path.basename(input_file))[0]
+
+
+def new_run_id(method):
+    return f"{method}-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def run_output_path(method, run_id, output_dir=OUTPUT_DIR):
+    """'outputs/<method>/<run_id>.csv'; the samples / live files sit next to it."""
+    return os.path.join(output_dir, method, f"{run_id}.csv")
+
+
+_digests = {}
+
+
+def file_sha256(path):
+    """sha256 of a file, cached per (path, size, mtime) within the process."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def file_is_current(run):
+    """The run's output file exists and is the one that was registered."""
+    path = run["path"]
+    if not os.path.exists(path):
+        return False
+    if run.get("file_sha256") is None:   # registered before checksums were kept
+        return True
+    return (os.path.getsize(path) == run["file_size"]
+            and file_sha256(path) == run["file_sha256"])
+
+
+def register_run(path, model, method, dataset, num_items, num_samples=1,
+                 started_at=None, finished_at=None, prompt_tokens=0,
+                 completion_tokens=0, db_path=None, run_id=None):
+    """Record a finished inference output and return its run id (run_id
+    when given, i.e. the one its output path was made from)."""
+    run_id = run_id or new_run_id(method)
+
+    with connect(db_path) as conn:
+        conn.execute(
+            "INSERT INTO runs (run_id, path, model, method, dataset, num_items,"
+            " num_samples, started_at, finished_at, prompt_tokens,"
+            " completion_tokens, file_size, file_sha256)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, os.path.abspath(path), model, method, dataset,
+             int(num_items), int(num_samples), started_at,
+             finished_at or now(), int(prompt_tokens), int(completion_tokens),
+             os.path.getsize(path), file_sha256(path)),
+        )
+
+    print(f"Registered run {run_id} ({method}, {model})")
+    return run_id
+
+
+def find_runs(db_path=None, latest=False, **filters):
+    """
+    Query runs by attribute, e.g. find_runs(method="cot", dataset="...").
+
+    Filter values may be a single value or a list/tuple of accepted values.
+    Runs whose output file no longer exists or has changed since it was
+    registered are skipped. Results are ordered
+    newest first; with latest=True only the newest run per
+    (method, model, dataset) is kept.
+    """
+    clauses, params = [], []
+    for key, value in filters.items():
+        if key not in RUN_COLUMNS:
+            raise ValueError(f"Unknown run attribute: {key}")
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{key} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{key} = ?")
+            params.append(value)
+
+    query = "SELECT * FROM runs"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY finished_at DESC, rowid DESC"
+
+    with connect(db_path) as conn:
+        runs = [dict(r) for r in conn.execute(query, params)]
+
+    current = [r for r in runs if file_is_current(r)]
+    changed = sum(os.path.exists(r["path"]) for r in runs) - len(current)
+    if changed:
+        print(f"Skipping {changed} run(s) whose output file changed since registration")
+    runs = current
+
+    if latest:
+        seen, newest = set(), []
+        for r in runs:
+            key = (r["method"], r["model"], r["dataset"])
+            if key not in seen:
+                seen.add(key)
+                newest.append(r)
+        runs = newest
+
+    return runs
+
+
+def get_run(run_id, db_path=None):
+    with connect(db_path) as conn:
+        row = conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+    if row is None:
+        raise KeyError(f"Unknown run: {run_id}")
+    return dict(row)
+
+
+def set_eval_path(run_id, eval_path, db_path=None):
+    with connect(db_path) as conn:
+        conn.execute("UPDATE runs SET eval_path = ? WHERE run_id = ?",
+                     (os.path.abspath(eval_path), run_id))
+
+
+def save_metrics(table, group_by, db_path=None):
+    """
+    Store a grouped metric table (one row per run_id[, group value]).
+
+    group_by is "run" for whole-run metrics or the name of the slicing
+    column ("source", "type", ...), which must then be a column of table.
+    """
+    records = []
+    for row in table.to_dict("records"):
+        value = "" if group_by == "run" else str(row[group_by])
+        records.append(
+            (row["run_id"], group_by, value)
+            + tuple(None if row.get(c) is None else float(row[c]) for c in METRIC_COLUMNS)
+        )
+
+    with connect(db_path) as conn:
+        conn.executemany(
+            f"INSERT OR REPLACE INTO metrics (run_id, group_by, group_value, "
+            f"{', '.join(METRIC_COLUMNS)}) VALUES ({', '.join('?' * (3 + len(METRIC_COLUMNS)))})",
+            records,
+        )
+
+
+def load_metrics(run_ids=None, group_by="run", db_path=None):
+    """Stored metrics joined with run attributes, as a list of dicts."""
+    query = ("SELECT r.method, r.model, r.dataset, m.* FROM metrics m"
+             " JOIN runs r USING (run_id) WHERE m.group_by = ?")
+    params = [group_by]
+    if run_ids is not None:
+        run_ids = list(run_ids)
+        query += f" AND m.run_id IN ({', '.join('?' * len(run_ids))})"
+        params.extend(run_ids)
+    query += " ORDER BY r.finished_at, m.group_value"
+
+    with connect(db_path) as conn:
+        return [dict(r) for r in conn.execute(query, params)]
+
+
+def save_intervals(run_id, intervals, db_path=None):
+    """intervals: {metric: (lo, hi)}"""
+    with connect(db_path) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO intervals (run_id, metric, lo, hi) VALUES (?, ?, ?, ?)",
+            [(run_id, m, float(lo), float(hi)) for m, (lo, hi) in intervals.items()],
+        )
+
+
+def save_bins(table, db_path=None):
+    """table: calibration.bin_table(df, ["run_id"]) output."""
+    run_ids = table["run_id"].unique().tolist()
+    with connect(db_path) as conn:
+        # bins that are empty after re-evaluation must not survive
+        conn.executemany("DELETE FROM bins WHERE run_id = ?", [(r,) for r in run_ids])
+        conn.executemany(
+            "INSERT OR REPLACE INTO bins (run_id, bin, n, conf, acc) VALUES (?, ?, ?, ?, ?)",
+            [(r["run_id"], int(r["bin"]), int(r["n"]), float(r["conf"]), float(r["acc"]))
+             for r in table.to_dict("records")],
+        )
+
+
+def load_table(table, run_ids, db_path=None):
+    """All rows of intervals / bins for the given runs, as a list of dicts."""
+    if table not in ("intervals", "bins"):
+        raise ValueError(f"Unknown aggregate table: {table}")
+    run_ids = list(run_ids)
+    with connect(db_path) as conn:
+        rows = conn.execute(
+            f"SELECT * FROM {table} WHERE run_id IN ({', '.join('?' * len(run_ids))})",
+            run_ids,
+        )
+        return [dict(r) for r in rows]
+
+
+class UsageCounter:
+    """Accumulates calls and token usage from chat-completion responses
+    (thread-safe, inference may run concurrently)."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0      # prompt tokens served from the provider's prefix cache
+        self._lock = threading.Lock()
+
+    def add(self, response):
+        usage = getattr(response, "usage", None)
+        with self._lock:
+            self.calls += 1
+            if usage is None:
+                return
+            self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            self.cached_tokens += getattr(details, "cached_tokens", 0) or 0
+
+
+if __name__ == "__main__":
+    for run in find_runs():
+        print(f"{run['run_id']:40s} {run['method']:18s} {run['model']:26s} "
+              f"{run['dataset']:26s} n={run['num_items']:<5d} "
+              f"tokens={run['prompt_tokens'] + run['completion_tokens']}")
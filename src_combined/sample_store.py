@@ -0,0 +1,174 @@
+# src_combined/sample_store.py
+
+"""
+On-disk schema for multi-sample (self-consistency) runs.
+
+Instead of a stringified Python list per CSV cell, every sample is one row
+of a Parquet file next to the result CSV:
+
+    <output>.samples.parquet   question_idx, sample, pred, confidence, raw_response
+
+and the result CSV keeps one aggregate row per question (pred, confidence,
+num_samples, vote_share), so evaluation never touches the raw text.
+question_idx is the position of the question in the result CSV.
+
+Samples are appended in row groups while the run is going, so raw
+responses are not held in memory until the end, and the readers stream
+one row group at a time, e.g. to re-vote with another aggregation rule:
+
+    for idx, preds, confidences in iter_questions(path):
+        ...
+    revote(path, rule=majority_vote)
+"""
+
+import os
+import sys
+import threading
+from collections import Counter
+
+import numpy as np
+
+SAMPLE_COLUMNS = ["question_idx", "sample", "pred", "confidence", "raw_response"]
+ROW_GROUP_SIZE = 8192
+COMPRESSION = "zstd"
+
+
+def samples_path(output_csv):
+    """'outputs/self_consistency/<run_id>.csv' -> '.../<run_id>.samples.parquet'"""
+    return os.path.splitext(output_csv)[0] + ".samples.parquet"
+
+
+def sample_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("question_idx", pa.int32()),
+        ("sample", pa.int16()),
+        ("pred", pa.string()),
+        ("confidence", pa.float32()),
+        ("raw_response", pa.string()),
+    ])
+
+
+# ------------------------------------------------
+# Aggregation
+# ------------------------------------------------
+def majority_vote(preds, confidences):
+    """Most common answer (first seen wins ties), mean confidence, vote share."""
+    pred, votes = Counter(preds).most_common(1)[0]
+    return pred, float(np.mean(confidences)), votes / len(preds)
+
+
+# ------------------------------------------------
+# Writing
+# ------------------------------------------------
+class SampleWriter:
+    """
+    Thread-safe, appends one question's samples at a time (they stay
+    contiguous in the file). Written to <path>.tmp and moved into place on
+    close, so an interrupted run never leaves a truncated file behind.
+    """
+
+    def __init__(self, path, row_group_size=ROW_GROUP_SIZE):
+        import pyarrow.parquet as pq
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.row_group_size = row_group_size
+        self.schema = sample_schema()
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema, compression=COMPRESSION)
+        self.buffer = {c: [] for c in SAMPLE_COLUMNS}
+        self.num_rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, question_idx, preds, confidences, raw_responses):
+        with self._lock:
+            n = len(preds)
+            self.buffer["question_idx"].extend([question_idx] * n)
+            self.buffer["sample"].extend(range(n))
+            self.buffer["pred"].extend(preds)
+            self.buffer["confidence"].extend(confidences)
+            self.buffer["raw_response"].extend(raw_responses)
+            self.num_rows += n
+            if len(self.buffer["sample"]) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+
+        if self.buffer["sample"]:
+            self.writer.write_table(pa.Table.from_pydict(self.buffer, schema=self.schema))
+            self.buffer = {c: [] for c in SAMPLE_COLUMNS}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.writer.close()
+
+
+# ------------------------------------------------
+# Streaming readers
+# ------------------------------------------------
+def iter_sample_batches(path, columns=None, batch_size=ROW_GROUP_SIZE):
+    """pyarrow RecordBatches of the samples file, only the requested columns."""
+    import pyarrow.parquet as pq
+
+    yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+
+
+def iter_questions(path, batch_size=ROW_GROUP_SIZE):
+    """
+    (question_idx, preds, confidences) per question, in file order; the raw
+    responses are never read. Memory is bounded by one batch.
+    """
+    pending = None  # (idx, preds, confidences) possibly continued in the next batch
+
+    for batch in iter_sample_batches(path, ["question_idx", "pred", "confidence"], batch_size):
+        idx = batch.column(0).to_numpy()
+        preds = batch.column(1).to_pylist()
+        confs = batch.column(2).to_numpy(zero_copy_only=False)
+        starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+        ends = np.r_[starts[1:], len(idx)]
+
+        for start, end in zip(starts, ends):
+            group = (int(idx[start]), preds[start:end], confs[start:end].tolist())
+            if pending is not None:
+                if pending[0] == group[0]:
+                    group = (group[0], pending[1] + group[1], pending[2] + group[2])
+                else:
+                    yield pending
+            pending = group  # the last group may continue in the next batch
+
+    if pending is not None:
+        yield pending
+
+
+def revote(path, rule=majority_vote):
+    """Re-aggregate a samples file with another rule, one row per question."""
+    import pandas as pd
+
+    rows = []
+    for idx, preds, confs in iter_questions(path):
+        pred, conf, share = rule(preds, confs)
+        rows.append({"question_idx": idx, "pred": pred, "confidence": conf,
+                     "num_samples": len(preds), "vote_share": share})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # python sample_store.py outputs/self_consistency/<run_id>.samples.parquet
+    table = revote(sys.argv[1])
+    print(table.head(20).to_string(index=False))
+    print(f"{len(table)} questions, {table['num_samples'].sum()} samples")
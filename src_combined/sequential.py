@@ -0,0 +1,185 @@
+# src_combined/sequential.py
+
+"""
+Sequential evaluation: ask questions until the metrics are known well
+enough, instead of a fixed .head(n).
+
+Items are put in a stratified random order (by source / type), so every
+prefix of the run covers the strata in proportion to the dataset. The
+questions are then answered in waves of CHECK_EVERY items. After each wave
+the confidence intervals are updated: accuracy as a Wilson interval,
+Brier and ECE by bootstrap over the items seen so far (see
+calibration.bootstrap_ci; a few hundred items take milliseconds). The run
+stops as soon as every tracked interval is narrower than its target width
+(after at least MIN_ITEMS items), or when the item or API-call budget is
+used up:
+
+    df = stratified_order(df)
+    rows, reason = run_sequential(fn, items, SequentialMonitor(), CONCURRENCY, usage)
+"""
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from calibration import bootstrap_ci
+from llm_client import run_concurrently
+
+STRATA = ["source", "type"]
+SEED = 0
+
+# metric -> largest acceptable width of its (1 - ALPHA) interval
+TARGET_WIDTHS = {"accuracy": 0.10, "ece": 0.10}
+ALPHA = 0.05
+MIN_ITEMS = 40
+MAX_ITEMS = None       # item budget, None = whole dataset
+MAX_CALLS = None       # API-call budget, None = unlimited
+CHECK_EVERY = 20       # items per wave
+NUM_BOOT = 500
+
+
+def stratified_order(df, strata=STRATA, seed=SEED):
+    """
+    Rows in a random order in which every stratum is spread evenly: the
+    k-th of m items of a stratum gets the sort key (k + u) / m, u uniform,
+    so any prefix holds each stratum in about its dataset proportion.
+    """
+    strata = [c for c in strata if c in df.columns]
+    shuffled = df.sample(frac=1, random_state=seed)
+    if not strata:
+        return shuffled.reset_index(drop=True)
+
+    groups = shuffled.groupby(strata, sort=False, dropna=False)
+    rank = groups.cumcount().to_numpy()
+    size = groups[strata[0]].transform("size").to_numpy()
+    jitter = np.random.default_rng(seed).random(len(shuffled))
+    order = np.argsort((rank + jitter) / size, kind="stable")
+    return shuffled.iloc[order].reset_index(drop=True)
+
+
+def wilson_interval(successes, n, alpha=ALPHA):
+    if n == 0:
+        return (0.0, 1.0)
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return (max(0.0, center - half), min(1.0, center + half))
+
+
+def score_row(row):
+    """(confidence, correct) of a result row: exact match, missing confidence 0.5."""
+    from answer_matching import exact_match
+
+    conf = row.get("confidence")
+    if conf is None or (isinstance(conf, float) and math.isnan(conf)):
+        conf = 0.5
+    return float(conf), exact_match(str(row.get("pred")), str(row.get("gold")))
+
+
+class SequentialMonitor:
+    """Running confidence intervals and the stopping rule."""
+
+    def __init__(self, targets=None, min_items=MIN_ITEMS, max_items=MAX_ITEMS,
+                 max_calls=MAX_CALLS, alpha=ALPHA, num_boot=NUM_BOOT):
+        self.targets = dict(TARGET_WIDTHS if targets is None else targets)
+        self.min_items = min_items
+        self.max_items = max_items
+        self.max_calls = max_calls
+        self.alpha = alpha
+        self.num_boot = num_boot
+        self.confidences = []
+        self.correct = []
+        self.intervals = {}
+
+    @property
+    def n(self):
+        return len(self.correct)
+
+    def add(self, confidence, correct):
+        self.confidences.append(confidence)
+        self.correct.append(correct)
+
+    def update(self):
+        self.intervals = {"accuracy": wilson_interval(sum(self.correct), self.n, self.alpha)}
+        if set(self.targets) - {"accuracy"}:
+            boot = bootstrap_ci(self.confidences, self.correct,
+                                num_boot=self.num_boot, alpha=self.alpha)
+            self.intervals.update({k: v for k, v in boot.items() if k != "accuracy"})
+        return self.intervals
+
+    def widths(self):
+        return {name: hi - lo for name, (lo, hi) in self.intervals.items()}
+
+    def stop_reason(self, calls=None):
+        if self.max_items is not None and self.n >= self.max_items:
+            return f"item budget of {self.max_items} reached"
+        if self.max_calls is not None and calls is not None and calls >= self.max_calls:
+            return f"call budget of {self.max_calls} reached"
+        widths = self.widths()
+        if self.n >= self.min_items and all(
+                widths.get(name, math.inf) <= target for name, target in self.targets.items()):
+            return "all intervals narrower than " + ", ".join(
+                f"{name} {target:g}" for name, target in self.targets.items())
+        return None
+
+    def postfix(self):
+        """Compact interval widths for the progress bar."""
+        return " ".join(f"{name}±{width / 2:.3f}" for name, width in self.widths().items())
+
+    def summary(self):
+        lines = [f"{'metric':9s} {'low':>6s} {'high':>6s} {'width':>6s} {'target':>6s}"]
+        for name, (lo, hi) in self.intervals.items():
+            target = self.targets.get(name)
+            lines.append(f"{name:9s} {lo:6.3f} {hi:6.3f} {hi - lo:6.3f} "
+                         f"{'' if target is None else format(target, '6.3f')}")
+        return "\n".join(lines)
+
+
+def run_sequential(fn, items, monitor, concurrency=1, usage=None, score=score_row, live=None):
+    """
+    fn(item) for items in order, CHECK_EVERY (or concurrency, if larger)
+    at a time, until monitor says stop. Returns (rows, stop reason).
+    """
+    from tqdm import tqdm
+
+    items = list(items)
+    wave = max(CHECK_EVERY, concurrency)
+    rows = []
+    reason = "all items used"
+
+    with tqdm(total=len(items)) as bar:
+        for start in range(0, len(items), wave):
+            batch = items[start:start + wave]
+            if monitor.max_items is not None:
+                batch = batch[:monitor.max_items - len(rows)]
+            results = run_concurrently(fn, batch, concurrency, progress=False, live=live)
+            rows.extend(results)
+            for result in results:
+                monitor.add(*score(result))
+            monitor.update()
+            bar.update(len(results))
+            bar.set_postfix_str(" ".join(
+                [monitor.postfix()] + ([live.postfix()] if live is not None else [])))
+
+            stop = monitor.stop_reason(usage.calls if usage is not None else None)
+            if stop:
+                reason = stop
+                break
+
+    return rows, reason
+
+
+def run_items(fn, items, concurrency=1, usage=None, sequential=False, live=None):
+    """The inference loop of the scripts: run_concurrently over all items,
+    or run_sequential with the default stopping rule."""
+    if not sequential:
+        return run_concurrently(fn, items, concurrency, live=live)
+
+    monitor = SequentialMonitor()
+    rows, reason = run_sequential(fn, items, monitor, concurrency, usage, live=live)
+    print(f"Stopped after {len(rows)} of {len(items)} items: {reason}")
+    print(monitor.summary())
+    return rows
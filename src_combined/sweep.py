@@ -0,0 +1,293 @@
+# src_combined/sweep.py
+
+"""
+Budget-aware sweep of the self-consistency settings (model, temperature,
+number of samples, prompt) by successive halving.
+
+A full grid on the whole dataset costs configs x items x samples calls.
+Instead every configuration is scored on a small stratified subset (the
+first RUNG_ITEMS items of sequential.stratified_order), only the best
+1/ETA of them are promoted to a subset ETA times larger, and so on, until
+one configuration is left, the dataset is used up or the next rung would
+exceed the call budget:
+
+    rung 0   12 configs x  40 items
+    rung 1    4 configs x 120 items
+    rung 2    2 configs x 360 items ...
+
+Configurations are ranked by the mean of their ECE rank and Brier rank on
+the rung's items (pred / confidence by majority vote, exact match like the
+sequential mode).
+
+Samples are cached in SQLite, keyed by (model, temperature, prompt, item,
+sample number), where the item is a hash of the question text (the only
+thing the prompt is rendered from), so the cache stays valid when the
+dataset is rebuilt or reordered. Configurations that differ only in the number of samples
+share them (k samples are the first k cached ones), a promoted
+configuration only pays for the items its larger subset adds, and a re-run
+of the sweep only pays for what is not cached yet.
+"""
+
+import hashlib
+import itertools
+import math
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from calibration import CalibrationAccumulator, format_table
+from dedup import drop_duplicates
+from llm_client import chat_samples, run_concurrently
+from parsing import parse_baseline_output, parse_cot_output
+from prompt_builder import load_prompt
+from run_registry import UsageCounter
+from sample_store import majority_vote
+from sequential import stratified_order
+from tracing import span
+
+PROMPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+INPUT_FILE = "data/combined_qa_dataset_800.jsonl"
+OUTPUT_CSV = "outputs/sweep_selfconsistency.csv"
+CACHE_DB = os.getenv("SWEEP_CACHE_DB", "outputs/sweep_samples.sqlite")
+
+# every combination is one configuration
+SWEEP = {
+    "model": ["llama-3.1-8b-instant"],
+    "temperature": [0.3, 0.7, 1.0],
+    "num_samples": [1, 3, 5, 7],
+    "prompt": ["cot_statement.txt"],
+}
+
+RUNG_ITEMS = 40       # items of the first rung
+ETA = 3               # items x ETA and configs / ETA per rung
+MAX_CALLS = 3000      # new API calls for the whole sweep, None = unlimited
+CONCURRENCY = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    model        TEXT NOT NULL,
+    temperature  REAL NOT NULL,
+    prompt       TEXT NOT NULL,
+    item         TEXT NOT NULL,
+    sample       INTEGER NOT NULL,
+    pred         TEXT,
+    confidence   REAL,
+    raw_response TEXT,
+    PRIMARY KEY (model, temperature, prompt, item, sample)
+);
+"""
+
+
+@dataclass(frozen=True)
+class Config:
+    model: str
+    temperature: float
+    num_samples: int
+    prompt: str
+
+    @property
+    def sampler(self):
+        """What the samples depend on; configs with the same sampler share them."""
+        return (self.model, self.temperature, self.prompt)
+
+    def label(self):
+        return f"{self.model} T={self.temperature:g} k={self.num_samples} {self.prompt}"
+
+
+def grid(sweep=SWEEP):
+    keys = ["model", "temperature", "num_samples", "prompt"]
+    return [Config(*values) for values in itertools.product(*(sweep[k] for k in keys))]
+
+
+def prompt_key(prompt):
+    """File name plus content hash, so an edited prompt does not hit old samples."""
+    with open(os.path.join(PROMPT_DIR, prompt), "rb") as f:
+        return f"{prompt}:{hashlib.sha1(f.read()).hexdigest()[:10]}"
+
+
+def question_key(question):
+    """Cache key of an item: hash of the text its prompt is rendered from."""
+    return hashlib.sha1(str(question).encode()).hexdigest()[:16]
+
+
+def parse_reply(prompt, text):
+    parse = parse_baseline_output if prompt.startswith("baseline") else parse_cot_output
+    return parse(text)
+
+
+# ------------------------------------------------
+# Sample cache
+# ------------------------------------------------
+class SampleCache:
+    """Thread-safe SQLite store of (pred, confidence) samples per sampler and item."""
+
+    def __init__(self, db_path=None):
+        db_path = db_path or CACHE_DB
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._prompt_keys = {}
+
+    def key(self, sampler):
+        model, temperature, prompt = sampler
+        if prompt not in self._prompt_keys:
+            self._prompt_keys[prompt] = prompt_key(prompt)
+        return model, float(temperature), self._prompt_keys[prompt]
+
+    def get(self, sampler, items):
+        """item -> [(pred, confidence), ...] in sample order."""
+        found = {item: [] for item in items}
+        items = list(items)
+        with self._lock:
+            for i in range(0, len(items), 500):  # stay below SQLite's variable limit
+                chunk = items[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT item, pred, confidence FROM samples "
+                    f"WHERE model = ? AND temperature = ? AND prompt = ? "
+                    f"AND item IN ({','.join('?' * len(chunk))}) ORDER BY item, sample",
+                    [*self.key(sampler), *chunk])
+                for item, pred, confidence in rows:
+                    found[item].append((pred, confidence))
+        return found
+
+    def put(self, sampler, item, start, samples):
+        """samples: [(pred, confidence, raw_response)], numbered from start."""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*self.key(sampler), item, start + i, *sample)
+                 for i, sample in enumerate(samples)])
+
+
+# ------------------------------------------------
+# Sampling and scoring
+# ------------------------------------------------
+def missing_samples(cache, configs, items):
+    """(sampler, item, cached, needed) for every item short of samples."""
+    needed = {}
+    for config in configs:
+        needed[config.sampler] = max(needed.get(config.sampler, 0), config.num_samples)
+
+    missing = []
+    for sampler, k in needed.items():
+        cached = cache.get(sampler, items)
+        missing.extend((sampler, item, len(cached[item]), k)
+                       for item in items if len(cached[item]) < k)
+    return missing
+
+
+def draw_samples(task, questions, cache, usage):
+    (model, temperature, prompt), item, start, needed = task
+    template = load_prompt(os.path.join(PROMPT_DIR, prompt), ["question"])
+    text_prompt = template.render(question=questions[item])
+
+    texts = chat_samples(model, text_prompt, needed - start, usage, temperature=temperature)
+    samples = [parse_reply(prompt, text) for text in texts]
+    cache.put((model, temperature, prompt), item, start, samples)
+
+
+def score_configs(cache, configs, items, golds):
+    """Metrics of every config on items, best first."""
+    from answer_matching import exact_match
+
+    rows = []
+    samples_by_sampler = {}
+    for config in configs:
+        if config.sampler not in samples_by_sampler:
+            samples_by_sampler[config.sampler] = cache.get(config.sampler, items)
+        samples = samples_by_sampler[config.sampler]
+
+        acc = CalibrationAccumulator()
+        for item in items:
+            drawn = samples[item][:config.num_samples]
+            preds = [str(pred) for pred, _ in drawn]
+            confidences = [0.5 if conf is None else conf for _, conf in drawn]
+            pred, conf, _ = majority_vote(preds, confidences)
+            acc.add(conf, exact_match(pred, str(golds[item])))
+        rows.append({"config": config.label(), **vars(config), **acc.metrics()})
+
+    table = pd.DataFrame(rows)
+    table["rank"] = (table["ece"].rank() + table["brier"].rank()) / 2
+    return table.sort_values(["rank", "ece"], kind="stable").reset_index(drop=True)
+
+
+# ------------------------------------------------
+# Successive halving
+# ------------------------------------------------
+def successive_halving(df, configs, cache, usage, rung_items=RUNG_ITEMS, eta=ETA,
+                       max_calls=MAX_CALLS, concurrency=CONCURRENCY):
+    """Rung tables (all configs of the rung, best first) until a stop rule hits."""
+    df = df.drop_duplicates("question")   # same text, same prompt, same samples
+    keys = [question_key(q) for q in df["question"]]
+    questions = dict(zip(keys, df["question"]))
+    golds = dict(zip(keys, df["answer"]))
+    by_label = {config.label(): config for config in configs}
+
+    tables = []
+    for rung in itertools.count():
+        items = keys[:min(rung_items * eta ** rung, len(keys))]
+        missing = missing_samples(cache, configs, items)
+        cost = sum(needed - start for _, _, start, needed in missing)
+        if max_calls is not None and usage.calls + cost > max_calls:
+            print(f"Rung {rung} needs {cost} new calls, budget has "
+                  f"{max_calls - usage.calls} left: stopping")
+            break
+
+        with span("sweep_rung", rung=rung, configs=len(configs), items=len(items), calls=cost):
+            run_concurrently(lambda task: draw_samples(task, questions, cache, usage),
+                             missing, concurrency)
+            table = score_configs(cache, configs, items, golds)
+
+        keep = 1 if len(configs) == 1 else math.ceil(len(configs) / eta)
+        table.insert(0, "rung", rung)
+        table.insert(1, "items", len(items))
+        table["new_calls"] = cost
+        table["promoted"] = np.arange(len(table)) < keep
+        tables.append(table)
+
+        print(f"\n=== Rung {rung}: {len(configs)} configs x {len(items)} items, "
+              f"{cost} new calls ===")
+        print(format_table(table[["config", "n", "accuracy", "mean_conf", "ece", "brier",
+                                  "rank"]]))
+
+        if len(configs) == 1 or len(items) == len(keys):
+            break
+        configs = [by_label[label] for label in table["config"].head(keep)]
+
+    return tables
+
+
+def main():
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    df = stratified_order(drop_duplicates(df, INPUT_FILE))
+
+    configs = grid()
+    cache = SampleCache()
+    usage = UsageCounter()
+    print(f"{len(configs)} configurations, {len(df)} items, budget "
+          f"{'unlimited' if MAX_CALLS is None else MAX_CALLS} calls")
+
+    tables = successive_halving(df, configs, cache, usage, RUNG_ITEMS, ETA, MAX_CALLS,
+                                CONCURRENCY)
+    if not tables:
+        return
+
+    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
+    pd.concat(tables, ignore_index=True).to_csv(OUTPUT_CSV, index=False)
+    best = tables[-1].iloc[0]
+    print(f"\nBest: {best['config']} (ECE {best['ece']:.3f}, Brier {best['brier']:.3f} "
+          f"on {best['items']} items)")
+    print(f"{usage.calls} new API calls, {usage.prompt_tokens + usage.completion_tokens} "
+          f"tokens; saved -> {OUTPUT_CSV}")
+
+
+if __name__ == "__main__":
+    main()
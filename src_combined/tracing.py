@@ -0,0 +1,197 @@
+# src_combined/tracing.py
+
+"""
+Lightweight span timers and counters for the pipeline scripts.
+
+    from tracing import span, count
+
+    with span("load_dataset", file=INPUT_FILE):
+        df = pd.read_json(INPUT_FILE, lines=True)
+    count("rows", len(df))
+
+Every finished span is appended as one JSON line to
+outputs/traces/<script>-<timestamp>-<pid>.jsonl, and a table of the slowest
+stages is printed when the script exits.
+
+Environment:
+    TRACE=0                   disable tracing entirely
+    TRACE_DIR=...             where traces (and profiles) are written
+    TRACE_PROFILE=cprofile    also profile every top-level stage; one .prof
+                              per stage (open with snakeviz / pstats)
+    TRACE_PROFILE=pyinstrument   same, one .html per stage (if installed)
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+TRACE_ENABLED = os.getenv("TRACE", "1") != "0"
+TRACE_DIR = os.getenv("TRACE_DIR", "outputs/traces")
+TRACE_PROFILE = os.getenv("TRACE_PROFILE", "").lower()
+SUMMARY_ROWS = 10
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+class Tracer:
+    def __init__(self, name):
+        self.name = name
+        self.pid = os.getpid()
+        self.trace_id = f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{self.pid}"
+        self.path = os.path.join(TRACE_DIR, f"{self.trace_id}.jsonl")
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.stages = {}            # name -> [calls, total_s, max_s]
+        self.counters = Counter()
+        self.file = None
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def write(self, record):
+        with self.lock:
+            if self.file is None:
+                os.makedirs(TRACE_DIR, exist_ok=True)
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(json.dumps(record, default=str) + "\n")
+
+    def record(self, name, parent, depth, start, duration, attrs):
+        with self.lock:
+            stage = self.stages.setdefault(name, [0, 0.0, 0.0])
+            stage[0] += 1
+            stage[1] += duration
+            stage[2] = max(stage[2], duration)
+        self.write({"type": "span", "name": name, "parent": parent, "depth": depth,
+                    "start_s": round(start - self.started, 6),
+                    "duration_s": round(duration, 6),
+                    "thread": threading.current_thread().name, **attrs})
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] += n
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        rows = sorted(self.stages.items(), key=lambda kv: -kv[1][1])[:SUMMARY_ROWS]
+        lines = [f"--- Slowest stages ({self.name}, {wall:.2f}s wall) ---",
+                 f"{'stage':<24} {'calls':>7} {'total_s':>9} {'mean_s':>9} "
+                 f"{'max_s':>9} {'share':>6}"]
+        for name, (calls, total, longest) in rows:
+            lines.append(f"{name:<24} {calls:>7d} {total:>9.3f} {total / calls:>9.4f} "
+                         f"{longest:>9.3f} {total / wall:>6.1%}")
+        if self.counters:
+            lines.append("counters: " + ", ".join(f"{k}={v}" for k, v in
+                                                  sorted(self.counters.items())))
+        lines.append(f"trace -> {self.path}")
+        return wall, "\n".join(lines)
+
+    def close(self):
+        if os.getpid() != self.pid or not self.stages:
+            return
+        wall, text = self.summary()
+        self.write({"type": "summary", "wall_s": round(wall, 6),
+                    "counters": dict(self.counters),
+                    "stages": {k: {"calls": c, "total_s": round(t, 6), "max_s": round(m, 6)}
+                               for k, (c, t, m) in self.stages.items()}})
+        with self.lock:
+            self.file.close()
+            self.file = None
+        print("\n" + text)
+
+
+def get_tracer():
+    """The tracer of this process, created on first use (None if disabled)."""
+    global _tracer
+    if not TRACE_ENABLED:
+        return None
+    with _tracer_lock:
+        # forked workers (ProcessPoolExecutor) inherit the parent's tracer,
+        # their spans are not recorded
+        if _tracer is not None and _tracer.pid != os.getpid():
+            return None
+        if _tracer is None:
+            name = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+            _tracer = Tracer(name or "python")
+            atexit.register(_tracer.close)
+    return _tracer
+
+
+# ------------------------------------------------
+# Per-stage profiling
+# ------------------------------------------------
+def _start_profiler():
+    if TRACE_PROFILE == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("pyinstrument not installed, TRACE_PROFILE falls back to cprofile")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _stop_profiler(profiler, tracer, name):
+    base = os.path.join(TRACE_DIR, f"{tracer.trace_id}-{name}")
+    if hasattr(profiler, "dump_stats"):
+        profiler.disable()
+        profiler.dump_stats(base + ".prof")
+    else:
+        profiler.stop()
+        with open(base + ".html", "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+
+
+# ------------------------------------------------
+# Public API
+# ------------------------------------------------
+@contextmanager
+def span(name, **attrs):
+    """
+    Time a block (also usable as a decorator). Spans nest per thread;
+    top-level spans on the main thread are profiled when TRACE_PROFILE is set.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield
+        return
+
+    stack = tracer.stack()
+    parent = stack[-1] if stack else None
+    depth = len(stack)
+    profiler = None
+    if TRACE_PROFILE and depth == 0 and threading.current_thread() is threading.main_thread():
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        profiler = _start_profiler()
+
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        stack.pop()
+        if profiler is not None:
+            _stop_profiler(profiler, tracer, name)
+        tracer.record(name, parent, depth, start, duration, attrs)
+
+
+def count(name, n=1):
+    """Add n to a named counter, reported in the trace summary."""
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.count(name, n)
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(os.path.join(ROOT, "src"))
+sys.path.append(os.path.join(ROOT, "src_combined"))
+
+import plot_metrics  # noqa: E402
+from chunked_eval import evaluate_file  # noqa: E402
+from evaluate_com import score_matches  # noqa: E402
+
+
+def test_render_run_on_chunked_detail_file(tmp_path, monkeypatch):
+    results = tmp_path / "results.csv"
+    pd.DataFrame({
+        "id": [str(i) for i in range(50)],
+        "question": [f"q{i}" for i in range(50)],
+        "source": ["a", "b"] * 25,
+        "pred": ["yes", "no"] * 25,
+        "gold": ["yes"] * 50,
+        "confidence": [i / 50 for i in range(50)],
+    }).to_csv(results, index=False)
+
+    detail = tmp_path / "eval.csv"
+    evaluate_file(str(results), score_matches, ["source"], detail_path=str(detail),
+                  chunk_size=20)
+    assert "bertscore" not in pd.read_csv(detail, nrows=0).columns
+
+    monkeypatch.setattr(plot_metrics, "OUT_DIR", str(tmp_path / "plots"))
+    rendered = plot_metrics.render_run({"run_id": "chunked", "eval_path": str(detail)})
+
+    out_dir = tmp_path / "plots" / "chunked"
+    assert rendered == len(plot_metrics.FIGURES) - len(plot_metrics.FIGURE_COLUMNS)
+    assert (out_dir / "accuracy_comparison.png").exists()
+    assert not (out_dir / "conf_vs_bert.png").exists()
+    # unchanged input: nothing to redo
+    assert plot_metrics.render_run({"run_id": "chunked", "eval_path": str(detail)}) == 0